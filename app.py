@@ -1,41 +1,60 @@
 import streamlit as st
 import pandas as pd
-from investoscrapo.client import InvestingClient
 import io
 from datetime import date, datetime, timedelta
 import base64
-from yfin_search import yahoo_finance_search
+from download_router import DownloadRouter
+from search_service import SearchService, to_scrip_dicts
+from source_clients import get_client
 # import logging
-from bse_scraper.BSE_Client import bse_scraper 
-from nse_scraper.NSE_Client import nse_scraper
-investing = InvestingClient()
-bse = bse_scraper()
-nse = nse_scraper()
-
-def search_bse(query):
-    
-    standardized_results = []
-    
-    bse_results = bse.fetch_search_results(query)
-
-
-    for item in bse_results:
-        if item["description"] == "No Match Found":
-            result = {}
-            break
-        else:
-            result = {
-                'id': item.get('id', 'N/A'),  # BSE scrip code
-                'description': item.get('description', 'N/A'),
-                'symbol': item.get('id', 'N/A'),  # Using BSE scrip code as symbol
-                'exchange': 'BSE',
-                'type': 'Stock - BSE',
-                'isin': item.get('isin', 'N/A')  # Keep ISIN for reference
-            }
-        
-        standardized_results.append(result)
-    
-    return standardized_results
+from investoscrapo.utils.analytics import summarize
+from investoscrapo.utils.cache import get_cache
+from investoscrapo.utils.rolling_state import refresh_state
+from investoscrapo.configs.constants import beta_window
+
+
+# Clients are built on first use and kept across reruns, so a cold start makes no requests
+@st.cache_resource
+def get_scraper(source):
+    return get_client(source)
+
+
+@st.cache_resource
+def get_search_service():
+    # Kept across reruns so repeated queries are answered from its cache
+    return SearchService()
+
+
+@st.cache_resource
+def get_router():
+    return DownloadRouter()
+
+
+def download_panel(source, selected_list, start_date, end_date, failover=False):
+    """(field, instrument) panel of the selected securities, or None when the source has no downloader."""
+    if failover or source == "Yahoo Finance":
+        # Each instrument falls back to its other listings when its own source fails or stalls
+        return get_router().download_many(selected_list, SOURCE_MAP[source], start_date, end_date)
+    elif source == "Investing.com":
+        # Only prices and volumes are analysed, so identifiers stay in the column index
+        return get_scraper("investing").Download_Historical(selected_list, start_date, end_date, compact=True)
+    elif source == "BSE":
+        return get_scraper("bse").download_many(selected_list, start_date, end_date)
+    elif source == "NSE":
+        return get_scraper("nse").download_many(selected_list, start_date, end_date)
+    return None
+
+
+def panel_label(source, item, failover=False):
+    # BSE panels are keyed by company name, the others (and routed panels) by ticker
+    return item["description"] if source == "BSE" and not failover else item["symbol"]
+
+
+def flat_columns(frame):
+    if isinstance(frame.columns, pd.MultiIndex):
+        frame = frame.copy()
+        frame.columns = [" ".join(str(level) for level in key) for key in frame.columns]
+    return frame
 
 
 st.set_page_config(
@@ -130,6 +149,9 @@ if "from_date" not in st.session_state:
 if "to_date" not in st.session_state:
     st.session_state.to_date = date.today()
 
+if "analysis" not in st.session_state:
+    st.session_state.analysis = None
+
 with col1:
     with st.container(border=True):
     # Buttons for picking modes
@@ -203,21 +225,13 @@ with col2:
         if source != st.session_state.previous_source:
             st.session_state.search_results = []
             st.session_state.selected_list = []
+            st.session_state.analysis = None
             st.session_state.previous_source = source
 
         # Move the search logic OUTSIDE the form
         if search_clicked and query:
             with st.spinner("Searching..."):
-                if source == "Yahoo Finance":
-                    st.session_state.search_results = yahoo_finance_search(query)
-                elif source == "Investing.com":
-                    st.session_state.search_results = investing.Search(query)
-                elif source == "BSE":
-                    st.session_state.search_results = search_bse(query)
-                elif source == "NSE":
-                    st.session_state.search_results = nse.fetch_search_results(query)
-                else:
-                    pass
+                st.session_state.search_results = get_search_service().search(SOURCE_MAP[source], query)
         # RESULTS AREA
         st.markdown("### Results")
 
@@ -235,14 +249,35 @@ with col2:
                         `{result['symbol']}` • {result['exchange']} • {result['type']}
                         """) 
                     with col_button:
-                        is_added = any(item["id"] == result["id"] for item in st.session_state.selected_list)
+                        is_added = any(str(item["id"]) == str(result["id"]) for item in st.session_state.selected_list)
                         if not is_added:
                             if st.button("Add", key=f"add_{result['id']}"):
                                 st.session_state.selected_list.append(result)
                                 st.rerun()
                         else:
                             st.success("✓")
-                    st.divider()        
+                    st.divider()
+
+        # WATCHLIST IMPORT: one company name or symbol per row, first column
+        with st.expander("Import a watchlist"):
+            watchlist_file = st.file_uploader("Watchlist", type=["csv", "xlsx"], label_visibility="collapsed")
+            if watchlist_file is not None and st.button("Resolve and add", use_container_width=True):
+                if watchlist_file.name.endswith(".xlsx"):
+                    names = pd.read_excel(watchlist_file).iloc[:, 0]
+                else:
+                    names = pd.read_csv(watchlist_file).iloc[:, 0]
+                with st.spinner(f"Resolving {len(names)} names..."):
+                    table = get_search_service().resolve_many(names, source=SOURCE_MAP[source])
+                # Search results carry Investing ids as ints, resolve_many as strings
+                selected_ids = {str(item["id"]) for item in st.session_state.selected_list}
+                for scrip_dict in to_scrip_dicts(table):
+                    if str(scrip_dict["id"]) not in selected_ids:
+                        st.session_state.selected_list.append(scrip_dict)
+                        selected_ids.add(str(scrip_dict["id"]))
+                unresolved = table.loc[table["id"].isna(), "query"]
+                if len(unresolved):
+                    st.warning(f"No match for: {', '.join(name for name in unresolved if name)}")
+                st.dataframe(table, use_container_width=True)
 
 
 # SELECTED LIST SECTION (below col2)
@@ -267,4 +302,73 @@ else:
                 st.session_state.selected_list.pop(idx)
                 st.rerun()
         
-        st.divider()
\ No newline at end of file
+        st.divider()
+
+
+# ANALYSIS SECTION
+st.markdown("---")
+st.markdown("### 📈 Analysis")
+
+if st.session_state.selected_list:
+    a1, a2, a3 = st.columns([3, 1.5, 1])
+
+    with a1:
+        benchmark_item = st.selectbox(
+            "Benchmark",
+            options=st.session_state.selected_list,
+            format_func=lambda item: f"{item['description']} ({item['symbol']})",
+        )
+
+    with a2:
+        window = st.number_input("Rolling window (days)", min_value=5, max_value=750, value=beta_window)
+
+    with a3:
+        st.write("")
+        run_clicked = st.button("Run", use_container_width=True)
+
+    failover = st.checkbox(
+        "Fail over to other sources",
+        help="Download a security from its other listings when its own source fails or is slow.",
+    )
+
+    if run_clicked:
+        with st.spinner("Downloading history..."):
+            panel = download_panel(
+                source,
+                st.session_state.selected_list,
+                st.session_state.from_date.strftime("%Y-%m-%d"),
+                st.session_state.to_date.strftime("%Y-%m-%d"),
+                failover=failover,
+            )
+        if panel is None:
+            st.warning(f"Historical downloads are not available for {source}.")
+        elif panel.empty:
+            st.error("No history could be downloaded for the selected securities.")
+        else:
+            benchmark = panel_label(source, benchmark_item, failover)
+            # Full-period beta and volatility only pay for the days added since the last run
+            state = refresh_state(get_cache(), SOURCE_MAP[source], panel, benchmark, int(window))
+            st.session_state.analysis = summarize(panel, benchmark, int(window), state=state)
+
+analysis = st.session_state.analysis
+
+if analysis is None:
+    st.info("Select securities, pick a benchmark and press Run.")
+else:
+    if "beta" in active_modes:
+        st.markdown("#### Beta")
+        st.dataframe(flat_columns(analysis["beta"].to_frame("Beta").T))
+        st.line_chart(flat_columns(analysis["rolling_beta"]))
+    if "vol" in active_modes:
+        st.markdown("#### Annualized Volatility")
+        st.dataframe(flat_columns(analysis["vol"].to_frame("Volatility").T))
+        st.line_chart(flat_columns(analysis["rolling_vol"]))
+    if "price" in active_modes:
+        st.markdown("#### Prices")
+        st.line_chart(flat_columns(analysis["price"]))
+    if "volume" in active_modes:
+        st.markdown("#### Volume")
+        st.bar_chart(flat_columns(analysis["volume"]))
+    if "tt" in active_modes:
+        st.markdown("#### Thinly Traded")
+        st.dataframe(analysis["tt"])
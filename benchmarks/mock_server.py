@@ -0,0 +1,445 @@
+"""
+Local stand-in for investing.com, nseindia.com and bseindia.com.
+
+Every site lives under its own path prefix on one threaded HTTP server:
+
+    /investing/   home page, /api/search/v2/search, /api/financialdata/historical/<id>
+    /nse/         home page, /api/NextApi/search/autocomplete, /api/historical/cm/equity,
+                  /content/cm/ and /content/historical/EQUITIES/ (daily bhavcopies, zipped CSV)
+    /bse/         index.html, /Msource/1D/getQouteSearch.aspx,
+                  /markets/equity/EQReports/StockPrcHistori.aspx (GET form + POST download),
+                  /download/BhavCopy/Equity/ (daily bhavcopies, UDiFF CSV or zipped EQ CSV)
+
+Payloads follow the recorded responses in benchmarks/fixtures; historical rows
+are generated for whatever date range is asked for. Latency and 403s can be
+injected, the BSE form tokens can be made to expire, and GET /__stats returns
+request counters so a client can measure how many round trips an operation took.
+"""
+import base64
+import csv
+import io
+import json
+import os
+import random
+import sys
+import threading
+import time
+import zipfile
+from datetime import date, datetime, timedelta
+from functools import lru_cache
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+from urllib.parse import parse_qs, urlsplit
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+HOME_PATHS = ("/investing/", "/nse/", "/bse/index.html")
+
+BSE_COLUMNS = ["Date", "Open", "High", "Low", "Close", "WAP", "Volume", "No. of Trades", "Turnover",
+               "Deliverable Quantity", "% Deli. Qty to Traded Qty"]
+
+BHAVCOPY_PATH = "/bse/download/BhavCopy/Equity/"
+BHAVCOPY_COLUMNS = {
+    "udiff": ["TradDt", "BizDt", "Sgmt", "Src", "FinInstrmTp", "FinInstrmId", "ISIN", "TckrSymb", "SctySrs",
+              "FinInstrmNm", "OpnPric", "HghPric", "LwPric", "ClsPric", "LastPric", "PrvsClsgPric",
+              "TtlTradgVol", "TtlTrfVal", "TtlNbOfTxsExctd", "SsnId", "NewBrdLotQty"],
+    "eq": ["SC_CODE", "SC_NAME", "SC_GROUP", "SC_TYPE", "OPEN", "HIGH", "LOW", "CLOSE", "LAST", "PREVCLOSE",
+           "NO_TRADES", "NO_OF_SHRS", "NET_TURNOV", "TDCLOINDI"],
+}
+
+NSE_BHAVCOPY_PATHS = ("/nse/content/cm/", "/nse/content/historical/EQUITIES/")
+NSE_BHAVCOPY_COLUMNS = {
+    "udiff": ["TradDt", "BizDt", "Sgmt", "Src", "FinInstrmTp", "FinInstrmId", "ISIN", "TckrSymb", "SctySrs",
+              "XpryDt", "FininstrmActlXpryDt", "StrkPric", "OptnTp", "FinInstrmNm", "OpnPric", "HghPric", "LwPric",
+              "ClsPric", "LastPric", "PrvsClsgPric", "UndrlygPric", "SttlmPric", "OpnIntrst", "ChngInOpnIntrst",
+              "TtlTradgVol", "TtlTrfVal", "TtlNbOfTxsExctd", "SsnId", "NewBrdLotQty", "Rmks", "Rsvd1", "Rsvd2",
+              "Rsvd3", "Rsvd4"],
+    "legacy": ["SYMBOL", "SERIES", "OPEN", "HIGH", "LOW", "CLOSE", "LAST", "PREVCLOSE", "TOTTRDQTY", "TOTTRDVAL",
+               "TIMESTAMP", "TOTALTRADES", "ISIN"],
+}
+
+
+def fixture(name: str) -> str:
+    with open(os.path.join(FIXTURES, name), encoding="utf-8") as f:
+        return f.read()
+
+
+def trading_days(start: date, end: date) -> list[date]:
+    """Weekdays between start and end, newest first like the real endpoints."""
+    days = []
+    day = end
+    while day >= start:
+        if day.weekday() < 5:
+            days.append(day)
+        day -= timedelta(days=1)
+    return days
+
+
+def price(instrument_id, day: date) -> float:
+    """Deterministic, instrument-specific price path so repeated runs compare like with like."""
+    seed = sum(map(ord, str(instrument_id)))
+    return round(100 + seed % 900 + 25 * ((day.toordinal() * 7 + seed) % 13) / 13, 2)
+
+
+@lru_cache(maxsize=4096)
+def investing_history(instrument_id: str, start: str, end: str) -> bytes:
+    template = json.loads(fixture("investing_historical.json"))["data"][0]
+    rows = []
+    for day in trading_days(date.fromisoformat(start), date.fromisoformat(end)):
+        close = price(instrument_id, day)
+        volume = 1_000_000 + (day.toordinal() % 97) * 10_000
+        row = dict(template)
+        row.update({
+            "rowDate": day.strftime("%b %d, %Y"),
+            "rowDateRaw": int(datetime(day.year, day.month, day.day).timestamp()),
+            "rowDateTimestamp": f"{day.isoformat()}T00:00:00Z",
+            "last_close": f"{close:,.2f}",
+            "last_closeRaw": str(close),
+            "volume": f"{volume / 1e6:.2f}M",
+            "volumeRaw": volume,
+        })
+        rows.append(row)
+    return json.dumps({"data": rows}).encode()
+
+
+# Longest from/to range the NSE historical API serves in one call
+NSE_WINDOW_DAYS = 365
+
+
+@lru_cache(maxsize=4096)
+def nse_history(symbol: str, start: date, end: date) -> bytes:
+    recorded = json.loads(fixture("nse_historical.json"))
+    template = recorded["data"][0]
+    rows = []
+    for day in trading_days(start, end):
+        close = price(symbol, day)
+        volume = 2_000_000 + (day.toordinal() % 83) * 25_000
+        row = dict(template)
+        row.update({
+            "CH_SYMBOL": symbol,
+            "CH_TIMESTAMP": day.isoformat(),
+            "mTIMESTAMP": day.strftime("%d-%b-%Y"),
+            "CH_OPENING_PRICE": close - 1,
+            "CH_TRADE_HIGH_PRICE": close + 2,
+            "CH_TRADE_LOW_PRICE": close - 3,
+            "CH_CLOSING_PRICE": close,
+            "CH_LAST_TRADED_PRICE": close,
+            "CH_PREVIOUS_CLS_PRICE": close - 0.5,
+            "CH_TOT_TRADED_QTY": volume,
+            "CH_TOT_TRADED_VAL": round(volume * close, 2),
+            "VWAP": close - 0.25,
+        })
+        rows.append(row)
+    meta = dict(recorded["meta"], fromDate=start.strftime("%d-%m-%Y"), toDate=end.strftime("%d-%m-%Y"), symbols=[symbol])
+    return json.dumps({"data": rows, "meta": meta}).encode()
+
+
+def bse_rows(scripcode: str, start: date, end: date):
+    for day in trading_days(start, end):
+        close = price(scripcode, day)
+        volume = 50_000 + (day.toordinal() % 89) * 1_000
+        yield [day.strftime("%d/%m/%Y"), f"{close - 1:,.2f}", f"{close + 2:,.2f}", f"{close - 3:,.2f}", f"{close:,.2f}",
+               f"{close - 0.5:,.2f}", f"{volume:,}", str(volume // 40), f"{volume * close:,.0f}", f"{volume // 2:,}", "50.00"]
+
+
+@lru_cache(maxsize=4096)
+def bse_csv(scripcode: str, start: date, end: date) -> bytes:
+    out = io.StringIO()
+    writer = csv.writer(out)
+    writer.writerow(BSE_COLUMNS)
+    writer.writerows(bse_rows(scripcode, start, end))
+    return out.getvalue().encode()
+
+
+@lru_cache(maxsize=64)
+def bse_bhavcopy(day: date, scrips: int, layout: str) -> bytes:
+    """Every mock scrip's row for day, with the same prices as bse_rows."""
+    out = io.StringIO()
+    writer = csv.writer(out)
+    writer.writerow(BHAVCOPY_COLUMNS[layout])
+    for i in range(scrips):
+        code = str(500000 + i)
+        close = price(code, day)
+        volume = 50_000 + (day.toordinal() % 89) * 1_000
+        if layout == "udiff":
+            writer.writerow([day.isoformat(), day.isoformat(), "CM", "BSE", "STK", code, f"INE{i:06d}01", f"MOCK{i}",
+                             "A", f"MOCK SCRIP {i} LTD", close - 1, close + 2, close - 3, close, close, close - 0.5,
+                             volume, round(volume * close), volume // 40, "F1", 1])
+        else:
+            writer.writerow([code, f"MOCK{i}", "A", "Q", close - 1, close + 2, close - 3, close, close, close - 0.5,
+                             volume // 40, volume, round(volume * close), ""])
+    if layout == "udiff":
+        return out.getvalue().encode()
+    archive = io.BytesIO()
+    with zipfile.ZipFile(archive, "w", zipfile.ZIP_DEFLATED) as z:
+        z.writestr(f"EQ{day:%d%m%y}.CSV", out.getvalue())
+    return archive.getvalue()
+
+
+@lru_cache(maxsize=64)
+def nse_bhavcopy(day: date, symbols: int, layout: str) -> bytes:
+    """Zipped bhavcopy with every mock symbol's EQ row for day (same prices as nse_history), plus a few BE rows."""
+    out = io.StringIO()
+    writer = csv.writer(out)
+    writer.writerow(NSE_BHAVCOPY_COLUMNS[layout])
+    for i in range(symbols):
+        symbol, series = f"MOCK{i}", "EQ" if i % 50 else "BE"
+        close = price(symbol, day)
+        volume = 2_000_000 + (day.toordinal() % 83) * 25_000
+        if layout == "udiff":
+            writer.writerow([day.isoformat(), day.isoformat(), "CM", "NSE", "STK", 10000 + i, f"INE{i:06d}01", symbol,
+                             series, "", "", "", "", f"MOCK INDUSTRIES {i} LTD", close - 1, close + 2, close - 3,
+                             close, close, close - 0.5, "", close, "", "", volume, round(volume * close),
+                             volume // 40, "F1", 1, "", "", "", "", ""])
+        else:
+            writer.writerow([symbol, series, close - 1, close + 2, close - 3, close, close, close - 0.5, volume,
+                             round(volume * close), day.strftime("%d-%b-%Y").upper(), volume // 40, f"INE{i:06d}01"])
+    name = (f"BhavCopy_NSE_CM_0_0_0_{day:%Y%m%d}_F_0000.csv" if layout == "udiff"
+            else f"cm{day:%d}{day.strftime('%b').upper()}{day:%Y}bhav.csv")
+    archive = io.BytesIO()
+    with zipfile.ZipFile(archive, "w", zipfile.ZIP_DEFLATED) as z:
+        z.writestr(name, out.getvalue())
+    return archive.getvalue()
+
+
+@lru_cache(maxsize=4096)
+def bse_table(scripcode: str, start: date, end: date) -> str:
+    header = "".join(f'<td class="innertable_header1">{col}</td>' for col in [*BSE_COLUMNS, "* Spread"])
+    rows = "".join(
+        '<tr class="TTRow">' + "".join(f'<td class="TTRow_right">{cell}</td>' for cell in row) + "</tr>\n"
+        for row in bse_rows(scripcode, start, end)
+    )
+    return f'<tr><td><table class="mGrid" cellspacing="1" cellpadding="4">\n<tr>{header}</tr>\n{rows}</table></td></tr>'
+
+
+class MockState():
+    """Knobs and counters shared by all handler threads."""
+
+    def __init__(self, latency: float = 0.0, jitter: float = 0.0, forbidden_rate: float = 0.0,
+                 bse_format: str = "csv", token_lifetime: float = 0.0, bhavcopy_scrips: int = 5000,
+                 bhavcopy_symbols: int = 2000, seed: int = 0):
+        self.latency = latency
+        self.jitter = jitter
+        self.forbidden_rate = forbidden_rate
+        self.bse_format = bse_format
+        self.token_lifetime = token_lifetime
+        self.bhavcopy_scrips = bhavcopy_scrips
+        self.bhavcopy_symbols = bhavcopy_symbols
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.forbidden = 0
+        self.rejected = 0
+        self.cookie_serial = 0
+        self.started = time.monotonic()
+
+        # ASP.NET pages carry tens of kilobytes of opaque form state
+        self.token = base64.b64encode(self.random.randbytes(18_000)).decode()
+        self.viewstategenerator = "E2A8C3B6"
+
+    def form_tokens(self) -> tuple[str, str]:
+        """Current (__VIEWSTATE, __EVENTVALIDATION); they change every token_lifetime seconds if set."""
+        generation = 0
+        if self.token_lifetime:
+            generation = int((time.monotonic() - self.started) / self.token_lifetime)
+        viewstate = f"{self.token[:-8]}{generation:08d}"
+        return viewstate, viewstate[:2_000]
+
+    def count(self, may_forbid: bool = True) -> bool:
+        """Count a request and decide whether it gets an injected 403."""
+        with self.lock:
+            self.requests += 1
+            forbidden = may_forbid and self.random.random() < self.forbidden_rate
+            self.forbidden += forbidden
+        return forbidden
+
+    def next_cookie(self) -> str:
+        with self.lock:
+            self.cookie_serial += 1
+            return f"mock{self.cookie_serial}"
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {"requests": self.requests, "forbidden": self.forbidden, "rejected": self.rejected,
+                    "cookies": self.cookie_serial}
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Headers and body go out in separate writes; with Nagle on, every keep-alive reply stalls on a delayed ACK
+    disable_nagle_algorithm = True
+    state: MockState = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def reply(self, body, content_type: str = "application/json", status: int = 200, headers: Optional[dict] = None):
+        if isinstance(body, str):
+            body = body.encode()
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def home(self):
+        cookie = self.state.next_cookie()
+        self.reply("<html><body>home</body></html>", "text/html; charset=utf-8",
+                   headers={"Set-Cookie": f"__cf_bm={cookie}; Path=/; Max-Age=1800"})
+
+    def wait(self):
+        if self.state.latency or self.state.jitter:
+            time.sleep(self.state.latency + self.state.random.uniform(0, self.state.jitter))
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+
+        if url.path == "/__stats":
+            return self.reply(json.dumps(self.state.stats()))
+
+        # Home pages hand out cookies and are never blocked, like a solved challenge
+        home = url.path in HOME_PATHS
+        forbidden = self.state.count(may_forbid=not home)
+        self.wait()
+
+        if home:
+            return self.home()
+        if forbidden:
+            return self.reply("<html>Just a moment...</html>", "text/html", status=403)
+
+        if url.path.startswith("/investing/api/financialdata/historical/"):
+            instrument_id = url.path.rsplit("/", 1)[-1]
+            return self.reply(investing_history(instrument_id, query["start-date"], query["end-date"]))
+        if url.path.startswith("/investing/api/search") or url.path.startswith("/investing/search/"):
+            return self.reply(fixture("investing_search.json"))
+        if url.path == "/nse/api/historical/cm/equity":
+            start = datetime.strptime(query["from"], "%d-%m-%Y").date()
+            end = datetime.strptime(query["to"], "%d-%m-%Y").date()
+            if (end - start).days + 1 > NSE_WINDOW_DAYS:
+                return self.reply(json.dumps({"error": True, "showMessage": "Date range exceeds one year"}), status=400)
+            return self.reply(nse_history(query["symbol"], start, end))
+        if url.path == "/nse/api/NextApi/search/autocomplete":
+            return self.reply(fixture("nse_autocomplete.json"))
+        if url.path == "/bse/Msource/1D/getQouteSearch.aspx":
+            return self.reply(fixture("bse_search.html"), "text/html; charset=utf-8")
+        if url.path == "/bse/markets/equity/EQReports/StockPrcHistori.aspx":
+            return self.reply(self.bse_page(query.get("scripcode", ""), ""), "text/html; charset=utf-8")
+        if url.path.startswith(BHAVCOPY_PATH):
+            return self.bhavcopy(url.path[len(BHAVCOPY_PATH):])
+        if url.path.startswith(NSE_BHAVCOPY_PATHS):
+            return self.nse_bhavcopy(url.path.rsplit("/", 1)[-1])
+
+        self.reply(json.dumps({"error": "not found"}), status=404)
+
+    def do_POST(self):
+        url = urlsplit(self.path)
+        length = int(self.headers.get("Content-Length", 0))
+        form = {key: values[-1] for key, values in parse_qs(self.rfile.read(length).decode()).items()}
+
+        forbidden = self.state.count()
+        self.wait()
+        if forbidden:
+            return self.reply("<html>Just a moment...</html>", "text/html", status=403)
+        if url.path != "/bse/markets/equity/EQReports/StockPrcHistori.aspx":
+            return self.reply(json.dumps({"error": "not found"}), status=404)
+
+        if form.get("__VIEWSTATE") != self.state.form_tokens()[0]:
+            with self.state.lock:
+                self.state.rejected += 1
+            return self.reply("<html><body><h2>Validation of viewstate MAC failed.</h2></body></html>",
+                              "text/html; charset=utf-8", status=500)
+
+        scripcode = form.get("ctl00$ContentPlaceHolder1$hdnCode", "")
+        start = datetime.strptime(form["ctl00$ContentPlaceHolder1$txtFromDate"], "%d/%m/%Y").date()
+        end = datetime.strptime(form["ctl00$ContentPlaceHolder1$txtToDate"], "%d/%m/%Y").date()
+
+        if self.state.bse_format == "csv":
+            return self.reply(bse_csv(scripcode, start, end), "application/vnd.ms-excel",
+                              headers={"Content-Disposition": f"attachment; filename={scripcode}.csv"})
+        self.reply(self.bse_page(scripcode, bse_table(scripcode, start, end)), "text/html; charset=utf-8")
+
+    def bhavcopy(self, name: str):
+        """BhavCopy_BSE_CM_0_0_0_<yyyymmdd>_F_0000.CSV or EQ<ddmmyy>_CSV.ZIP; weekends have no file."""
+        try:
+            if name.startswith("BhavCopy_BSE_CM_"):
+                layout, day = "udiff", datetime.strptime(name.split("_")[6], "%Y%m%d").date()
+            else:
+                layout, day = "eq", datetime.strptime(name[2:8], "%d%m%y").date()
+        except (IndexError, ValueError):
+            day = None
+        if day is None or day.weekday() >= 5:
+            return self.reply("<html>File not found</html>", "text/html", status=404)
+        if layout == "udiff":
+            return self.reply(bse_bhavcopy(day, self.state.bhavcopy_scrips, layout), "text/csv")
+        return self.reply(bse_bhavcopy(day, self.state.bhavcopy_scrips, layout), "application/zip")
+
+    def nse_bhavcopy(self, name: str):
+        """BhavCopy_NSE_CM_0_0_0_<yyyymmdd>_F_0000.csv.zip or cm<ddMONyyyy>bhav.csv.zip; weekends have no file."""
+        try:
+            if name.startswith("BhavCopy_NSE_CM_"):
+                layout, day = "udiff", datetime.strptime(name.split("_")[6], "%Y%m%d").date()
+            else:
+                layout, day = "legacy", datetime.strptime(name[2:11].title(), "%d%b%Y").date()
+        except (IndexError, ValueError):
+            day = None
+        if day is None or day.weekday() >= 5:
+            return self.reply("<html>File not found</html>", "text/html", status=404)
+        return self.reply(nse_bhavcopy(day, self.state.bhavcopy_symbols, layout), "application/zip")
+
+    def bse_page(self, scripcode: str, table: str) -> str:
+        viewstate, eventvalidation = self.state.form_tokens()
+        return fixture("bse_stockprchistori.html").format(
+            scripcode=scripcode,
+            viewstate=viewstate,
+            viewstategenerator=self.state.viewstategenerator,
+            eventvalidation=eventvalidation,
+            table=table,
+        )
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    # The default listen backlog of 5 drops connections under concurrent load
+    request_queue_size = 1024
+
+    def handle_error(self, request, client_address):
+        # Clients dropping idle keep-alive connections is routine, not worth a traceback
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+
+class MockServer():
+    """
+    Threaded mock server running in a background thread.
+
+        with MockServer(latency=0.05, forbidden_rate=0.02) as server:
+            print(server.base_url)
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, **knobs):
+        self.state = MockState(**knobs)
+        handler = type("Handler", (MockHandler,), {"state": self.state})
+        self.httpd = _Server((host, port), handler)
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
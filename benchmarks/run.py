@@ -0,0 +1,389 @@
+"""
+Throughput benchmarks for the Investing, NSE and BSE scrapers against the local mock server.
+
+    python -m benchmarks.run
+    python -m benchmarks.run --scenarios investing_async bse_download --sizes 10 100 --latency 0.05 --forbidden-rate 0.02
+
+Every (scenario, size) pair runs in a fresh interpreter, so peak RSS is per run
+and no session, cookie or rate-limiter state leaks from one run into the next.
+For each run the table shows the HTTP requests the mock served, requests/s over
+the run's wall time, p50/p99 latency of a single instrument download (or search
+query, or panel build) and the child's peak RSS.
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from urllib.request import urlopen
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from benchmarks.mock_server import MockServer, investing_history
+
+# Rate limits are what the scrapers are tuned to; against the mock only the client itself should be measured
+UNLIMITED = (10_000.0, 10_000, 10_000.0)
+
+QUERIES = ["Reliance", "Tata Steel", "Infosys", "HDFC Bank", "Bharti Airtel", "ITC", "Larsen", "Wipro"]
+
+
+def point_at(base_url: str):
+    """
+    Point every scraper at the mock server. Must run before the client modules are
+    imported: they copy URL constants at import.
+    """
+    from investoscrapo.configs import constants as investing
+    from nse_scraper.nsescraper.configs import constants as nse
+    from bse_scraper.bsescraper.configs import constants as bse
+
+    host = "127.0.0.1"
+    investing.HOME_URL = f"{base_url}/investing/"
+    investing.HISTORICAL_DATA_URL = f"{base_url}/investing/api/financialdata/historical/"
+    investing.search_urls = [f"{base_url}/investing/api/search/v2/search"]
+    investing.rate_limits = {host: UNLIMITED}
+
+    nse.HOME_URL = f"{base_url}/nse/"
+    nse.SEARCH_URL = f"{base_url}/nse/api/NextApi/search/autocomplete"
+    nse.HISTORICAL_DATA_URL = f"{base_url}/nse/api/historical/cm/equity"
+    nse.BHAVCOPY_URLS = {
+        "udiff": f"{base_url}/nse/content/cm/{{name}}",
+        "legacy": f"{base_url}/nse/content/historical/EQUITIES/{{day:%Y}}/{{month}}/{{name}}",
+    }
+    nse.rate_limits = {host: UNLIMITED}
+
+    bse.HOME_URL = f"{base_url}/bse/index.html"
+    bse.HISTORICAL_DATA_URL = f"{base_url}/bse/markets/equity/EQReports/StockPrcHistori.aspx"
+    bse.SEARCH_URL = f"{base_url}/bse/Msource/1D/getQouteSearch.aspx"
+    bse.BHAVCOPY_URLS = {
+        "udiff": f"{base_url}/bse/download/BhavCopy/Equity/BhavCopy_BSE_CM_0_0_0_{{day:%Y%m%d}}_F_0000.CSV",
+        "eq": f"{base_url}/bse/download/BhavCopy/Equity/EQ{{day:%d%m%y}}_CSV.ZIP",
+    }
+    bse.rate_limits = {host: UNLIMITED}
+
+
+def succeeded(result) -> bool:
+    if result is None:
+        return False
+    if hasattr(result, "empty"):
+        return not result.empty
+    return bool(result)
+
+
+def timed(fn, samples: list):
+    """Wrap fn so every call appends (seconds, succeeded) to samples."""
+    def wrapper(*args, **kwargs):
+        started = time.perf_counter()
+        result = None
+        try:
+            result = fn(*args, **kwargs)
+            return result
+        finally:
+            samples.append((time.perf_counter() - started, succeeded(result)))
+    return wrapper
+
+
+def timed_async(fn, samples: list):
+    async def wrapper(*args, **kwargs):
+        started = time.perf_counter()
+        result = None
+        try:
+            result = await fn(*args, **kwargs)
+            return result
+        finally:
+            samples.append((time.perf_counter() - started, succeeded(result)))
+    return wrapper
+
+
+def investing_items(n: int) -> list[dict]:
+    return [{"id": 1000 + i, "symbol": f"SYM{i}", "description": f"Mock Instrument {i}"} for i in range(n)]
+
+
+def nse_items(n: int) -> list[dict]:
+    return [{"id": f"MOCK{i}", "symbol": f"MOCK{i}", "description": f"Mock Industries {i} Limited"} for i in range(n)]
+
+
+def bse_items(n: int) -> list[dict]:
+    return [{"id": str(500000 + i), "description": f"MOCK SCRIP {i} LTD"} for i in range(n)]
+
+
+# Each scenario sets its client up (cookies included) and returns the timed
+# operation plus the list the per-call samples are collected in.
+
+def investing_download(n, args, engine):
+    from investoscrapo.client import InvestingClient
+
+    client = InvestingClient(use_cache=False)
+    client.scraper.get_cookies()
+    samples = []
+    if engine == "async":
+        client.scraper.download_data_async = timed_async(client.scraper.download_data_async, samples)
+    else:
+        client.scraper.download_data = timed(client.scraper.download_data, samples)
+
+    items = investing_items(n)
+    return lambda: client.Download_Historical(items, args.start, args.end, engine=engine), samples
+
+
+def investing_threaded(n, args):
+    return investing_download(n, args, "threaded")
+
+
+def investing_async(n, args):
+    return investing_download(n, args, "async")
+
+
+def searches(scraper, n):
+    samples = []
+    search = timed(scraper.fetch_search_results, samples)
+
+    def run():
+        for i in range(n):
+            search(QUERIES[i % len(QUERIES)])
+    return run, samples
+
+
+def investing_search(n, args):
+    from investoscrapo.scraper import Investing
+
+    scraper = Investing(use_cache=False)
+    scraper.get_cookies()
+    return searches(scraper, n)
+
+
+def nse_search(n, args):
+    from nse_scraper.NSE_Client import nse_scraper
+
+    scraper = nse_scraper()
+    scraper.get_cookies()
+    return searches(scraper, n)
+
+
+def bse_search(n, args):
+    from bse_scraper.BSE_Client import bse_scraper
+
+    scraper = bse_scraper(use_cache=False)
+    scraper.get_cookies()
+    return searches(scraper, n)
+
+
+def bse_download(n, args):
+    from bse_scraper.BSE_Client import bse_scraper
+
+    scraper = bse_scraper(use_cache=False)
+    scraper.get_cookies()
+    samples = []
+    scraper.download_data = timed(scraper.download_data, samples)
+
+    items = bse_items(n)
+    return lambda: scraper.download_many(items, args.start, args.end), samples
+
+
+def bse_bhavcopy(n, args):
+    from bse_scraper.BSE_Client import bse_scraper
+
+    scraper = bse_scraper()
+    samples = []
+    scraper.fetch_bhavcopy = timed(scraper.fetch_bhavcopy, samples)
+
+    codes = [item["id"] for item in bse_items(n)]
+    return lambda: scraper.ingest_bhavcopies(args.start, args.end, scrip_codes=codes), samples
+
+
+def nse_download(n, args):
+    from nse_scraper.NSE_Client import nse_scraper
+
+    scraper = nse_scraper(use_cache=False)
+    scraper.get_cookies()
+    samples = []
+    scraper.download_data = timed(scraper.download_data, samples)
+
+    items = nse_items(n)
+    return lambda: scraper.download_many(items, args.start, args.end), samples
+
+
+def nse_bhavcopy(n, args):
+    from nse_scraper.NSE_Client import nse_scraper
+    from nse_scraper.nsescraper.utils.bhavcopy import get_bhavcopy_store
+
+    scraper = nse_scraper(use_cache=False)
+    samples = []
+    scraper.fetch_bhavcopy = timed(scraper.fetch_bhavcopy, samples)
+
+    directory = tempfile.mkdtemp(prefix="nse_bhavcopy_")
+    store = get_bhavcopy_store(tempfile.mkdtemp(prefix="nse_bhavcopy_store_"))
+    symbols = [item["symbol"] for item in nse_items(n)]
+
+    def run():
+        scraper.download_bhavcopies(args.start, args.end, directory)
+        scraper.ingest_bhavcopies(directory, store=store)
+        scraper.bhavcopy_panel(symbols, args.start, args.end, store=store)
+    return run, samples
+
+
+def panel(n, args):
+    from investoscrapo.client import InvestingClient
+    from investoscrapo.configs.constants import keep_cols
+    from investoscrapo.scraper import Investing
+
+    raw = [
+        Investing.parse_response(json.loads(investing_history(str(item["id"]), args.start, args.end)), item)[keep_cols]
+        for item in investing_items(n)
+    ]
+    samples = []
+    build = timed(InvestingClient.to_panel, samples)
+
+    def run():
+        for _ in range(args.repeat):
+            build(raw)
+    return run, samples
+
+
+SCENARIOS = {
+    "investing_threaded": investing_threaded,
+    "investing_async": investing_async,
+    "investing_search": investing_search,
+    "nse_search": nse_search,
+    "bse_search": bse_search,
+    "bse_download": bse_download,
+    "bse_bhavcopy": bse_bhavcopy,
+    "nse_download": nse_download,
+    "nse_bhavcopy": nse_bhavcopy,
+    "panel": panel,
+}
+
+
+def server_stats(base_url: str) -> dict:
+    with urlopen(f"{base_url}/__stats") as response:
+        return json.load(response)
+
+
+def percentile(values: list, q: float) -> float:
+    if not values:
+        return float("nan")
+    values = sorted(values)
+    return values[min(len(values) - 1, round(q * (len(values) - 1)))]
+
+
+def child(args):
+    """Run one scenario at one size and write its measurements to args.out."""
+    point_at(args.base_url)
+    operation, samples = SCENARIOS[args.child](args.size, args)
+
+    before = server_stats(args.base_url)
+    started = time.perf_counter()
+    error = None
+    try:
+        operation()
+    except Exception as exc:
+        # A run that gives up part way still says how far it got and what it cost
+        error = f"{type(exc).__name__}: {exc}"[:300]
+    wall = time.perf_counter() - started
+    after = server_stats(args.base_url)
+
+    latencies = [seconds for seconds, _ in samples]
+    requests = after["requests"] - before["requests"]
+    result = {
+        "scenario": args.child,
+        "size": args.size,
+        "wall_s": wall,
+        "requests": requests,
+        "forbidden": after["forbidden"] - before["forbidden"],
+        "req_per_s": requests / wall if wall else 0.0,
+        "p50_ms": percentile(latencies, 0.50) * 1000,
+        "p99_ms": percentile(latencies, 0.99) * 1000,
+        "failed": sum(not ok for _, ok in samples),
+        # ru_maxrss is in kilobytes on Linux
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        "error": error,
+    }
+    with open(args.out, "w") as f:
+        json.dump(result, f)
+
+
+def run_one(scenario: str, size: int, base_url: str, args) -> dict:
+    with tempfile.TemporaryDirectory(prefix="investoscrapo-bench-") as tmp:
+        out = os.path.join(tmp, "result.json")
+        env = dict(os.environ, INVESTOSCRAPO_CACHE_DIR=os.path.join(tmp, "cache"))
+        env["PYTHONPATH"] = os.pathsep.join(filter(None, [ROOT, env.get("PYTHONPATH")]))
+        command = [
+            sys.executable, "-m", "benchmarks.run", "--child", scenario, "--size", str(size),
+            "--base-url", base_url, "--out", out, "--start", args.start, "--end", args.end,
+            "--repeat", str(args.repeat),
+        ]
+        output = None if args.verbose else subprocess.DEVNULL
+        completed = subprocess.run(command, cwd=ROOT, env=env, stdout=output,
+                                   stderr=None if args.verbose else subprocess.PIPE, text=True)
+        if completed.returncode != 0:
+            print(f"{scenario} x {size} failed:\n{(completed.stderr or '')[-2000:]}", file=sys.stderr)
+            return {"scenario": scenario, "size": size, "exit_status": completed.returncode}
+        with open(out) as f:
+            return json.load(f)
+
+
+def print_table(results: list[dict]):
+    columns = [
+        ("scenario", 20, ""), ("size", 6, ""), ("wall_s", 8, ".2f"), ("requests", 8, ""), ("forbidden", 9, ""),
+        ("req_per_s", 9, ".1f"), ("p50_ms", 9, ".1f"), ("p99_ms", 9, ".1f"), ("failed", 6, ""),
+        ("peak_rss_mb", 11, ".1f"),
+    ]
+    print("  ".join(f"{name:<{width}}" if name == "scenario" else f"{name:>{width}}" for name, width, _ in columns))
+    for row in results:
+        if "exit_status" in row:
+            print(f"{row['scenario']:<20}  {row['size']:>6}  exited with status {row['exit_status']}")
+            continue
+        print("  ".join(f"{row[name]:<{width}{fmt}}" if name == "scenario" else f"{row[name]:>{width}{fmt}}"
+                        for name, width, fmt in columns))
+    for row in results:
+        if row.get("error"):
+            print(f"{row['scenario']} x {row['size']} raised {row['error']}")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenarios", nargs="+", choices=list(SCENARIOS), default=list(SCENARIOS))
+    parser.add_argument("--sizes", nargs="+", type=int, default=[10, 100, 1000])
+    parser.add_argument("--start", default="2024-01-01", help="first day of the downloaded history")
+    parser.add_argument("--end", default="2024-12-31", help="last day of the downloaded history")
+    parser.add_argument("--latency", type=float, default=0.02, help="seconds the mock waits before answering")
+    parser.add_argument("--jitter", type=float, default=0.0, help="extra uniformly random seconds of latency")
+    parser.add_argument("--forbidden-rate", type=float, default=0.0, help="share of data requests answered with 403")
+    parser.add_argument("--token-lifetime", type=float, default=0.0,
+                        help="seconds before the mock rotates the BSE form tokens (0: never)")
+    parser.add_argument("--bse-format", choices=["csv", "html"], default="csv", help="BSE download response format")
+    parser.add_argument("--repeat", type=int, default=5, help="panel builds per panel run")
+    parser.add_argument("--json", help="also write the results to this file")
+    parser.add_argument("--verbose", action="store_true", help="show the scrapers' own output")
+    # Internal: run a single scenario in this process
+    parser.add_argument("--child", choices=list(SCENARIOS), help=argparse.SUPPRESS)
+    parser.add_argument("--size", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--base-url", help=argparse.SUPPRESS)
+    parser.add_argument("--out", help=argparse.SUPPRESS)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.child:
+        return child(args)
+
+    results = []
+    with MockServer(latency=args.latency, jitter=args.jitter, forbidden_rate=args.forbidden_rate,
+                    bse_format=args.bse_format, token_lifetime=args.token_lifetime) as server:
+        for scenario in args.scenarios:
+            for size in args.sizes:
+                print(f"running {scenario} x {size}", file=sys.stderr)
+                results.append(run_one(scenario, size, server.base_url, args))
+
+    print_table(results)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+"""
+Import-time benchmark: how long each entry module takes to import in a fresh
+interpreter, which heavy dependencies the import drags in, and whether it
+touches the network.
+
+    python -m benchmarks.startup
+    python -m benchmarks.startup --modules investoscrapo search_service --repeat 10 --check
+
+Each import runs in its own interpreter with socket connects, DNS lookups and
+curl_cffi transfers replaced by a recorder that refuses them, so a module that
+talks to the network at import shows up in the `network` column (and usually
+fails). --check exits non-zero if any import made a network call or
+`investoscrapo` took longer than --budget seconds.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+MODULES = [
+    "investoscrapo",
+    "investoscrapo.client",
+    "bse_scraper.BSE_Client",
+    "nse_scraper.NSE_Client",
+    "yfin_search",
+    "source_clients",
+    "search_service",
+    "download_router",
+]
+
+HEAVY = ["pandas", "curl_cffi", "bs4", "yahooquery"]
+
+# Runs in the child: refuse and count network access, then time one import.
+# curl_cffi opens its sockets inside libcurl, so Curl.perform is patched too, as
+# soon as curl_cffi.curl is imported (importing it up front would skew the timing).
+PROBE = """
+import importlib.abc, importlib.util, json, socket, sys, time
+attempts = []
+def refuse(*args, **kwargs):
+    attempts.append(repr(args[1:2] or args[:1]))
+    raise OSError("network access during import")
+socket.socket.connect = refuse
+socket.socket.connect_ex = refuse
+socket.getaddrinfo = refuse
+
+class PatchCurl(importlib.abc.MetaPathFinder):
+    def find_spec(self, name, path, target=None):
+        if name != "curl_cffi.curl":
+            return None
+        sys.meta_path.remove(self)
+        spec = importlib.util.find_spec(name)
+        exec_module = spec.loader.exec_module
+        def patched(module):
+            exec_module(module)
+            module.Curl.perform = refuse
+        spec.loader.exec_module = patched
+        return spec
+sys.meta_path.insert(0, PatchCurl())
+
+start = time.perf_counter()
+error = None
+try:
+    __import__({module!r})
+except BaseException as e:
+    error = f"{{type(e).__name__}}: {{e}}"
+seconds = time.perf_counter() - start
+print(json.dumps({{"seconds": seconds, "network": len(attempts), "error": error,
+                  "loaded": [name for name in {heavy!r} if name in sys.modules]}}))
+"""
+
+
+def measure(module: str) -> dict:
+    code = PROBE.format(module=module, heavy=HEAVY)
+    completed = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True)
+    lines = completed.stdout.strip().splitlines()
+    if not lines:
+        return {"seconds": float("nan"), "network": 0, "error": completed.stderr.strip()[-200:], "loaded": []}
+    return json.loads(lines[-1])
+
+
+def run(modules, repeat: int) -> list[dict]:
+    results = []
+    for module in modules:
+        runs = [measure(module) for _ in range(repeat)]
+        results.append({
+            "module": module,
+            "median_s": statistics.median(run["seconds"] for run in runs),
+            "max_s": max(run["seconds"] for run in runs),
+            "network": max(run["network"] for run in runs),
+            "loaded": runs[-1]["loaded"],
+            "error": runs[-1]["error"],
+        })
+    return results
+
+
+def print_table(results: list[dict]):
+    print(f"{'module':<26}  {'median_s':>8}  {'max_s':>8}  {'network':>7}  heavy imports")
+    for row in results:
+        print(f"{row['module']:<26}  {row['median_s']:>8.3f}  {row['max_s']:>8.3f}  {row['network']:>7}  "
+              f"{', '.join(row['loaded']) or '-'}")
+    for row in results:
+        if row["error"]:
+            print(f"{row['module']} raised {row['error']}")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--modules", nargs="+", default=MODULES)
+    parser.add_argument("--repeat", type=int, default=5, help="fresh interpreters per module")
+    parser.add_argument("--budget", type=float, default=1.0, help="seconds allowed for importing investoscrapo")
+    parser.add_argument("--check", action="store_true", help="exit 1 on network access or a blown budget")
+    parser.add_argument("--json", help="also write the results to this file")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    results = run(args.modules, args.repeat)
+    print_table(results)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if args.check:
+        failures = [f"{row['module']} made {row['network']} network calls" for row in results if row["network"]]
+        failures += [f"{row['module']} took {row['max_s']:.3f}s" for row in results
+                     if row["module"] == "investoscrapo" and row["max_s"] > args.budget]
+        for failure in failures:
+            print(failure, file=sys.stderr)
+        return 1 if failures else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -5,14 +5,25 @@ import math
 import time
 import pandas as pd
 from urllib.parse import urlencode, quote_plus
-from datetime import datetime
+from datetime import date, datetime, timedelta
 from concurrent.futures import ThreadPoolExecutor, ALL_COMPLETED, as_completed, wait
 import random
 from bs4 import BeautifulSoup, Tag
-from bse_scraper.bsescraper.configs.constants import HOME_URL, HISTORICAL_DATA_URL, SEARCH_URL,BROWSER_IMPERSONATION, user_agents, keep_cols, delay_range
+from bse_scraper.bsescraper.configs.constants import HOME_URL, HISTORICAL_DATA_URL, SEARCH_URL,BROWSER_IMPERSONATION, user_agents, keep_cols, history_columns, rate_limits, cookie_ttl, html_parser, panel_fields, panel_id_cols, BHAVCOPY_URLS, bhavcopy_chunk_days
 from bse_scraper.bsescraper.utils.logger import get_logger
+from bse_scraper.bsescraper.utils.bhavcopy import COLUMNS as BHAVCOPY_COLUMNS, bhavcopy_format, read_bhavcopy
+from bse_scraper.bsescraper.utils.form_tokens import FormTokenCache, extract_form_tokens, tokens_rejected
+from bse_scraper.bsescraper.utils.parsers import parse_history_csv, parse_history_table, resolve_parser
+from investoscrapo.utils.cache import get_cache, merge_intervals, to_date
+from investoscrapo.utils.session_pool import get_session_pool
+from investoscrapo.utils.streaming import stream_map
+from investoscrapo.utils.cookie_store import cookie_expiry
+from investoscrapo.utils.history_client import HistoryClient
+from investoscrapo.utils.identity_map import remember
+from investoscrapo.utils.ratelimit import configure_limits, get_limiter, retry_after_seconds
 
 logging = get_logger(__name__)
+configure_limits(rate_limits)
 
 def get_headers():
     return {
@@ -54,19 +65,31 @@ def get_headers_adjusted(params):
     "User-Agent": random.choice(user_agents),
     }
 
-def add_delay():
-            """Add random delay to avoid rate limiting."""
-            delay = random.uniform(*delay_range)
-            time.sleep(delay)
+def empty_history(scrip_dict):
+    """A download with no rows, in the columns of a non-empty one."""
+    df = pd.DataFrame({col: pd.Series(dtype="datetime64[ns]" if col == 'Date' else float) for col in history_columns})
+    df['Symbol'] = pd.Series(dtype=object)
+    df['ScripCode'] = pd.Series(dtype=object)
+    return df
 
+class bse_scraper(HistoryClient):
 
-class bse_scraper():
+    source = "bse"
+    panel_fields = panel_fields
+    panel_id_cols = panel_id_cols
+    panel_date_format = "%d/%m/%Y"
 
-    def __init__(self):       
+    def __init__(self, use_cache: bool = True, parser: str = html_parser):       
         self.session = requests.Session()
         self.session.headers.update(get_headers())
         self.max_retries = 3
         self.cookies = None
+        self.cookie_expires_at = None
+        self.cache = get_cache() if use_cache else None
+        self.pool = get_session_pool(self.source, BROWSER_IMPERSONATION)
+        # HTML backend for the price-history table: "auto", "selectolax", "lxml" or "bs4"
+        self.parser = resolve_parser(parser)
+        self.form_tokens = FormTokenCache()
 
     def fetch_cookies(self):
         """Fetch initial cookies and bypass Cloudflare if needed."""
@@ -86,7 +109,8 @@ class bse_scraper():
                             response = s.get(HOME_URL, timeout=30)
                     
                     if response.status_code == 200:
-                        self.cookies = self.session.cookies.get_dict()
+                        self.cookies = s.cookies.get_dict()
+                        self.cookie_expires_at = cookie_expiry(s.cookies, cookie_ttl)
                         logging.info("Successfully fetched cookies")
                         return self.cookies
                     else:
@@ -115,11 +139,15 @@ class bse_scraper():
                   "text": search_term,
                   "flag": "site"}
         suggestions = []
+        if not self.cookies:
+            self.get_cookies()
         try:
-            add_delay()  # Add delay between requests to mimic human behavior
+            limiter = get_limiter(SEARCH_URL)
+            limiter.acquire()  # Wait for the shared per-host token bucket
             self.session.cookies.update(self.cookies)
             
             response = self.session.get(SEARCH_URL, params=params, timeout=30)
+            limiter.feedback(response.status_code, retry_after_seconds(response))
             
             if response.status_code == 200:
                 try:
@@ -149,6 +177,7 @@ class bse_scraper():
                             "isin": isin,
                             "id": scrip_code}
                         suggestions.append(co_dict)
+                    remember([{**co_dict, "exchange": "BSE", "type": "Stock - BSE"} for co_dict in suggestions], self.source)
                     return suggestions
 
                 except ValueError as ve:
@@ -157,6 +186,7 @@ class bse_scraper():
             
             elif response.status_code == 403:
                 logging.warning("Access forbidden. Updating cookies and retrying...")
+                self.get_cookies(stale=self.cookies)
 
             else:
                 logging.error(
@@ -167,7 +197,108 @@ class bse_scraper():
             print(f"Error with search URL {SEARCH_URL}: {e}")
             return None
 
-    def request_data(self, scrip_dict, start_date, end_date):
+    @staticmethod
+    def tag(df, scrip_dict):
+        """Label cached rows with the scrip asked for; rows loaded from a bhavcopy carry BSE's short name instead."""
+        if df is not None and not df.empty:
+            df['Symbol'] = scrip_dict.get('description', 'Unknown')
+            df['ScripCode'] = scrip_dict['id']
+        return df
+
+    @staticmethod
+    def describe(scrip_dict) -> str:
+        return f"{scrip_dict.get('description', 'Unknown')} (ID: {scrip_dict['id']})"
+
+    def fetch_bhavcopy(self, day):
+        """
+        Every scrip's prices on day from BSE's bhavcopy, in the columns request_data
+        stores. An empty frame means BSE has no file for the day (a holiday); None
+        means the download failed.
+        """
+        url = BHAVCOPY_URLS[bhavcopy_format(day)].format(day=day)
+        limiter = get_limiter(url)
+
+        for attempt in range(self.max_retries):
+            try:
+                limiter.acquire()
+                with self.pool.session() as s:
+                    response = s.get(url, headers={**get_headers(), "Referer": HOME_URL}, timeout=60)
+                limiter.feedback(response.status_code, retry_after_seconds(response))
+
+                if response.status_code == 200:
+                    return read_bhavcopy(response.content, day)
+                if response.status_code == 404:
+                    logging.info(f"No bhavcopy for {day}")
+                    return pd.DataFrame(columns=BHAVCOPY_COLUMNS)
+                logging.warning(f"Bhavcopy for {day} failed with status code {response.status_code}")
+
+            except Exception as e:
+                logging.error(f"Bhavcopy for {day}, attempt {attempt + 1} failed with error: {str(e)}")
+
+        return None
+
+    def ingest_bhavcopies(self, start_date, end_date, scrip_codes=None, chunk_days: int = bhavcopy_chunk_days,
+                          max_workers: int = 4) -> dict:
+        """
+        Fill the cache request_data reads from with BSE's daily bhavcopies: one
+        request per trading day for the whole market, instead of a VIEWSTATE GET
+        and a POST per scrip.
+
+        Weekdays are fetched max_workers at a time and written chunk_days at a time,
+        every scrip's rows merged into its cached frame in one transaction. Once all
+        rows are in, the days are marked covered for every scrip seen: a weekday with
+        no bhavcopy (a holiday) counts as covered with no rows, as do weekends, which
+        are not requested; a day whose download failed stays missing, so request_data
+        downloads it later. scrip_codes limits which scrips are stored. A full-market
+        backfill outgrows the default cache_max_bytes within a few years.
+
+        Returns:
+            dict: requests made, files loaded, failed dates and scrips written
+        """
+        if self.cache is None:
+            raise ValueError("Bhavcopy ingestion writes to the cache; create the scraper with use_cache=True")
+
+        start, end = to_date(start_date), min(to_date(end_date), date.today())
+        wanted = None if scrip_codes is None else {str(code) for code in scrip_codes}
+        summary = {"requests": 0, "loaded": 0, "failed": [], "scrips": set()}
+        known = []
+
+        while start <= end:
+            chunk_end = min(end, start + timedelta(days=chunk_days - 1))
+            days = [start + timedelta(days=i) for i in range((chunk_end - start).days + 1)]
+            known += [day for day in days if day.weekday() >= 5]
+            frames = []
+
+            for day, df in stream_map(self.fetch_bhavcopy, [day for day in days if day.weekday() < 5], max_workers):
+                summary["requests"] += 1
+                if df is None or (df.empty and day == date.today()):
+                    # Today's file is published after the close; until then it is missing, not a holiday
+                    summary["failed"].append(day.isoformat())
+                    continue
+                known.append(day)
+                if not df.empty:
+                    summary["loaded"] += 1
+                    frames.append(df if wanted is None else df[df["ScripCode"].isin(wanted)])
+
+            rows = pd.concat(frames, ignore_index=True) if frames else None
+            if rows is not None and not rows.empty:
+                per_scrip = {code: group for code, group in rows.groupby("ScripCode", sort=False)}
+                self.cache.put_many(self.source, per_scrip, [], date_col="Date")
+                summary["scrips"].update(per_scrip)
+            logging.info(f"Bhavcopies {start} to {chunk_end}: {len(frames)} files, "
+                         f"{0 if rows is None else len(rows)} rows")
+            start = chunk_end + timedelta(days=1)
+
+        if summary["scrips"] and known:
+            ranges = merge_intervals((day, day) for day in known)
+            self.cache.put_many(self.source, dict.fromkeys(summary["scrips"]), ranges, date_col="Date")
+        summary["failed"].sort()
+        summary["scrips"] = len(summary["scrips"])
+        if summary["failed"]:
+            logging.warning(f"No bhavcopy could be downloaded for {summary['failed']}")
+        return summary
+
+    def download_data(self, scrip_dict, start_date, end_date):
         """
         Fetch historical data for a given scrip between specified dates.
         
@@ -177,11 +308,12 @@ class bse_scraper():
             end_date: End date in format 'YYYY-MM-DD'
         
         Returns:
-            pandas.DataFrame: Historical price data
+            pandas.DataFrame: Historical price data (no rows when the range has no
+            trading days), or None if the download failed
         """
         
         if not self.cookies:
-            self.cookies = self.fetch_cookies()
+            self.get_cookies()
         
         scrip_url = HISTORICAL_DATA_URL
         params = {
@@ -192,270 +324,219 @@ class bse_scraper():
         }
         
         headers = get_headers_adjusted(params)
+        limiter = get_limiter(scrip_url)
         
         for attempt in range(self.max_retries):
             try:
-                add_delay()
-                with requests.Session(impersonate=random.choice(BROWSER_IMPERSONATION)) as s:
+                with self.pool.session() as s:
                     
-                    # Update headers and cookies
+                    # Update headers and cookies on the pooled session
                     s.headers.update(headers)
-                    s.cookies.update(self.cookies)        
+                    cookies = self.cookies
+                    s.cookies.update(cookies)        
                     logging.info(f"Fetching data for {scrip_dict.get('description', 'Unknown')} (ID: {scrip_dict['id']}) - Attempt {attempt + 1}")
                     
-                    # Initial GET request to get form data
-                    get_response = s.get(scrip_url, params=params, timeout=30)
-
-                    if get_response.status_code == 200:
-                        logging.info("Status code 200: Initial response received.")
+                    # The form tokens are the same for every scrip and date range, so the
+                    # GET that produces them is skipped while the cached ones are accepted
+                    tokens = self.form_tokens.get()
+                    reused_tokens = tokens is not None
+                    
+                    if tokens is None:
+                        # Initial GET request to get form data
+                        limiter.acquire()
+                        get_response = s.get(scrip_url, params=params, timeout=30)
+                        limiter.feedback(get_response.status_code, retry_after_seconds(get_response))
                         
-                        get_soup = BeautifulSoup(get_response.text, "html.parser")
+                        if get_response.status_code != 200:
+                            logging.warning(f"Initial request failed with status code {get_response.status_code}")
+                            if get_response.status_code == 403:
+                                logging.info("Access forbidden - refreshing cookies...")
+                                self.get_cookies(stale=cookies)
+                            continue
                         
-                        # Extract required form fields
-                        viewstate = get_soup.select_one('input[name="__VIEWSTATE"]')
-                        eventvalidation = get_soup.select_one('input[name="__EVENTVALIDATION"]')
-                        viewstategenerator = get_soup.select_one('input[name="__VIEWSTATEGENERATOR"]')
+                        logging.info("Status code 200: Initial response received.")
                         
-                        if not all([viewstate, eventvalidation, viewstategenerator]):
+                        # Extract required form fields
+                        tokens = extract_form_tokens(get_response.text)
+                        if tokens is None:
                             logging.error("Failed to extract required form fields")
                             continue
                         
-                        viewstate_val = viewstate['value']
-                        eventvalidation_val = eventvalidation['value']
-                        viewstategenerator_val = viewstategenerator['value']
-                        
+                        self.form_tokens.put(tokens)
                         logging.info("All payloads extracted successfully")
+                    else:
+                        logging.info("Reusing cached form tokens")
+                    
+                    # Parse and format dates
+                    start_date_obj = datetime.strptime(start_date, "%Y-%m-%d")
+                    end_date_obj = datetime.strptime(end_date, "%Y-%m-%d")
+                    
+                    # Format dates for BSE (DD/MM/YYYY)
+                    bse_start_date = start_date_obj.strftime("%d/%m/%Y")
+                    bse_end_date = end_date_obj.strftime("%d/%m/%Y")
+                    
+                    # Current timestamp for BSE format
+                    current_timestamp = datetime.now().strftime("%d/%m/%Y 12:00:00 AM")
+                    
+                    logging.info(f"Date range: {bse_start_date} to {bse_end_date}")
+                    
+                    # Construct the final payload for POST request
+                    final_payload = {
+                        "__EVENTTARGET": "",
+                        "__EVENTARGUMENT": "",
+                        "__VIEWSTATE": tokens["__VIEWSTATE"],
+                        "__VIEWSTATEGENERATOR": tokens["__VIEWSTATEGENERATOR"],
+                        "__VIEWSTATEENCRYPTED": "",
+                        "__EVENTVALIDATION": tokens["__EVENTVALIDATION"],
                         
-                        # Parse and format dates
-                        start_date_obj = datetime.strptime(start_date, "%Y-%m-%d")
-                        end_date_obj = datetime.strptime(end_date, "%Y-%m-%d")
+                        # Core scrip and date fields
+                        "ctl00$ContentPlaceHolder1$hdnCode": scrip_dict["id"],
+                        "ctl00$ContentPlaceHolder1$hiddenScripCode": scrip_dict["id"],
+                        "ctl00$ContentPlaceHolder1$hidCompanyVal": scrip_dict["description"],
                         
-                        # Format dates for BSE (DD/MM/YYYY)
-                        bse_start_date = start_date_obj.strftime("%d/%m/%Y")
-                        bse_end_date = end_date_obj.strftime("%d/%m/%Y")
+                        # Date-related fields
+                        "ctl00$ContentPlaceHolder1$txtFromDate": bse_start_date,
+                        "ctl00$ContentPlaceHolder1$txtToDate": bse_end_date,
+                        "ctl00$ContentPlaceHolder1$hidFromDate": bse_start_date,
+                        "ctl00$ContentPlaceHolder1$hidToDate": bse_end_date,
+                        "ctl00$ContentPlaceHolder1$hidCurrentDate": current_timestamp,
                         
-                        # Current timestamp for BSE format
-                        current_timestamp = datetime.now().strftime("%d/%m/%Y 12:00:00 AM")
+                        # Frequency selection - IMPORTANT: This ensures daily data
+                        "ctl00$ContentPlaceHolder1$DMY": "rdbDaily",
+                        "ctl00$ContentPlaceHolder1$hidDMY": "D",
+                        "ctl00$ContentPlaceHolder1$hdflag": "0",
                         
-                        logging.info(f"Date range: {bse_start_date} to {bse_end_date}")
+                        # Search fields
+                        "ctl00$ContentPlaceHolder1$smartSearch": scrip_dict["description"],
+                        "ctl00$ContentPlaceHolder1$scripname": scrip_dict["description"],
+                        "ctl00$ContentPlaceHolder1$Hidden4": scrip_dict["description"],
                         
-                        # Construct the final payload for POST request
-                        final_payload = {
-                            "__EVENTTARGET": "",
-                            "__EVENTARGUMENT": "",
-                            "__VIEWSTATE": viewstate_val,
-                            "__VIEWSTATEGENERATOR": viewstategenerator_val,
-                            "__VIEWSTATEENCRYPTED": "",
-                            "__EVENTVALIDATION": eventvalidation_val,
-                            
-                            # Core scrip and date fields
-                            "ctl00$ContentPlaceHolder1$hdnCode": scrip_dict["id"],
-                            "ctl00$ContentPlaceHolder1$hiddenScripCode": scrip_dict["id"],
-                            "ctl00$ContentPlaceHolder1$hidCompanyVal": scrip_dict["description"],
-                            
-                            # Date-related fields
-                            "ctl00$ContentPlaceHolder1$txtFromDate": bse_start_date,
-                            "ctl00$ContentPlaceHolder1$txtToDate": bse_end_date,
-                            "ctl00$ContentPlaceHolder1$hidFromDate": bse_start_date,
-                            "ctl00$ContentPlaceHolder1$hidToDate": bse_end_date,
-                            "ctl00$ContentPlaceHolder1$hidCurrentDate": current_timestamp,
-                            
-                            # Frequency selection - IMPORTANT: This ensures daily data
-                            "ctl00$ContentPlaceHolder1$DMY": "rdbDaily",
-                            "ctl00$ContentPlaceHolder1$hidDMY": "D",
-                            "ctl00$ContentPlaceHolder1$hdflag": "0",
-                            
-                            # Search fields
-                            "ctl00$ContentPlaceHolder1$smartSearch": scrip_dict["description"],
-                            "ctl00$ContentPlaceHolder1$scripname": scrip_dict["description"],
-                            "ctl00$ContentPlaceHolder1$Hidden4": scrip_dict["description"],
-                            
-                            # Settlement calendar
-                            "ctl00$ContentPlaceHolder1$ddlsetllementcal": "0",
-                            
-                            # Other required fields
-                            "ctl00$ContentPlaceHolder1$DDate": "",
-                            "ctl00$ContentPlaceHolder1$hidYear": "",
-                            "ctl00$ContentPlaceHolder1$hidOldDMY": "",
-                            "ctl00$ContentPlaceHolder1$Hidden1": "",
-                            
-                            # Submit button - this should trigger the CSV download
-                            "ctl00$ContentPlaceHolder1$btnSubmit": "Submit"
-                        }
+                        # Settlement calendar
+                        "ctl00$ContentPlaceHolder1$ddlsetllementcal": "0",
                         
-                        # Make the final POST request
-                        query_string = urlencode(params)
-                        scrip_url_final = f"{scrip_url}?{query_string}"
+                        # Other required fields
+                        "ctl00$ContentPlaceHolder1$DDate": "",
+                        "ctl00$ContentPlaceHolder1$hidYear": "",
+                        "ctl00$ContentPlaceHolder1$hidOldDMY": "",
+                        "ctl00$ContentPlaceHolder1$Hidden1": "",
                         
-                        logging.info("Submitting final request for historical data...")
-                        final_response = s.post(scrip_url_final, data=final_payload, timeout=60)
+                        # Submit button - this should trigger the CSV download
+                        "ctl00$ContentPlaceHolder1$btnSubmit": "Submit"
+                    }
+                    
+                    # Make the final POST request
+                    query_string = urlencode(params)
+                    scrip_url_final = f"{scrip_url}?{query_string}"
+                    
+                    logging.info("Submitting final request for historical data...")
+                    limiter.acquire()
+                    final_response = s.post(scrip_url_final, data=final_payload, timeout=60)
+                    limiter.feedback(final_response.status_code, retry_after_seconds(final_response))
+                    
+                    if reused_tokens and tokens_rejected(final_response):
+                        logging.info("Cached form tokens were rejected - fetching the form again...")
+                        self.form_tokens.invalidate(tokens)
+                        continue
+                    
+                    if final_response.status_code == 200:
+                        logging.info("Final response received successfully")
                         
-                        if final_response.status_code == 200:
-                            logging.info("Final response received successfully")
-                            
-                            # Check if response is CSV data
-                            content_type = final_response.headers.get('content-type', '').lower()
-                            content_disposition = final_response.headers.get('content-disposition', '')
+                        # Check if response is CSV data
+                        content_type = final_response.headers.get('content-type', '').lower()
+                        content_disposition = final_response.headers.get('content-disposition', '')
+                        
+                        if 'excel' in content_type or 'csv' in content_disposition:
+                            logging.info("✅ Received CSV data response")
                             
-                            if 'excel' in content_type or 'csv' in content_disposition:
-                                logging.info("✅ Received CSV data response")
+                            if not final_response.content.strip():
+                                # No trading days in the range: an empty result, not a failure
+                                logging.info("CSV data is empty - no trading days in the range")
+                                return empty_history(scrip_dict)
+
+                            try:
+                                # Parse the CSV body directly; numbers and dates are converted while reading
+                                numeric_cols = ['Open', 'High', 'Low', 'Close', 'Last', 'Prevclose', 'Volume', 'Turnover']
+                                df = parse_history_csv(final_response.content, numeric_cols)
+                                logging.info(f"✅ Successfully parsed CSV with {len(df)} rows")
                                 
-                                try:
-                                    # Parse CSV data using pandas
-                                    from io import StringIO
-                                    csv_data = StringIO(final_response.text)
-                                    
-                                    # Read CSV with pandas
-                                    df = pd.read_csv(csv_data, parse_dates=['Date'], dayfirst=True)
+                                if 'Date' in df.columns:
+                                    # Filter data to requested date range
+                                    df = df[
+                                        (df['Date'] >= start_date_obj) & 
+                                        (df['Date'] <= end_date_obj)
+                                    ]
                                     
-                                    if len(df) > 0:
-                                        logging.info(f"✅ Successfully parsed CSV with {len(df)} rows")
-                                        
-                                        # Clean column names (remove extra spaces)
-                                        df.columns = df.columns.str.strip()
-                                        
-                                        # Ensure Date column is properly formatted
-                                        if 'Date' in df.columns:
-                                            df['Date'] = pd.to_datetime(df['Date'], dayfirst=True, errors='coerce')
-                                            
-                                            # Filter data to requested date range
-                                            df = df[
-                                                (df['Date'] >= start_date_obj) & 
-                                                (df['Date'] <= end_date_obj)
-                                            ]
-                                            
-                                            # Sort by date
-                                            df = df.sort_values('Date')
-                                        
-                                        # Convert numeric columns (handle commas in numbers)
-                                        numeric_cols = ['Open', 'High', 'Low', 'Close', 'Last', 'Prevclose', 'Volume', 'Turnover']
-                                        for col in numeric_cols:
-                                            if col in df.columns:
-                                                # Remove commas and convert to numeric
-                                                df[col] = df[col].astype(str).str.replace(',', '').str.replace('-', '0')
-                                                df[col] = pd.to_numeric(df[col], errors='coerce')
-                                        
-                                        # Add symbol information
-                                        df['Symbol'] = scrip_dict.get('description', 'Unknown')
-                                        df['ScripCode'] = scrip_dict['id']
-                                        
-                                        # Remove any completely empty rows
-                                        df = df.dropna(how='all')
-                                        
-                                        logging.info(f"✅ Data processing complete. Final dataset has {len(df)} rows")
-                                        logging.info(f"Date range in data: {df['Date'].min()} to {df['Date'].max()}")
-                                        
-                                        return df
-                                    else:
-                                        logging.warning("CSV data is empty")
-                                        
-                                except Exception as csv_error:
-                                    logging.error(f"Error parsing CSV data: {str(csv_error)}")
-                                    # Fallback: save raw response for debugging
-                                    with open(f"debug_csv_{scrip_dict['id']}.txt", "w", encoding="utf-8") as f:
-                                        f.write(final_response.text)
-                                    logging.info("Raw CSV response saved for debugging")
-                            
-                            else:
-                                logging.info("Response is HTML, attempting to parse tables...")
+                                    # Sort by date
+                                    df = df.sort_values('Date')
                                 
-                                # Parse the response as HTML (fallback)
-                                final_soup = BeautifulSoup(final_response.text, "html.parser")
+                                # Add symbol information
+                                df['Symbol'] = scrip_dict.get('description', 'Unknown')
+                                df['ScripCode'] = scrip_dict['id']
                                 
-                                # Find the data table - look for table with historical data
-                                data_table = None
-                                tables = final_soup.find_all("table")
+                                # Remove any completely empty rows
+                                df = df.dropna(how='all')
                                 
-                                for table in tables:
-                                    table_text = table.get_text()
-                                    if "Date" in table_text and ("Open" in table_text or "Close" in table_text):
-                                        # Check if this table has actual data rows
-                                        data_rows = table.find_all("tr")
-                                        if data_rows:
-                                            data_table = table
-                                            break
+                                logging.info(f"✅ Data processing complete. Final dataset has {len(df)} rows")
+                                if len(df):
+                                    logging.info(f"Date range in data: {df['Date'].min()} to {df['Date'].max()}")
                                 
-                                if data_table:
-                                    logging.info("✅ Found the target data table in HTML")
+                                return df
                                     
-                                    # Extract headers
-                                    headers = []
-                                    header_rows = data_table.find_all("tr")
-                                    
-                                    for row in header_rows:
-                                        header_cells = row.find_all("td", class_="innertable_header1")
-                                        if header_cells:
-                                            headers = [cell.get_text(strip=True).replace('\n', ' ') for cell in header_cells]
-                                            headers.remove("* Spread")
-                                            break
-                                    
-                                    if not headers:
-                                        # Fallback header extraction
-                                        headers = None
-                                    
-                                    logging.info(f"Headers extracted: {headers}")
-                                    
-                                    # Extract data rows
-                                    data_rows = data_table.find_all("tr", class_="TTRow")
-                                    all_data = []
-                                    
-                                    for row in data_rows:
-                                        cols = row.find_all("td")
-                                        if len(cols) >= 5:  # Ensure we have enough columns
-                                            row_data = [col.get_text(strip=True) for col in cols]
-                                            all_data.append(row_data)
-                                    
-                                    if all_data:
-                                        logging.info(f"✅ Extracted {len(all_data)} data rows from HTML")
-                                        # Create DataFrame
-                                        df = pd.DataFrame(all_data, columns=headers)
-                                        # Clean and process the data
-                                        if 'Date' in df.columns:
-                                            # Convert date column to datetime
-                                            df['Date'] = pd.to_datetime(df['Date'], format='%d/%m/%Y', errors='coerce')
-                                            
-                                            # Filter data to requested date range
-                                            df = df[
-                                                (df['Date'] >= start_date_obj) & 
-                                                (df['Date'] <= end_date_obj)
-                                            ]
-                                            
-                                            # Sort by date
-                                            df = df.sort_values('Date')
-                                        
-                                        # Convert numeric columns
-                                        for col in keep_cols:
-                                            if col in df.columns:
-                                                df[col] = pd.to_numeric(df[col].str.replace(',', ''), errors='coerce')
-                                        
-                                        # Add symbol information
-                                        df['Symbol'] = scrip_dict.get('description', 'Unknown')
-                                        df['ScripCode'] = scrip_dict['id']
-                                        
-                                        logging.info(f"✅ Data processing complete. Final dataset has {len(df)} rows")
-                                        return df
-                                    
-                                    else:
-                                        logging.warning("No data rows found in the HTML table")
-                                
-                                else:
-                                    logging.warning("Could not find data table in HTML response")
-                                    # Debug: Save response to file for inspection
-                                    with open(f"debug_response_{scrip_dict['id']}.html", "w", encoding="utf-8") as f:
-                                        f.write(final_response.text)
-                                    logging.info("Response saved to debug file for inspection")
+                            except Exception as csv_error:
+                                logging.error(f"Error parsing CSV data: {str(csv_error)}")
+                                # Fallback: save raw response for debugging
+                                with open(f"debug_csv_{scrip_dict['id']}.txt", "w", encoding="utf-8") as f:
+                                    f.write(final_response.text)
+                                logging.info("Raw CSV response saved for debugging")
                         
                         else:
-                            logging.warning(f"Final request failed with status code {final_response.status_code}")
-                            if final_response.status_code == 403:
-                                logging.info("Access forbidden - refreshing cookies...")
-                                self.cookies = self.fetch_cookies()
+                            logging.info(f"Response is HTML, parsing the data table with {self.parser}...")
+                            
+                            # Reads the header row and the TTRow data rows straight into columns
+                            df = parse_history_table(final_response.text, self.parser)
                             
+                            if df is None:
+                                logging.warning("Could not find data table in HTML response")
+                                # Debug: Save response to file for inspection
+                                with open(f"debug_response_{scrip_dict['id']}.html", "w", encoding="utf-8") as f:
+                                    f.write(final_response.text)
+                                logging.info("Response saved to debug file for inspection")
+                            
+                            else:
+                                # A table without data rows is a range with no trading days, not a failure
+                                logging.info(f"✅ Extracted {len(df)} data rows from HTML")
+                                # Clean and process the data
+                                if 'Date' in df.columns:
+                                    # Convert date column to datetime
+                                    df['Date'] = pd.to_datetime(df['Date'], format='%d/%m/%Y', errors='coerce')
+                                    
+                                    # Filter data to requested date range
+                                    df = df[
+                                        (df['Date'] >= start_date_obj) & 
+                                        (df['Date'] <= end_date_obj)
+                                    ]
+                                    
+                                    # Sort by date
+                                    df = df.sort_values('Date')
+                                
+                                # Convert numeric columns
+                                for col in keep_cols:
+                                    if col in df.columns:
+                                        df[col] = pd.to_numeric(df[col].str.replace(',', ''), errors='coerce')
+                                
+                                # Add symbol information
+                                df['Symbol'] = scrip_dict.get('description', 'Unknown')
+                                df['ScripCode'] = scrip_dict['id']
+                                
+                                logging.info(f"✅ Data processing complete. Final dataset has {len(df)} rows")
+                                return df
+                    
                     else:
-                        logging.warning(f"Initial request failed with status code {get_response.status_code}")
-                        if get_response.status_code == 403:
+                        logging.warning(f"Final request failed with status code {final_response.status_code}")
+                        if final_response.status_code == 403:
                             logging.info("Access forbidden - refreshing cookies...")
-                            self.cookies = self.fetch_cookies()
+                            self.get_cookies(stale=cookies)
+                        
             
             except Exception as e:
                 logging.error(f"Attempt {attempt + 1} failed with error: {str(e)}")
@@ -11,8 +11,39 @@ user_agents = [
     # Add more recent versions if needed
             ]
 
-delay_range = (2, 5)
+# Token-bucket limits per host: (requests per second, burst, max requests per second)
+rate_limits = {
+    "www.bseindia.com": (0.5, 2, 2.0),
+    "api.bseindia.com": (1.0, 3, 3.0),
+}
 
 max_attempts = 3
 
-keep_cols = [['Open', 'High', 'Low', 'Close', 'Volume']]
\ No newline at end of file
+# Seconds the StockPrcHistori form tokens are reused before the form is fetched again
+form_token_ttl = 20 * 60
+
+# Seconds fetched cookies are reused when the site sets no earlier expiry
+cookie_ttl = 30 * 60
+
+keep_cols = ['Open', 'High', 'Low', 'Close', 'Volume']
+
+# Columns of the price-history download, given to an empty result (a holiday or a suspended scrip)
+history_columns = ['Date', 'Open', 'High', 'Low', 'Close', 'WAP', 'Volume', 'No. of Trades', 'Turnover',
+                   'Deliverable Quantity', '% Deli. Qty to Traded Qty']
+
+# Fields and identifiers of the Date-aligned panel returned by download_many
+panel_fields = ['Close', 'Volume']
+panel_id_cols = ['Symbol', 'ScripCode']
+
+# Backend for the HTML price-history table; "auto" picks selectolax, then lxml, then bs4
+html_parser = "auto"
+# Daily equity bhavcopy: every scrip's prices for one trading day in one file.
+# UDiFF CSVs from udiff_start on, zipped EQ CSVs before
+BHAVCOPY_URLS = {
+    "udiff": "https://www.bseindia.com/download/BhavCopy/Equity/BhavCopy_BSE_CM_0_0_0_{day:%Y%m%d}_F_0000.CSV",
+    "eq": "https://www.bseindia.com/download/BhavCopy/Equity/EQ{day:%d%m%y}_CSV.ZIP",
+}
+udiff_start = "2024-07-08"
+
+# Calendar days of bhavcopies parsed before their rows are written to the cache
+bhavcopy_chunk_days = 90
@@ -0,0 +1,57 @@
+"""
+Parser for BSE's daily equity bhavcopy: every scrip's prices for one trading
+day in one file. BSE has published it in two layouts:
+
+- UDiFF (from udiff_start): BhavCopy_BSE_CM_0_0_0_<yyyymmdd>_F_0000.CSV, with
+  ISO 20022 column names (FinInstrmId, OpnPric, ClsPric, TtlTradgVol, ...).
+- EQ (before): EQ<ddmmyy>_CSV.ZIP, one CSV with SC_CODE, OPEN, CLOSE, NO_OF_SHRS, ...
+
+Either is read into the columns request_data stores per scrip, so rows from a
+bhavcopy and from StockPrcHistori.aspx can share a cached frame.
+"""
+import io
+import zipfile
+from datetime import date
+
+import pandas as pd
+
+from bse_scraper.bsescraper.configs.constants import udiff_start
+
+COLUMNS = ["Date", "Open", "High", "Low", "Close", "Volume", "No. of Trades", "Turnover", "Symbol", "ScripCode"]
+
+NUMERIC_COLUMNS = ["Open", "High", "Low", "Close", "Volume", "No. of Trades", "Turnover"]
+
+# Bhavcopy column -> stored column, per layout
+LAYOUTS = {
+    "udiff": {"FinInstrmId": "ScripCode", "FinInstrmNm": "Symbol", "OpnPric": "Open", "HghPric": "High",
+              "LwPric": "Low", "ClsPric": "Close", "TtlTradgVol": "Volume", "TtlNbOfTxsExctd": "No. of Trades",
+              "TtlTrfVal": "Turnover"},
+    "eq": {"SC_CODE": "ScripCode", "SC_NAME": "Symbol", "OPEN": "Open", "HIGH": "High", "LOW": "Low",
+           "CLOSE": "Close", "NO_OF_SHRS": "Volume", "NO_TRADES": "No. of Trades", "NET_TURNOV": "Turnover"},
+}
+
+
+def bhavcopy_format(day: date) -> str:
+    """The layout BSE published day's bhavcopy in: "udiff" or "eq"."""
+    return "udiff" if day.isoformat() >= udiff_start else "eq"
+
+
+def read_bhavcopy(content: bytes, day: date) -> pd.DataFrame:
+    """One day's bhavcopy (CSV, or the zip holding it) as one row per scrip in COLUMNS."""
+    if content[:2] == b"PK":
+        with zipfile.ZipFile(io.BytesIO(content)) as archive:
+            content = archive.read(archive.namelist()[0])
+
+    df = pd.read_csv(io.BytesIO(content), skipinitialspace=True, dtype={"FinInstrmId": str, "SC_CODE": str})
+    df.columns = df.columns.str.strip()
+    layout = next((columns for columns in LAYOUTS.values() if set(columns) <= set(df.columns)), None)
+    if layout is None:
+        raise ValueError(f"Unrecognised bhavcopy columns: {list(df.columns)[:10]}")
+
+    df = df[list(layout)].rename(columns=layout)
+    df["ScripCode"] = df["ScripCode"].str.strip()
+    df["Symbol"] = df["Symbol"].astype(str).str.strip()
+    for col in NUMERIC_COLUMNS:
+        df[col] = pd.to_numeric(df[col], errors="coerce")
+    df["Date"] = pd.Timestamp(day)
+    return df[COLUMNS]
@@ -0,0 +1,77 @@
+"""
+The hidden ASP.NET fields StockPrcHistori.aspx needs on every postback.
+
+The tokens are the same for every scrip and date range, so one GET of the form
+is enough for as long as the server keeps accepting them. They are read with a
+regex instead of a full HTML parse, and replaced only once a postback shows
+they have gone stale.
+"""
+import html
+import re
+import threading
+import time
+from typing import Optional
+
+from bse_scraper.bsescraper.configs.constants import form_token_ttl
+from bse_scraper.bsescraper.utils.parsers import HEADER_CLASS
+
+TOKEN_FIELDS = ("__VIEWSTATE", "__EVENTVALIDATION", "__VIEWSTATEGENERATOR")
+
+_TOKEN_RE = re.compile(
+    r'<input\b[^>]*?\bname="(__VIEWSTATE|__EVENTVALIDATION|__VIEWSTATEGENERATOR)"[^>]*?\bvalue="([^"]*)"',
+    re.IGNORECASE,
+)
+
+
+def extract_form_tokens(text: str) -> Optional[dict]:
+    """The three form tokens in a StockPrcHistori.aspx page, or None if any is missing."""
+    tokens = {name: html.unescape(value) for name, value in _TOKEN_RE.findall(text)}
+    if not all(field in tokens for field in TOKEN_FIELDS):
+        return None
+    return {field: tokens[field] for field in TOKEN_FIELDS}
+
+
+def tokens_rejected(response) -> bool:
+    """
+    Whether a postback failed because of its tokens. ASP.NET answers stale tokens
+    with a server error ("Validation of viewstate MAC failed") or by rendering the
+    bare form again, with neither a CSV download nor a history table. A table
+    with its header row but no data rows is a valid empty result (no trading
+    days in the range), not a rejection.
+    """
+    if response.status_code == 500:
+        return True
+    if response.status_code != 200:
+        return False
+    content_type = response.headers.get("content-type", "").lower()
+    content_disposition = response.headers.get("content-disposition", "")
+    if "excel" in content_type or "csv" in content_disposition:
+        return False
+    return HEADER_CLASS not in response.text and "__VIEWSTATE" in response.text
+
+
+class FormTokenCache():
+    """Thread-safe holder of the current form tokens, trusted for at most ttl seconds."""
+
+    def __init__(self, ttl: float = form_token_ttl):
+        self.ttl = ttl
+        self._tokens = None
+        self._fetched_at = 0.0
+        self._lock = threading.Lock()
+
+    def get(self) -> Optional[dict]:
+        with self._lock:
+            if self._tokens is None or time.monotonic() - self._fetched_at > self.ttl:
+                return None
+            return self._tokens
+
+    def put(self, tokens: dict):
+        with self._lock:
+            self._tokens = tokens
+            self._fetched_at = time.monotonic()
+
+    def invalidate(self, tokens: Optional[dict] = None):
+        """Drop the cached tokens, unless another thread already replaced the ones that failed."""
+        with self._lock:
+            if tokens is None or self._tokens is tokens:
+                self._tokens = None
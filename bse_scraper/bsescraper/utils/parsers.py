@@ -0,0 +1,130 @@
+"""
+Parsers for the StockPrcHistori.aspx price-history responses.
+
+The HTML table is read with the fastest backend that is installed: selectolax,
+then lxml, then BeautifulSoup (always available). Each backend goes straight to
+the header row (td.innertable_header1) and the data rows (tr.TTRow) and reads
+every data cell in one flat pass; the cells are only reshaped into columns at
+the end, so no list is built per row.
+"""
+import io
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+from bs4 import BeautifulSoup
+
+try:
+    from selectolax.lexbor import LexborHTMLParser as HTMLParser
+except ImportError:
+    HTMLParser = None
+
+try:
+    from lxml import html as lxml_html
+except ImportError:
+    lxml_html = None
+
+HEADER_CLASS = "innertable_header1"
+ROW_CLASS = "TTRow"
+# Header cell spanning the two spread columns, which the data rows do not carry
+SPREAD_HEADER = "* Spread"
+
+_HAS_CLASS = "contains(concat(' ', normalize-space(@class), ' '), ' {} ')"
+
+
+def available_parsers() -> list[str]:
+    """Installed HTML backends, fastest first."""
+    parsers = []
+    if HTMLParser is not None:
+        parsers.append("selectolax")
+    if lxml_html is not None:
+        parsers.append("lxml")
+    parsers.append("bs4")
+    return parsers
+
+
+def resolve_parser(parser: str = "auto") -> str:
+    """Map "auto" to the fastest installed backend and check an explicit choice is installed."""
+    available = available_parsers()
+    if parser == "auto":
+        return available[0]
+    if parser not in ("selectolax", "lxml", "bs4"):
+        raise ValueError(f"Unknown HTML parser: {parser!r}")
+    if parser not in available:
+        raise ImportError(f"HTML parser {parser!r} is not installed")
+    return parser
+
+
+def _selectolax(text):
+    tree = HTMLParser(text)
+    first = tree.css_first(f"td.{HEADER_CLASS}")
+    if first is None:
+        return None
+    headers = [cell.text(strip=True) for cell in first.parent.css(f"td.{HEADER_CLASS}")]
+    rows = tree.css(f"tr.{ROW_CLASS}")
+    cells = [cell.text(strip=True) for cell in tree.css(f"tr.{ROW_CLASS} > td")]
+    return headers, cells, len(rows), lambda: [[cell.text(strip=True) for cell in row.css("td")] for row in rows]
+
+
+def _lxml(text):
+    root = lxml_html.fromstring(text)
+    header_row = root.xpath(f"(//tr[td[{_HAS_CLASS.format(HEADER_CLASS)}]])[1]")
+    if not header_row:
+        return None
+    headers = [cell.text_content().strip() for cell in header_row[0].xpath(f"td[{_HAS_CLASS.format(HEADER_CLASS)}]")]
+    rows = root.xpath(f"//tr[{_HAS_CLASS.format(ROW_CLASS)}]")
+    cells = [cell.text_content().strip() for cell in root.xpath(f"//tr[{_HAS_CLASS.format(ROW_CLASS)}]/td")]
+    return headers, cells, len(rows), lambda: [[cell.text_content().strip() for cell in row.xpath("td")] for row in rows]
+
+
+def _bs4(text):
+    soup = BeautifulSoup(text, "html.parser")
+    first = soup.select_one(f"td.{HEADER_CLASS}")
+    if first is None:
+        return None
+    headers = [cell.get_text(strip=True) for cell in first.parent.find_all("td", class_=HEADER_CLASS, recursive=False)]
+    rows = soup.select(f"tr.{ROW_CLASS}")
+    cells = [cell.get_text(strip=True) for cell in soup.select(f"tr.{ROW_CLASS} > td")]
+    return headers, cells, len(rows), lambda: [[cell.get_text(strip=True) for cell in row.find_all("td", recursive=False)] for row in rows]
+
+
+BACKENDS = {"selectolax": _selectolax, "lxml": _lxml, "bs4": _bs4}
+
+
+def parse_history_table(text: str, parser: str = "auto") -> Optional[pd.DataFrame]:
+    """
+    The price-history table of a StockPrcHistori.aspx page as a DataFrame of
+    strings, one column per header. Returns None when the page has no such table.
+    """
+    parsed = BACKENDS[resolve_parser(parser)](text)
+    if parsed is None:
+        return None
+    headers, cells, n_rows, per_row = parsed
+    headers = [header.replace("\n", " ") for header in headers if header != SPREAD_HEADER]
+    width = len(headers)
+
+    if n_rows and len(cells) == n_rows * width:
+        # Every row has one cell per header: reshape the flat cells into columns
+        values = np.array(cells, dtype=object).reshape(n_rows, width)
+    else:
+        # Ragged rows (totals, notes): keep only the complete ones
+        values = np.array([row for row in per_row() if len(row) == width], dtype=object).reshape(-1, width)
+
+    return pd.DataFrame({header: values[:, i] for i, header in enumerate(headers)})
+
+
+def parse_history_csv(content: bytes, numeric_cols) -> pd.DataFrame:
+    """
+    The CSV download, read in one pass: thousands separators are handled by the
+    reader, "-" placeholders count as zero in numeric columns and Date is parsed once.
+    """
+    df = pd.read_csv(io.BytesIO(content), thousands=",", skipinitialspace=True)
+    df.columns = df.columns.str.strip()
+    for col in numeric_cols:
+        # Columns the reader could not type (a "-" somewhere) are cleaned by hand
+        if col in df.columns and not pd.api.types.is_numeric_dtype(df[col]):
+            cleaned = df[col].astype(str).str.replace(",", "").replace("-", "0")
+            df[col] = pd.to_numeric(cleaned, errors="coerce")
+    if "Date" in df.columns:
+        df["Date"] = pd.to_datetime(df["Date"], dayfirst=True, errors="coerce")
+    return df
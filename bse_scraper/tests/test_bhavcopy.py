@@ -0,0 +1,54 @@
+import io
+import zipfile
+from datetime import date
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+from bse_scraper.bsescraper.utils.bhavcopy import COLUMNS, bhavcopy_format, read_bhavcopy
+
+FIXTURES = Path(__file__).parent / "fixtures"
+DAY = date(2024, 1, 5)
+
+
+def zipped(name, content):
+    archive = io.BytesIO()
+    with zipfile.ZipFile(archive, "w", zipfile.ZIP_DEFLATED) as z:
+        z.writestr(name, content)
+    return archive.getvalue()
+
+
+UDIFF = (FIXTURES / "bhavcopy_udiff.csv").read_bytes()
+EQ = (FIXTURES / "bhavcopy_eq.csv").read_bytes()
+
+
+@pytest.fixture(scope="module")
+def expected():
+    return read_bhavcopy(UDIFF, DAY)
+
+
+def test_udiff_layout(expected):
+    assert list(expected.columns) == COLUMNS
+    assert expected["ScripCode"].tolist() == ["500325", "532540", "539889"]
+    assert expected.loc[0, "Symbol"] == "RELIANCE INDUSTRIES LTD."
+    assert expected.loc[1, "Close"] == 3745.25 and expected.loc[0, "Volume"] == 112640
+    # A scrip that did not trade has prices but no volume
+    assert expected.loc[2, ["Volume", "No. of Trades", "Turnover"]].isna().all()
+    assert (expected["Date"] == DAY.isoformat()).all()
+
+
+@pytest.mark.parametrize("content", [EQ, zipped("EQ050124.CSV", EQ), zipped("BhavCopy.CSV", UDIFF)],
+                         ids=["eq", "eq-zip", "udiff-zip"])
+def test_every_layout_gives_the_same_frame(content, expected):
+    pd.testing.assert_frame_equal(read_bhavcopy(content, DAY), expected)
+
+
+def test_unknown_layout_is_rejected():
+    with pytest.raises(ValueError, match="Unrecognised bhavcopy columns"):
+        read_bhavcopy(b"SYMBOL,SERIES,OPEN\nTCS,EQ,1\n", DAY)
+
+
+def test_layout_switches_on_udiff_start():
+    assert bhavcopy_format(date(2024, 7, 8)) == "udiff"
+    assert bhavcopy_format(date(2010, 1, 4)) == "eq"
@@ -0,0 +1,104 @@
+from contextlib import contextmanager
+from unittest import mock
+
+import pytest
+
+from bse_scraper.BSE_Client import bse_scraper
+from bse_scraper.bsescraper.configs.constants import history_columns
+
+SCRIP = {"id": "500325", "description": "RELIANCE INDUSTRIES LTD"}
+TOKENS = {"__VIEWSTATE": "vs", "__VIEWSTATEGENERATOR": "gen", "__EVENTVALIDATION": "ev"}
+HEADER = "".join(f'<td class="innertable_header1">{col}</td>' for col in history_columns)
+ROW = ('<tr class="TTRow">' + "".join(f"<td>{cell}</td>" for cell in
+       ["03/01/2024", "1,000.00", "1,010.00", "990.00", "1,005.00", "1,001.00", "12,345", "10", "1,23,45,678", "5,000", "40.50"])
+       + "</tr>")
+
+
+class Response():
+
+    def __init__(self, body, status_code=200, headers=None):
+        self.content = body.encode()
+        self.text = body
+        self.status_code = status_code
+        self.headers = headers or {"content-type": "text/html; charset=utf-8"}
+
+
+class Session():
+
+    def __init__(self, responses):
+        self.responses = list(responses)
+        self.posts = 0
+        self.headers, self.cookies = {}, {}
+
+    def post(self, url, **kwargs):
+        self.posts += 1
+        return self.responses.pop(0)
+
+
+class Pool():
+
+    def __init__(self, session):
+        self._session = session
+
+    @contextmanager
+    def session(self):
+        yield self._session
+
+
+class Limiter():
+
+    def acquire(self):
+        pass
+
+    def feedback(self, status_code, retry_after=None):
+        pass
+
+
+def page(table):
+    return (f'<html><body><form><input type="hidden" name="__VIEWSTATE" value="vs" />'
+            f'<table class="mGrid">{table}</table></form></body></html>')
+
+
+@pytest.fixture
+def scraper():
+    client = bse_scraper(use_cache=False, parser="bs4")
+    client.cookies = {"session": "1"}
+    client.form_tokens.put(TOKENS)
+    with mock.patch("bse_scraper.BSE_Client.get_limiter", return_value=Limiter()):
+        yield client
+
+
+def download(scraper, *responses):
+    session = Session(responses)
+    scraper.pool = Pool(session)
+    return scraper.download_data(SCRIP, "2024-01-01", "2024-01-07"), session
+
+
+def test_html_rows(scraper):
+    df, session = download(scraper, Response(page(f"<tr>{HEADER}</tr>{ROW}")))
+    assert session.posts == 1
+    assert df["Close"].tolist() == [1005.0]
+    assert df["ScripCode"].tolist() == ["500325"]
+
+
+def test_html_table_without_rows_is_an_empty_result(scraper):
+    df, session = download(scraper, Response(page(f"<tr>{HEADER}</tr>")))
+    assert session.posts == 1
+    assert df is not None and df.empty
+    assert {"Date", "Close", "Symbol", "ScripCode"} <= set(df.columns)
+
+
+def test_csv_header_without_rows_is_an_empty_result(scraper):
+    csv = Response(",".join(history_columns) + "\n",
+                   headers={"content-type": "application/vnd.ms-excel", "content-disposition": "attachment; filename=x.csv"})
+    df, session = download(scraper, csv)
+    assert session.posts == 1
+    assert df is not None and df.empty and "Close" in df.columns
+
+
+def test_empty_csv_body_is_an_empty_result(scraper):
+    csv = Response("", headers={"content-type": "application/vnd.ms-excel", "content-disposition": "attachment; filename=x.csv"})
+    df, session = download(scraper, csv)
+    assert session.posts == 1
+    assert df is not None and df.empty
+    assert list(df.columns) == [*history_columns, "Symbol", "ScripCode"]
@@ -0,0 +1,47 @@
+from bse_scraper.bsescraper.utils.form_tokens import FormTokenCache, extract_form_tokens, tokens_rejected
+
+FORM = ('<form><input type="hidden" name="__VIEWSTATE" id="__VIEWSTATE" value="a&amp;b" />'
+        '<input type="hidden" name="__VIEWSTATEGENERATOR" id="__VIEWSTATEGENERATOR" value="gen" />'
+        '<input type="hidden" name="__EVENTVALIDATION" id="__EVENTVALIDATION" value="ev" />{table}</form>')
+HEADER = '<tr><td class="innertable_header1">Date</td><td class="innertable_header1">Close</td></tr>'
+ROW = '<tr class="TTRow"><td>03/01/2024</td><td>1,005.00</td></tr>'
+
+
+class Response():
+
+    def __init__(self, text, status_code=200, headers=None):
+        self.text = text
+        self.status_code = status_code
+        self.headers = headers or {"content-type": "text/html; charset=utf-8"}
+
+
+def test_extract_form_tokens():
+    assert extract_form_tokens(FORM.format(table="")) == {
+        "__VIEWSTATE": "a&b", "__EVENTVALIDATION": "ev", "__VIEWSTATEGENERATOR": "gen"}
+    assert extract_form_tokens("<form></form>") is None
+
+
+def test_bare_form_means_rejected_tokens():
+    assert tokens_rejected(Response(FORM.format(table="")))
+    assert tokens_rejected(Response("<h2>Validation of viewstate MAC failed.</h2>", status_code=500))
+
+
+def test_history_table_means_accepted_tokens():
+    assert not tokens_rejected(Response(FORM.format(table=f"<table>{HEADER}{ROW}</table>")))
+    # No trading days in the range: the header row without data rows
+    assert not tokens_rejected(Response(FORM.format(table=f"<table>{HEADER}</table>")))
+    csv = Response("Date,Close\n", headers={"content-type": "application/vnd.ms-excel",
+                                           "content-disposition": "attachment; filename=x.csv"})
+    assert not tokens_rejected(csv)
+    assert not tokens_rejected(Response("", status_code=403))
+
+
+def test_invalidate_keeps_newer_tokens():
+    cache = FormTokenCache(ttl=60)
+    old, new = {"__VIEWSTATE": "old"}, {"__VIEWSTATE": "new"}
+    cache.put(old)
+    cache.put(new)
+    cache.invalidate(old)
+    assert cache.get() is new
+    cache.invalidate(new)
+    assert cache.get() is None
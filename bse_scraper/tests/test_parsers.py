@@ -0,0 +1,46 @@
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+from bse_scraper.bsescraper.configs.constants import history_columns
+from bse_scraper.bsescraper.utils.parsers import available_parsers, parse_history_table, resolve_parser
+
+FIXTURES = Path(__file__).parent / "fixtures"
+PAGE = (FIXTURES / "stockprchistori.html").read_text()
+
+
+@pytest.fixture(scope="module")
+def expected():
+    return parse_history_table(PAGE, "bs4")
+
+
+def test_bs4_reads_the_fixture_page(expected):
+    assert list(expected.columns) == history_columns
+    # The totals row is dropped, cells are stripped and kept as text
+    assert expected["Date"].tolist() == ["05/01/2024", "04/01/2024", "03/01/2024"]
+    assert expected.loc[1, "Volume"] == "98,310" and expected.loc[1, "Deliverable Quantity"] == "-"
+
+
+@pytest.mark.parametrize("parser", available_parsers())
+def test_every_backend_gives_the_same_frame(parser, expected):
+    pd.testing.assert_frame_equal(parse_history_table(PAGE, parser), expected)
+
+
+@pytest.mark.parametrize("parser", available_parsers())
+def test_page_without_history_table(parser):
+    assert parse_history_table("<html><body><form id='form1'></form></body></html>", parser) is None
+
+
+@pytest.mark.parametrize("parser", available_parsers())
+def test_table_with_only_a_header(parser):
+    header_only = PAGE.split('<tr class="TTRow">')[0] + "</table></div></form></body></html>"
+    df = parse_history_table(header_only, parser)
+    assert df.empty and list(df.columns) == history_columns
+
+
+def test_resolve_parser():
+    assert resolve_parser("auto") == available_parsers()[0]
+    assert resolve_parser("bs4") == "bs4"
+    with pytest.raises(ValueError):
+        resolve_parser("html5lib")
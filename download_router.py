@@ -0,0 +1,155 @@
+"""
+Historical downloads with failover and hedging across sources.
+
+An instrument is first asked of its own source (or of whichever listed source
+already has the range cached). If that source fails or returns nothing, the
+next source it is listed on is asked at once; if it is merely slow, the next
+source is asked as well after hedge_delay seconds, and the first non-empty
+answer wins. Other listings come from the identity map. Every answer is
+normalized to the same columns, so a panel can mix sources.
+"""
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import datetime, timedelta
+from typing import Optional
+
+import pandas as pd
+
+from investoscrapo.configs.constants import hedge_delay, route_preference
+from investoscrapo.utils.cache import get_cache
+from investoscrapo.utils.identity_map import get_identity_map
+from investoscrapo.utils.logger import get_logger
+from investoscrapo.utils.streaming import stream_map
+from investoscrapo.utils.transformer import build_panel
+from source_clients import get_client
+
+logger = get_logger(__name__)
+
+COMMON_COLUMNS = ["Date", "Open", "High", "Low", "Close", "Volume"]
+
+# Each source's column names for the common columns
+SOURCE_COLUMNS = {
+    "investing": {"rowDate": "Date", "last_closeRaw": "Close", "volumeRaw": "Volume"},
+    "bse": {},
+    "nse": {},
+    "yahoo": {"date": "Date", "open": "Open", "high": "High", "low": "Low", "close": "Close", "volume": "Volume"},
+}
+
+YAHOO_SUFFIXES = {"nse": ".NS", "bse": ".BO"}
+
+
+def to_common(df: Optional[pd.DataFrame], source: str) -> Optional[pd.DataFrame]:
+    """A source's history in COMMON_COLUMNS (absent ones are NaN), sorted by Date; None if it has no rows."""
+    if df is None or df.empty:
+        return None
+    df = df.rename(columns=SOURCE_COLUMNS[source])
+    if "Date" not in df.columns or "Close" not in df.columns:
+        return None
+    df = df.reindex(columns=COMMON_COLUMNS)
+    dates = pd.to_datetime(df["Date"])
+    if dates.dt.tz is not None:
+        dates = dates.dt.tz_localize(None)
+    df["Date"] = dates.dt.normalize()
+    return df.sort_values("Date").reset_index(drop=True)
+
+
+class DownloadRouter():
+    """Per-instrument downloads that fail over to, and hedge with, the instrument's other listings."""
+
+    def __init__(self, preference=route_preference, hedge_delay: float = hedge_delay, use_yahoo: bool = True,
+                 max_workers: int = 10):
+        self.preference = tuple(preference)
+        self.hedge_delay = hedge_delay
+        self.use_yahoo = use_yahoo
+        self.identities = get_identity_map()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="hedge")
+
+    def candidates(self, scrip_dict: dict, source: str, start_date: str, end_date: str) -> list[tuple]:
+        """(source, scrip dict) pairs to try in order: cached first, then the requested source, then the others."""
+        identity = self.identities.identity(source=source, listing_id=scrip_dict["id"])
+        listings = dict(identity["listings"]) if identity else {}
+        listings[source] = scrip_dict
+
+        if self.use_yahoo and "yahoo" not in listings:
+            # Yahoo lists Indian equities under the exchange ticker plus a suffix
+            for exchange in ("nse", "bse"):
+                if exchange in listings:
+                    listings["yahoo"] = {"id": f"{listings[exchange]['symbol']}{YAHOO_SUFFIXES[exchange]}"}
+                    break
+
+        order = [source] + [s for s in self.preference if s != source]
+        if self.use_yahoo:
+            order.append("yahoo")
+        order = [s for s in order if s in listings]
+
+        cached = get_cache().missing_ranges
+        order.sort(key=lambda s: s == "yahoo" or bool(cached(s, listings[s]["id"], start_date, end_date)))
+        return [(s, listings[s]) for s in order]
+
+    def fetch(self, source: str, scrip_dict: dict, start_date: str, end_date: str) -> Optional[pd.DataFrame]:
+        """One source's history for the range in COMMON_COLUMNS, or None."""
+        if source == "investing":
+            df = get_client("investing").scraper.request_data(scrip_dict, start_date, end_date)
+        elif source in ("bse", "nse"):
+            df = get_client(source).request_data(scrip_dict, start_date, end_date)
+        elif source == "yahoo":
+            from yahooquery import Ticker
+            # yahooquery's end date is exclusive
+            end = (datetime.strptime(end_date, "%Y-%m-%d") + timedelta(days=1)).strftime("%Y-%m-%d")
+            history = Ticker(scrip_dict["id"]).history(start=start_date, end=end)
+            df = history.reset_index() if isinstance(history, pd.DataFrame) else None
+        else:
+            raise ValueError(f"Unknown download source: {source!r}")
+        return to_common(df, source)
+
+    def download(self, scrip_dict: dict, source: str, start_date: str, end_date: str) -> Optional[pd.DataFrame]:
+        """
+        History of one instrument in COMMON_COLUMNS plus Source (who answered),
+        or None when every source failed.
+        """
+        candidates = iter(self.candidates(scrip_dict, source, start_date, end_date))
+        pending = {}
+
+        def launch():
+            candidate = next(candidates, None)
+            if candidate is not None:
+                pending[self._executor.submit(self.fetch, *candidate, start_date, end_date)] = candidate[0]
+            return candidate is not None
+
+        launch()
+        while pending:
+            done, _ = wait(pending, timeout=self.hedge_delay, return_when=FIRST_COMPLETED)
+            if not done:
+                if launch():
+                    logger.info(f"{scrip_dict.get('symbol', scrip_dict['id'])} is slow, hedging with the next source")
+                continue
+            for future in done:
+                answered = pending.pop(future)
+                try:
+                    df = future.result()
+                except Exception as e:
+                    logger.warning(f"{answered} failed for {scrip_dict.get('symbol', scrip_dict['id'])}: {e}")
+                    df = None
+                if df is not None:
+                    # Slower sources still running finish into their caches; their answers are ignored
+                    df["Source"] = answered
+                    return df
+                logger.warning(f"No data from {answered} for {scrip_dict.get('symbol', scrip_dict['id'])}, failing over")
+                launch()
+        return None
+
+    def download_many(self, list_dict: list[dict], source: str, start_date: str, end_date: str,
+                      max_workers: int = 5, fields=("Close", "Volume")) -> pd.DataFrame:
+        """
+        Panel of many instruments of source, each downloaded with download(). The
+        Symbol level of the columns is the requested instrument's symbol, whichever
+        source answered.
+        """
+        frames = []
+        fetch = lambda scrip_dict: self.download(scrip_dict, source, start_date, end_date)
+        for scrip_dict, df in stream_map(fetch, list_dict, max_workers):
+            if df is None:
+                logger.error(f"Every source failed for {scrip_dict.get('symbol', scrip_dict['id'])}")
+                continue
+            df["Symbol"] = scrip_dict.get("symbol", scrip_dict["id"])
+            frames.append(df)
+        return build_panel(frames, date_col="Date", fields=list(fields), id_cols=["Symbol"])
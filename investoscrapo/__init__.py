@@ -4,3 +4,11 @@ By Vikram Sarkar vikigamer21@gmail.com
 A fast, multi-threaded web scraper to collect historical financial data from Investing.com, built with curl_cffi and pandas."""
 
 __version__ = '0.1.0'
+
+
+def __getattr__(name):
+    # The client pulls in pandas and curl_cffi; only import them once it is asked for
+    if name == "InvestingClient":
+        from investoscrapo.client import InvestingClient
+        return InvestingClient
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
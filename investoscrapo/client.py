@@ -1,18 +1,68 @@
+import asyncio
 from investoscrapo.scraper import Investing
 from investoscrapo.utils.transformer import *
 from investoscrapo.utils.logger import get_logger
+from investoscrapo.configs.constants import max_concurrency, search_race
 import pandas as pd
 
 logger = get_logger()
 
 class InvestingClient():
-    def __init__(self):
-        self.scraper = Investing()
-    
-    def Search(self, Term: str) -> list[dict]:
-        return self.scraper.fetch_search_results(Term)
-    
-    def Download_Historical(self, selected_list_dicts: list[dict], start_date: str, end_date: str) -> pd.DataFrame:
-        raw = self.scraper.threaded_request(selected_list_dicts, start_date, end_date)
-        clean_df = build_full_panel_with_ids(raw)
+    def __init__(self, max_concurrency: int = max_concurrency, use_cache: bool = True):
+        self.scraper = Investing(use_cache=use_cache)
+        self.max_concurrency = max_concurrency
+
+    def Search(self, Term: str, race: bool = search_race) -> list[dict]:
+        """Investing.com quotes for Term; race=True asks every search endpoint at once and keeps the first answer."""
+        return self.scraper.fetch_search_results(Term, race=race)
+
+    @staticmethod
+    def to_panel(raw: list[pd.DataFrame], compact: bool = False) -> pd.DataFrame:
+        if compact:
+            return build_compact_panel(raw)
+        return build_full_panel_with_ids(raw)
+
+    def Download_Historical(self, selected_list_dicts: list[dict], start_date: str, end_date: str, engine: str = "threaded",
+                            incremental: bool = False, compact: bool = False) -> pd.DataFrame:
+        """
+        Download daily history for every selected instrument.
+
+        engine="threaded" uses the original thread pool; engine="async" runs
+        Download_Historical_Async to completion on a fresh event loop. Called
+        from a running event loop (Jupyter, an async web handler), where no
+        second loop can be started, engine="async" falls back to the thread
+        pool; await Download_Historical_Async there instead.
+        incremental=True only downloads the date ranges missing from the cache.
+        compact=True returns float32 prices and nullable integer volumes, with
+        symbol and instrument_id carried in the column index instead of repeated columns.
+        """
+        if engine == "async":
+            try:
+                asyncio.get_running_loop()
+            except RuntimeError:
+                return asyncio.run(self.Download_Historical_Async(selected_list_dicts, start_date, end_date, incremental, compact))
+            logger.warning("Download_Historical(engine='async') called inside a running event loop; using the threaded "
+                           "engine. Await Download_Historical_Async to download on that loop.")
+        elif engine != "threaded":
+            raise ValueError(f"Unknown download engine: {engine!r}")
+
+        raw = self.scraper.threaded_request(selected_list_dicts, start_date, end_date, incremental)
+        clean_df = self.to_panel(raw, compact)
+        return clean_df
+
+    def stream_historical(self, selected_list_dicts: list[dict], start_date: str, end_date: str, incremental: bool = False,
+                          max_in_flight: int = 10):
+        """
+        Yield (scrip_dict, DataFrame) for each instrument as soon as its download
+        finishes, so callers can persist and release frames one at a time.
+        At most max_in_flight finished-or-running downloads are held at once.
+        """
+        yield from self.scraper.stream_request(selected_list_dicts, start_date, end_date, incremental,
+                                               max_in_flight=max_in_flight)
+
+    async def Download_Historical_Async(self, selected_list_dicts: list[dict], start_date: str, end_date: str,
+                                        incremental: bool = False, compact: bool = False) -> pd.DataFrame:
+        """Awaitable Download_Historical that keeps up to max_concurrency requests in flight."""
+        raw = await self.scraper.async_request(selected_list_dicts, start_date, end_date, self.max_concurrency, incremental)
+        clean_df = self.to_panel(raw, compact)
         return clean_df
@@ -1,3 +1,4 @@
+import os
 
 HOME_URL = "https://www.investing.com/"
 HISTORICAL_DATA_URL = "https://api.investing.com/api/financialdata/historical/"
@@ -14,10 +15,18 @@ user_agents = [
     "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/137.0.0.0 Safari/537.36",
     ]
 
-delay_range = (2, 5)
+# Token-bucket limits per host: (requests per second, burst, max requests per second).
+# The rate adapts between rate/16 and the max depending on 403/429 responses.
+rate_limits = {
+    "www.investing.com": (0.5, 2, 1.0),
+    "api.investing.com": (1.0, 5, 4.0),
+}
 
 max_attempts = 3
 
+# Upper bound on simultaneous requests for the asyncio download engine
+max_concurrency = 20
+
 keep_cols = [
     "rowDate",
     "last_closeRaw",
@@ -25,3 +34,49 @@ keep_cols = [
     "symbol",
     "instrument_id",
 ]
+
+# On-disk cache of downloaded history (see investoscrapo.utils.cache)
+cache_dir = os.environ.get("INVESTOSCRAPO_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "investoscrapo"))
+cache_ttl = 6 * 60 * 60                 # seconds rows for still-open days are trusted
+cache_max_age = 30 * 24 * 60 * 60       # seconds since last fetch before an instrument is dropped
+cache_max_bytes = 512 * 1024 * 1024     # total size before least recently read instruments are dropped
+cache_write_batch = 250                 # instruments per put_many transaction, so other writers get a turn
+
+# Column dtypes for compact panels (InvestingClient.Download_Historical(..., compact=True))
+compact_dtypes = {
+    "last_closeRaw": "float32",
+    "volumeRaw": "Int64",
+}
+
+# Seconds fetched anti-bot cookies are reused when the site sets no earlier expiry
+cookie_ttl = 30 * 60
+
+# Panel analytics (see investoscrapo.utils.analytics)
+trading_days_per_year = 252
+beta_window = 60                # trading days in a rolling beta / volatility window
+min_observations = 20           # paired returns needed before a beta or volatility is reported
+thin_zero_ratio = 0.2           # share of sessions without trades above which an instrument is thinly traded
+thin_min_volume = 0             # median daily volume below which an instrument is thinly traded (0 turns the test off)
+
+# Memoized search (see search_service.SearchService)
+search_cache_size = 512         # (source, query) answers kept
+search_cache_ttl = 15 * 60      # seconds a search answer is reused
+
+# Sources tried in order when routing a download through the identity map: NSE
+# serves a year per JSON request, BSE needs a form postback, Investing.com is the
+# most tightly rate limited
+route_preference = ("nse", "bse", "investing")
+
+# Hedged downloads (see download_router.DownloadRouter): seconds to wait on a
+# source before also asking the next one for the same instrument
+hedge_delay = 8.0
+
+# Racing Investing.com's search endpoints (see Investing.race_search_results)
+search_race = False             # Search() races every endpoint instead of trying them in turn
+search_head_start = 0.3         # seconds the last healthy endpoint gets before the others are asked too
+
+# Batch symbol resolution (see search_service.SearchService.resolve_many)
+resolve_exchanges = ("NSE", "BSE")  # preferred exchanges, best first
+resolve_types = ("Stock", "Equity") # preferred instrument types (matched as substrings)
+resolve_min_match = 0.5             # name match below which a name is left unresolved
+resolve_workers = 8                 # names looked up at once
@@ -1,6 +1,5 @@
 import random
 from investoscrapo.configs.constants import *
-import time
 
 
 def get_headers():
@@ -21,8 +20,3 @@ def get_headers():
         "Sec-Gpc": "1",
         "User-Agent": random.choice(user_agents),
     }
-
-def add_delay():
-            """Add random delay to avoid rate limiting."""
-            delay = random.uniform(*delay_range)
-            time.sleep(delay)
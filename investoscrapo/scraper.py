@@ -1,21 +1,31 @@
+import asyncio
 import json
 from curl_cffi import requests
+from curl_cffi.requests import AsyncSession
 import time
 import pandas as pd
-from concurrent.futures import ThreadPoolExecutor, ALL_COMPLETED, as_completed, wait
 import random
-from bs4 import BeautifulSoup
 from investoscrapo.utils.logger import get_logger
+from investoscrapo.utils.cache import get_cache
+from investoscrapo.utils.cookie_store import cookie_expiry, get_cookie_store
+from investoscrapo.utils.endpoint_health import get_endpoint_health
+from investoscrapo.utils.identity_map import remember
+from investoscrapo.utils.session_pool import get_session_pool
+from investoscrapo.utils.streaming import stream_map
+from investoscrapo.utils.ratelimit import configure_limits, get_limiter, retry_after_seconds
 from investoscrapo.configs.constants import *
 from investoscrapo.helper import *
 
 
 
 logger = get_logger(__name__)
+configure_limits(rate_limits)
 
 class Investing():
 
-    def __init__(self):       
+    source = "investing"
+
+    def __init__(self, use_cache: bool = True):       
         self.session = requests.Session()
         self.session.headers.update({
         "Sec-Fetch-Dest": "empty",
@@ -25,6 +35,9 @@ class Investing():
         
         self.max_retries = 3
         self.cookies = None
+        self.cookie_expires_at = None
+        self.cache = get_cache() if use_cache else None
+        self.pool = get_session_pool(self.source, BROWSER_IMPERSONATION)
 
     def fetch_cookies(self):
         """Fetch initial cookies and bypass Cloudflare if needed."""
@@ -39,6 +52,7 @@ class Investing():
                 
                 if response.status_code == 403:
                     logger.warning("Cloudflare challenge detected. Waiting...")
+                    from bs4 import BeautifulSoup  # only needed on a challenge page
                     soup = BeautifulSoup(response.text, 'html.parser')
                     challenge_form = soup.find('form', {'id': 'challenge-form'})
                     if challenge_form:
@@ -47,6 +61,7 @@ class Investing():
                 
                 if response.status_code == 200:
                     self.cookies = self.session.cookies.get_dict()
+                    self.cookie_expires_at = cookie_expiry(self.session.cookies, cookie_ttl)
                     logger.info("Successfully fetched cookies")
                     return self.cookies
                 else:
@@ -61,23 +76,47 @@ class Investing():
                     
         raise ValueError("Failed to initialize session after all attempts")
 
-    def fetch_search_results(self, search_term):
+    def get_cookies(self, stale=None):
+        """
+        Cookies from the cross-process cookie store. fetch_cookies only runs when the
+        store has none, they expired, or they equal `stale` (cookies that just got a 403),
+        so a burst of 403s across threads and processes triggers a single refresh.
+        """
+        self.cookies = get_cookie_store().obtain(
+            self.source, lambda: (self.fetch_cookies(), self.cookie_expires_at), stale
+        )
+        return self.cookies
+
+    def fetch_search_results(self, search_term, race: bool = False):
+        """
+        Search quotes for search_term, trying the search endpoints one at a time,
+        last healthy one first. race=True asks them concurrently instead (see
+        race_search_results).
+        """
+        if race:
+            return asyncio.run(self.race_search_results(search_term))
         if not self.cookies:
-           self.cookies = self.fetch_cookies()
-        for search_url in search_urls:
+           self.get_cookies()
+        health = get_endpoint_health("investing-search")
+        for search_url in health.order(search_urls):
             params = {"q": search_term}
             
             try:
-                add_delay()  # Add delay between requests to mimic human behavior
+                limiter = get_limiter(search_url)
+                limiter.acquire()  # Wait for the shared per-host token bucket
                 self.session.cookies.update(self.cookies)
                 
+                started = time.monotonic()
                 response = self.session.get(search_url, params=params, timeout=30)
+                limiter.feedback(response.status_code, retry_after_seconds(response))
                 
                 if response.status_code == 200:
                     # decompressed = brotli.decompress(response.content)
                     try:
                         data = response.json()
                         if data.get("quotes"):
+                            health.record(search_url, True, time.monotonic() - started)
+                            remember(data["quotes"], self.source)
                             return data["quotes"]  # Return first matching quote
                         else:
                             logger.error(
@@ -96,6 +135,8 @@ class Investing():
                 
                 elif response.status_code == 403:
                     logger.warning("Access forbidden. Updating cookies and retrying...")
+                    health.record(search_url, False)
+                    self.get_cookies(stale=self.cookies)
                     continue
 
                 else:
@@ -106,61 +147,193 @@ class Investing():
 
             except Exception as e:
                 print(f"Error with search URL {search_url}: {e}")
+                health.record(search_url, False)
                 continue
 
+            health.record(search_url, False)
+
         return None
 
-    def request_data(self, scrip_dict, start_date, end_date):
-        
+    async def race_search_results(self, search_term, head_start: float = search_head_start):
+        """
+        Ask every search endpoint for search_term concurrently and return the first
+        non-empty quotes, cancelling the requests still in flight; None when none
+        answered. When the last search found a healthy endpoint, it is asked first
+        and the others only join after head_start seconds, or as soon as it fails.
+        """
         if not self.cookies:
-           self.cookies = self.fetch_cookies()
-        
-        scrip_url = HISTORICAL_DATA_URL + str(scrip_dict["id"])
-        params = {
+            await asyncio.to_thread(self.get_cookies)
+        cookies = self.cookies
+        health = get_endpoint_health("investing-search")
+        waiting = health.order(search_urls)
+        if not health.healthy(waiting[0]):
+            head_start = 0
+
+        async def attempt(session, search_url):
+            limiter = get_limiter(search_url)
+            await limiter.acquire_async()
+            started = time.monotonic()
+            try:
+                response = await session.get(search_url, params={"q": search_term}, headers=get_headers(),
+                                             cookies=cookies, timeout=30)
+                limiter.feedback(response.status_code, retry_after_seconds(response))
+                quotes = response.json().get("quotes") if response.status_code == 200 else None
+            except Exception as e:
+                logger.warning(f"Search endpoint {search_url} failed: {e}")
+                health.record(search_url, False)
+                return None, None
+            health.record(search_url, bool(quotes), time.monotonic() - started)
+            return response.status_code, quotes
+
+        forbidden = False
+        async with AsyncSession(impersonate=random.choice(BROWSER_IMPERSONATION), max_clients=len(waiting)) as session:
+            tasks = {}
+
+            def launch(count):
+                for search_url in waiting[:count]:
+                    tasks[asyncio.create_task(attempt(session, search_url))] = search_url
+                del waiting[:count]
+
+            launch(1 if head_start else len(waiting))
+            try:
+                while tasks:
+                    done, _ = await asyncio.wait(tasks, timeout=head_start if waiting else None,
+                                                 return_when=asyncio.FIRST_COMPLETED)
+                    if not done:
+                        logger.info(f"Search endpoint {next(iter(tasks.values()))} is slow, asking the others")
+                        launch(len(waiting))
+                        continue
+                    for task in done:
+                        search_url = tasks.pop(task)
+                        status, quotes = task.result()
+                        if quotes:
+                            logger.info(f"Search for {search_term!r} answered by {search_url}")
+                            remember(quotes, self.source)
+                            return quotes
+                        forbidden = forbidden or status == 403
+                        logger.warning(f"No quotes from {search_url} (status {status})")
+                    launch(len(waiting))
+            finally:
+                for task in tasks:
+                    task.cancel()
+                await asyncio.gather(*tasks, return_exceptions=True)
+
+        if forbidden:
+            logger.warning("Access forbidden. Updating cookies for the next search...")
+            await asyncio.to_thread(self.get_cookies, cookies)
+        return None
+
+    @staticmethod
+    def historical_params(start_date, end_date):
+        return {
         "start-date": start_date,         # Starting date of historical data
         "end-date": end_date,             # Ending date of historical data
         "time-frame": "Daily",            # Frequency: Daily, Weekly, Monthly
         "add-missing-rows": "false"}      # If false, skips non-trading days (e.g., weekends, holidays)
-        
+
+    @staticmethod
+    def parse_response(data, scrip_dict):
+        """Turn a decoded historical-data payload into a DataFrame tagged with the scrip's identifiers."""
+        logger.info(f"Response keys: {list(data.keys()) if isinstance(data, dict) else 'Not a dict'}")
+
+        # Handle different response structures
+        if isinstance(data, dict):
+            if "data" in data and data["data"]:
+                df = pd.DataFrame(data["data"])
+            elif "data" in data:
+                # A valid answer with no trading days in the range
+                logger.info(f"No rows in range for {scrip_dict.get('symbol')}")
+                df = pd.DataFrame(columns=["rowDate", "last_closeRaw", "volumeRaw"])
+            elif isinstance(data, list):
+                df = pd.DataFrame(data)
+            else:
+                logger.warning(f"Unexpected data structure: {data}")
+                return pd.DataFrame()
+        else:
+            logger.warning(f"Response is not a dictionary: {type(data)}")
+            return pd.DataFrame()
+
+        df['symbol'] = scrip_dict.get('symbol', 'Unknown')
+        df['instrument_id'] = scrip_dict['id']
+        logger.info(f"Successfully fetched {len(df)} rows for {scrip_dict.get('symbol')}")
+        return df
+
+    @staticmethod
+    def normalize(df):
+        """Keep only the panel columns and parse rowDate, the form rows are cached in."""
+        df = df[keep_cols].copy()
+        df["rowDate"] = pd.to_datetime(df["rowDate"], format="%b %d, %Y")
+        return df
+
+    def from_cache(self, scrip_dict, start_date, end_date):
+        if self.cache is None:
+            return None
+        return self.cache.get(self.source, scrip_dict["id"], start_date, end_date, date_col="rowDate")
+
+    def to_cache(self, scrip_dict, start_date, end_date, df):
+        """Normalize a freshly downloaded frame and store it; returns the normalized frame."""
+        if "rowDate" not in df.columns:
+            # Failed download: nothing to normalize and the range must not count as covered
+            return df
+        df = self.normalize(df)
+        if self.cache is not None:
+            self.cache.put(self.source, scrip_dict["id"], start_date, end_date, df, date_col="rowDate")
+        return df
+
+    def from_gaps(self, scrip_dict, start_date, end_date):
+        """After filling gaps, the merged stored rows (partial if some gap failed to download)."""
+        cached = self.from_cache(scrip_dict, start_date, end_date)
+        if cached is not None:
+            return cached
+        logger.warning(f"Some gaps for {scrip_dict.get('symbol')} could not be downloaded, returning stored rows only")
+        stored = self.cache.read(self.source, scrip_dict["id"], start_date, end_date, date_col="rowDate")
+        return stored if stored is not None else pd.DataFrame()
+
+    def request_data(self, scrip_dict, start_date, end_date, incremental: bool = False):
+        """
+        Historical rows for one scrip, served from the on-disk cache when the range is already stored.
+
+        With incremental=True only the sub-ranges missing from the cache are downloaded
+        and merged with the stored rows, instead of refetching the whole range.
+        """
+        cached = self.from_cache(scrip_dict, start_date, end_date)
+        if cached is not None:
+            return cached
+
+        if incremental and self.cache is not None:
+            for gap_start, gap_end in self.cache.missing_ranges(self.source, scrip_dict["id"], start_date, end_date):
+                self.to_cache(scrip_dict, gap_start, gap_end, self.download_data(scrip_dict, gap_start, gap_end))
+            return self.from_gaps(scrip_dict, start_date, end_date)
+
+        return self.to_cache(scrip_dict, start_date, end_date, self.download_data(scrip_dict, start_date, end_date))
+
+    def download_data(self, scrip_dict, start_date, end_date):
+
+        if not self.cookies:
+           self.get_cookies()
+
+        scrip_url = HISTORICAL_DATA_URL + str(scrip_dict["id"])
+        params = self.historical_params(start_date, end_date)
+
         headers = get_headers()
+        limiter = get_limiter(scrip_url)
         
         for attempt in range(self.max_retries):
             try:
-                add_delay()
-                with requests.Session(impersonate=random.choice(BROWSER_IMPERSONATION)) as s:
+                limiter.acquire()
+                with self.pool.session() as s:
                     
-                    # Update headers and cookies
+                    # Update headers and cookies on the pooled session
                     s.headers.update(headers)
-                    s.cookies.update(self.cookies)        
+                    cookies = self.cookies
+                    s.cookies.update(cookies)        
                     logger.info(f"Fetching data for {scrip_dict.get('symbol', 'Unknown')} (ID: {scrip_dict['id']}) - Attempt {attempt + 1}")
                     response = s.get(scrip_url, params=params, timeout=30)
+                    limiter.feedback(response.status_code, retry_after_seconds(response))
 
                     if response.status_code == 200:
                         try:
-                            data = response.json()
-                            logger.info(f"Response keys: {list(data.keys()) if isinstance(data, dict) else 'Not a dict'}")
-                            
-                            # Handle different response structures
-                            if isinstance(data, dict):
-                                if "data" in data and data["data"]:
-                                    df = pd.DataFrame(data["data"])
-                                    df['symbol'] = scrip_dict.get('symbol', 'Unknown')
-                                    df['instrument_id'] = scrip_dict['id']
-                                    logger.info(f"Successfully fetched {len(df)} rows for {scrip_dict.get('symbol')}")
-                                    return df
-                                elif isinstance(data, list):
-                                    df = pd.DataFrame(data)
-                                    df['symbol'] = scrip_dict.get('symbol', 'Unknown')
-                                    df['instrument_id'] = scrip_dict['id']
-                                    logger.info(f"Successfully fetched {len(df)} rows for {scrip_dict.get('symbol')}")
-                                    return df
-                                else:
-                                    logger.warning(f"Unexpected data structure: {data}")
-                                    return pd.DataFrame()
-                            else:
-                                logger.warning(f"Response is not a dictionary: {type(data)}")
-                                return pd.DataFrame()
-                                
+                            return self.parse_response(response.json(), scrip_dict)
                         except json.JSONDecodeError as e:
                             logger.error(f"JSON decode error: {e}")
                             logger.error(f"Response content: {response.text[:500]}")
@@ -170,7 +343,7 @@ class Investing():
                         logger.warning("403 Forbidden - refreshing cookies and retrying...")
                         if 'cf-chl-bypass' in response.text:
                             pass
-                        self.cookies = self.fetch_cookies()
+                        self.get_cookies(stale=cookies)
                         continue
                         
                     else:
@@ -190,21 +363,107 @@ class Investing():
                     
         return pd.DataFrame()
 
-    def threaded_request(self, list_dict: list[dict],  start_date: str, end_date: str) -> pd.DataFrame:
-        result = []
-        with ThreadPoolExecutor(max_workers=5) as executor:
-            future_to_url = {
-                executor.submit(self.request_data, scrip_dict, start_date, end_date): scrip_dict 
+    def stream_request(self, list_dict: list[dict], start_date: str, end_date: str, incremental: bool = False,
+                       max_workers: int = 5, max_in_flight: int = None):
+        """Yield (scrip_dict, DataFrame) pairs as each download finishes, with at most max_in_flight frames buffered."""
+        download = lambda scrip_dict: self.request_data(scrip_dict, start_date, end_date, incremental)
+        for scrip_dict, df in stream_map(download, list_dict, max_workers, max_in_flight):
+            try:
+                df = df[keep_cols]
+            except Exception as exc:
+                logger.error('%r generated an exception: %s. Please try again later.' % (scrip_dict, exc))
+                raise exc
+            yield scrip_dict, df
+
+    def threaded_request(self, list_dict: list[dict],  start_date: str, end_date: str, incremental: bool = False) -> pd.DataFrame:
+        return [df for _, df in self.stream_request(list_dict, start_date, end_date, incremental)]
+
+    async def _refresh_cookies_async(self, cookie_lock, stale_cookies):
+        """Refresh cookies once for all tasks that saw the same stale cookies."""
+        async with cookie_lock:
+            if self.cookies is stale_cookies:
+                await asyncio.to_thread(self.get_cookies, stale_cookies)
+
+    async def request_data_async(self, session, semaphore, cookie_lock, scrip_dict, start_date, end_date,
+                                 incremental: bool = False):
+        """
+        Asyncio counterpart of request_data that shares one AsyncSession across tasks.
+        Cache reads and writes (SQLite and pickling) run in worker threads, off the event loop.
+        """
+        cached = await asyncio.to_thread(self.from_cache, scrip_dict, start_date, end_date)
+        if cached is not None:
+            return cached
+
+        if incremental and self.cache is not None:
+            gaps = await asyncio.to_thread(self.cache.missing_ranges, self.source, scrip_dict["id"], start_date, end_date)
+            for gap_start, gap_end in gaps:
+                df = await self.download_data_async(session, semaphore, cookie_lock, scrip_dict, gap_start, gap_end)
+                await asyncio.to_thread(self.to_cache, scrip_dict, gap_start, gap_end, df)
+            return await asyncio.to_thread(self.from_gaps, scrip_dict, start_date, end_date)
+
+        df = await self.download_data_async(session, semaphore, cookie_lock, scrip_dict, start_date, end_date)
+        return await asyncio.to_thread(self.to_cache, scrip_dict, start_date, end_date, df)
+
+    async def download_data_async(self, session, semaphore, cookie_lock, scrip_dict, start_date, end_date):
+
+        if not self.cookies:
+            await self._refresh_cookies_async(cookie_lock, self.cookies)
+
+        scrip_url = HISTORICAL_DATA_URL + str(scrip_dict["id"])
+        params = self.historical_params(start_date, end_date)
+        limiter = get_limiter(scrip_url)
+
+        for attempt in range(self.max_retries):
+            try:
+                async with semaphore:
+                    # Wait for a token only once holding a slot, so queued tasks see the current rate
+                    await limiter.acquire_async()
+                    cookies = self.cookies
+                    logger.info(f"Fetching data for {scrip_dict.get('symbol', 'Unknown')} (ID: {scrip_dict['id']}) - Attempt {attempt + 1}")
+                    response = await session.get(scrip_url, params=params, headers=get_headers(), cookies=cookies, timeout=30)
+                limiter.feedback(response.status_code, retry_after_seconds(response))
+
+                if response.status_code == 200:
+                    try:
+                        return self.parse_response(response.json(), scrip_dict)
+                    except json.JSONDecodeError as e:
+                        logger.error(f"JSON decode error: {e}")
+                        logger.error(f"Response content: {response.text[:500]}")
+                        return pd.DataFrame()
+
+                elif response.status_code == 403:
+                    logger.warning("403 Forbidden - refreshing cookies and retrying...")
+                    await self._refresh_cookies_async(cookie_lock, cookies)
+                    continue
+
+                else:
+                    logger.error(f"Failed to fetch data. Status: {response.status_code}")
+                    logger.error(f"Response: {response.text[:500]}")
+
+            except Exception as e:
+                logger.error(f"Error fetching data (attempt {attempt + 1}): {str(e)}")
+
+        return pd.DataFrame()
+
+    async def async_request(self, list_dict: list[dict], start_date: str, end_date: str, max_concurrency: int = max_concurrency,
+                            incremental: bool = False) -> list[pd.DataFrame]:
+        """Download every scrip with at most max_concurrency requests in flight on a single event loop."""
+        # Created per run, like the semaphore, so each lock belongs to the event loop using it
+        cookie_lock = asyncio.Lock()
+        semaphore = asyncio.Semaphore(max_concurrency)
+
+        async with AsyncSession(impersonate=random.choice(BROWSER_IMPERSONATION), max_clients=max_concurrency) as session:
+            frames = await asyncio.gather(*(
+                self.request_data_async(session, semaphore, cookie_lock, scrip_dict, start_date, end_date, incremental)
                 for scrip_dict in list_dict
-            }
-            wait(future_to_url, return_when=ALL_COMPLETED)
-            for future in as_completed(future_to_url):
-                data = future_to_url[future]
-                try:
-                    df = future.result()[keep_cols]
-                    result.append(df)
-                except Exception as exc:
-                    logger.error('%r generated an exception: %s. Please try again later.' % (data, exc))
-                    raise exc
-                
-        return result
\ No newline at end of file
+            ))
+
+        result = []
+        for scrip_dict, df in zip(list_dict, frames):
+            try:
+                result.append(df[keep_cols])
+            except Exception as exc:
+                logger.error('%r generated an exception: %s. Please try again later.' % (scrip_dict, exc))
+                raise exc
+
+        return result
@@ -0,0 +1,129 @@
+import sqlite3
+from datetime import date, timedelta
+from unittest import mock
+
+import pandas as pd
+import pytest
+
+from investoscrapo.utils.cache import HistoricalCache
+
+
+def rows(start, end):
+    dates = pd.bdate_range(start, end)
+    return pd.DataFrame({"Date": dates, "Close": [float(i) for i in range(len(dates))]})
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return HistoricalCache(str(tmp_path / "history.sqlite"))
+
+
+def coverage_rows(cache):
+    with sqlite3.connect(cache.path) as conn:
+        return conn.execute("SELECT start_date, end_date FROM coverage ORDER BY start_date").fetchall()
+
+
+def test_missing_ranges_of_empty_cache_is_whole_range(cache):
+    assert cache.missing_ranges("s", "X", "2024-01-01", "2024-03-31") == [("2024-01-01", "2024-03-31")]
+
+
+def test_missing_ranges_around_covered_intervals(cache):
+    cache.put("s", "X", "2024-01-10", "2024-01-31", rows("2024-01-10", "2024-01-31"), "Date")
+    cache.put("s", "X", "2024-02-10", "2024-02-20", rows("2024-02-10", "2024-02-20"), "Date")
+
+    assert cache.missing_ranges("s", "X", "2024-01-01", "2024-03-01") == [
+        ("2024-01-01", "2024-01-09"),
+        ("2024-02-01", "2024-02-09"),
+        ("2024-02-21", "2024-03-01"),
+    ]
+    assert cache.missing_ranges("s", "X", "2024-01-15", "2024-01-20") == []
+
+
+def test_touching_intervals_are_covered_together(cache):
+    cache.put("s", "X", "2024-01-01", "2024-01-31", rows("2024-01-01", "2024-01-31"), "Date")
+    cache.put("s", "X", "2024-02-01", "2024-02-29", rows("2024-02-01", "2024-02-29"), "Date")
+
+    merged = cache.get("s", "X", "2024-01-20", "2024-02-10", "Date")
+    assert merged is not None
+    assert merged["Date"].is_monotonic_increasing and merged["Date"].is_unique
+    assert len(coverage_rows(cache)) == 1
+
+
+def test_rows_spanning_years_are_merged_and_deduplicated(cache):
+    cache.put("s", "X", "2023-12-01", "2024-01-31", rows("2023-12-01", "2024-01-31"), "Date")
+    update = rows("2024-01-15", "2024-02-15").assign(Close=-1.0)
+    cache.put("s", "X", "2024-01-15", "2024-02-15", update, "Date")
+
+    df = cache.get("s", "X", "2023-12-01", "2024-02-15", "Date")
+    assert df["Date"].is_unique and df["Date"].is_monotonic_increasing
+    assert len(df) == len(pd.bdate_range("2023-12-01", "2024-02-15"))
+    assert (df.loc[df["Date"] >= "2024-01-15", "Close"] == -1.0).all()
+
+
+def test_covered_range_without_rows_reads_as_empty(cache):
+    cache.put("s", "X", "2024-01-01", "2024-01-31", rows("2024-01-01", "2024-01-31"), "Date")
+
+    weekend = cache.get("s", "X", "2024-01-06", "2024-01-07", "Date")
+    assert weekend is not None and weekend.empty
+    assert list(weekend.columns) == ["Date", "Close"]
+
+
+def test_stale_coverage_only_trusts_days_closed_at_fetch(tmp_path):
+    today = date.today()
+    cache = HistoricalCache(str(tmp_path / "history.sqlite"), ttl=0)
+    cache.put("s", "X", today - timedelta(days=10), today, rows(today - timedelta(days=10), today), "Date")
+
+    assert cache.missing_ranges("s", "X", today - timedelta(days=10), today) == [(today.isoformat(), today.isoformat())]
+    assert cache.get("s", "X", today - timedelta(days=10), today, "Date") is None
+    assert cache.get("s", "X", today - timedelta(days=10), today - timedelta(days=1), "Date") is not None
+
+
+def test_fresh_coverage_trusts_the_fetch_day(cache):
+    today = date.today()
+    cache.put("s", "X", today - timedelta(days=10), today, rows(today - timedelta(days=10), today), "Date")
+
+    assert cache.missing_ranges("s", "X", today - timedelta(days=10), today) == []
+
+
+def test_daily_refreshes_through_today_do_not_grow_coverage(cache):
+    now = 1_000_000_000.0
+    first_fetch = date.fromtimestamp(now)
+    for day in range(10):
+        fetched = now + day * 86400
+        end = first_fetch + timedelta(days=day)
+        with mock.patch("investoscrapo.utils.cache.time.time", return_value=fetched):
+            cache.put("s", "X", end - timedelta(days=30), end, rows(end - timedelta(days=30), end), "Date")
+
+    # One merged range of closed days, plus the latest fetch's own row
+    assert len(coverage_rows(cache)) <= 2
+
+
+def test_unreadable_rows_are_a_miss(cache):
+    cache.put("s", "X", "2024-01-01", "2024-01-31", rows("2024-01-01", "2024-01-31"), "Date")
+    with sqlite3.connect(cache.path) as conn:
+        conn.execute("UPDATE pieces SET data = ? WHERE period = 2024", (b"not a pickle",))
+
+    assert cache.get("s", "X", "2024-01-01", "2024-01-31", "Date") is None
+    # The instrument is forgotten, so the whole range is downloaded again
+    assert cache.missing_ranges("s", "X", "2024-01-01", "2024-01-31") == [("2024-01-01", "2024-01-31")]
+
+    cache.put("s", "X", "2024-01-01", "2024-01-31", rows("2024-01-01", "2024-01-31"), "Date")
+    assert len(cache.get("s", "X", "2024-01-01", "2024-01-31", "Date")) == len(pd.bdate_range("2024-01-01", "2024-01-31"))
+
+
+def test_unreadable_rows_are_replaced_on_put(cache):
+    cache.put("s", "X", "2024-01-01", "2024-01-31", rows("2024-01-01", "2024-01-31"), "Date")
+    with sqlite3.connect(cache.path) as conn:
+        conn.execute("UPDATE pieces SET data = ? WHERE period = 2024", (b"not a pickle",))
+
+    cache.put("s", "X", "2024-02-01", "2024-02-29", rows("2024-02-01", "2024-02-29"), "Date")
+    assert cache.missing_ranges("s", "X", "2024-01-01", "2024-02-29") == [("2024-01-01", "2024-01-31")]
+    assert len(cache.get("s", "X", "2024-02-01", "2024-02-29", "Date")) == len(pd.bdate_range("2024-02-01", "2024-02-29"))
+
+
+def test_unreadable_state_is_none(cache):
+    cache.put_state("s", "key", {"a": 1})
+    with sqlite3.connect(cache.path) as conn:
+        conn.execute("UPDATE states SET data = ?", (b"not a pickle",))
+
+    assert cache.get_state("s", "key") is None
@@ -0,0 +1,44 @@
+import asyncio
+from unittest import mock
+
+import pandas as pd
+import pytest
+
+from investoscrapo.client import InvestingClient
+
+SCRIP = {"id": 1, "symbol": "AAA"}
+
+
+def frame():
+    return pd.DataFrame({"rowDate": ["Jan 02, 2024"], "last_closeRaw": [1.0], "volumeRaw": [10.0],
+                         "symbol": ["AAA"], "instrument_id": [1]})
+
+
+@pytest.fixture
+def client():
+    client = InvestingClient(use_cache=False)
+    client.scraper.threaded_request = mock.Mock(return_value=[frame()])
+    client.scraper.async_request = mock.AsyncMock(return_value=[frame()])
+    return client
+
+
+def test_async_engine_runs_its_own_loop(client):
+    panel = client.Download_Historical([SCRIP], "2024-01-01", "2024-01-31", engine="async")
+    client.scraper.async_request.assert_awaited_once()
+    client.scraper.threaded_request.assert_not_called()
+    assert panel[("last_closeRaw", "AAA")].tolist() == [1.0]
+
+
+def test_async_engine_inside_a_running_loop_falls_back_to_threads(client):
+    async def caller():
+        return client.Download_Historical([SCRIP], "2024-01-01", "2024-01-31", engine="async")
+
+    panel = asyncio.run(caller())
+    client.scraper.threaded_request.assert_called_once()
+    client.scraper.async_request.assert_not_called()
+    assert panel[("last_closeRaw", "AAA")].tolist() == [1.0]
+
+
+def test_unknown_engine(client):
+    with pytest.raises(ValueError):
+        client.Download_Historical([SCRIP], "2024-01-01", "2024-01-31", engine="processes")
@@ -0,0 +1,110 @@
+import json
+import os
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from investoscrapo.utils.column_store import MANIFEST, ColumnStore
+
+SCHEMA = {"Date": "<M8[D]", "Close": "<f8"}
+
+
+def day(date, symbols=("AAA", "BBB")):
+    return pd.DataFrame({
+        "Symbol": list(symbols),
+        "Date": pd.Timestamp(date),
+        "Close": np.arange(len(symbols), dtype=float),
+    })
+
+
+def manifest(root):
+    with open(os.path.join(root, MANIFEST)) as f:
+        return json.load(f)
+
+
+def crash_after(writes):
+    """A stand-in for open() whose file writes fail after the first writes, like a process dying mid-append."""
+    real_open, count = open, [0]
+
+    def fake_open(path, mode="r", *args, **kwargs):
+        f = real_open(path, mode, *args, **kwargs)
+        if mode == "ab":
+            count[0] += 1
+            if count[0] > writes:
+                f.close()
+                raise OSError("simulated crash")
+        return f
+
+    return fake_open
+
+
+def test_append_and_read(tmp_path):
+    store = ColumnStore(str(tmp_path), SCHEMA)
+    store.append(day("2024-01-02"), "Symbol", ["2024-01-02"], meta={"AAA": {"ISIN": "X1"}})
+    store.append(day("2024-01-03"), "Symbol", ["2024-01-03"])
+
+    assert store.keys() == ["AAA", "BBB"]
+    assert store.batches == ["2024-01-02", "2024-01-03"]
+    assert store.meta("AAA") == {"ISIN": "X1"}
+    assert list(store.read("AAA")["Date"]) == [pd.Timestamp("2024-01-02"), pd.Timestamp("2024-01-03")]
+
+    reopened = ColumnStore(str(tmp_path), SCHEMA)
+    assert reopened.done("2024-01-03") and len(reopened.read("BBB")) == 2
+
+
+def test_failed_append_is_rolled_back_and_resumes(tmp_path):
+    store = ColumnStore(str(tmp_path), SCHEMA)
+    store.append(day("2024-01-02"), "Symbol", ["2024-01-02"])
+
+    with mock.patch("builtins.open", crash_after(3)), pytest.raises(OSError):
+        store.append(day("2024-01-03"), "Symbol", ["2024-01-03"])
+    assert not store.done("2024-01-03")
+    assert manifest(tmp_path)["rows"] == {"AAA": 1, "BBB": 1}
+
+    # A later append on the same object must not record the failed batch's rows
+    store.append(day("2024-01-03"), "Symbol", ["2024-01-03"])
+    store.append(day("2024-01-04"), "Symbol", ["2024-01-04"])
+    for symbol in ("AAA", "BBB"):
+        dates = store.read(symbol)["Date"]
+        assert len(dates) == 3 and dates.is_unique
+        assert os.path.getsize(tmp_path / symbol / "Close") == 3 * 8
+
+
+def test_interrupted_append_is_repaired_on_open(tmp_path):
+    store = ColumnStore(str(tmp_path), SCHEMA)
+    store.append(day("2024-01-02"), "Symbol", ["2024-01-02"])
+
+    # A process that died mid-append: the batch is pending and a column file ran past the manifest
+    with open(tmp_path / "AAA" / "Close", "ab") as f:
+        f.write(np.zeros(1).tobytes())
+    state = manifest(tmp_path)
+    state["pending"] = ["2024-01-03"]
+    with open(tmp_path / MANIFEST, "w") as f:
+        json.dump(state, f)
+
+    resumed = ColumnStore(str(tmp_path), SCHEMA)
+    assert manifest(tmp_path)["pending"] == []
+    assert os.path.getsize(tmp_path / "AAA" / "Close") == 8
+    assert not resumed.done("2024-01-03")
+
+    resumed.append(day("2024-01-03"), "Symbol", ["2024-01-03"])
+    assert list(resumed.read("AAA")["Close"]) == [0.0, 0.0]
+
+
+def test_batches_appended_by_another_store_are_skipped(tmp_path):
+    first, second = ColumnStore(str(tmp_path), SCHEMA), ColumnStore(str(tmp_path), SCHEMA)
+    first.append(day("2024-01-02"), "Symbol", ["2024-01-02"])
+    second.append(day("2024-01-02"), "Symbol", ["2024-01-02"])
+    second.append(day("2024-01-03"), "Symbol", ["2024-01-03"])
+
+    reopened = ColumnStore(str(tmp_path), SCHEMA)
+    assert reopened.batches == ["2024-01-02", "2024-01-03"]
+    assert len(reopened.read("AAA")) == 2
+
+
+def test_schema_mismatch(tmp_path):
+    ColumnStore(str(tmp_path), SCHEMA)
+    with pytest.raises(ValueError):
+        ColumnStore(str(tmp_path), {"Close": "<f4"})
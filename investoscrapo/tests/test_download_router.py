@@ -0,0 +1,84 @@
+import time
+from unittest import mock
+
+import pandas as pd
+import pytest
+
+from download_router import DownloadRouter, to_common
+
+
+class Router(DownloadRouter):
+    """A DownloadRouter over stub sources, tried in the order given with the requested one first."""
+
+    def __init__(self, sources, hedge_delay=5.0):
+        with mock.patch("download_router.get_identity_map"):
+            super().__init__(preference=list(sources), hedge_delay=hedge_delay, use_yahoo=False)
+        self.sources = sources
+        self.calls = []
+
+    def candidates(self, scrip_dict, source, start_date, end_date):
+        return [(s, scrip_dict) for s in [source] + [s for s in self.sources if s != source]]
+
+    def fetch(self, source, scrip_dict, start_date, end_date):
+        self.calls.append(source)
+        return to_common(self.sources[source](scrip_dict), source)
+
+
+def answer(delay=0.0, close=100.0):
+    def fetch(scrip_dict):
+        time.sleep(delay)
+        return pd.DataFrame({"Date": pd.bdate_range("2024-01-01", periods=3), "Close": close, "Volume": 10.0})
+    return fetch
+
+
+def fail(scrip_dict):
+    raise ConnectionError("source down")
+
+
+def nothing(scrip_dict):
+    return pd.DataFrame(columns=["Date", "Close", "Volume"])
+
+
+@pytest.mark.parametrize("broken", [fail, nothing])
+def test_fails_over_at_once_without_waiting_for_the_hedge(broken):
+    router = Router({"nse": broken, "bse": answer()}, hedge_delay=5.0)
+    started = time.monotonic()
+    df = router.download({"id": "TCS"}, "nse", "2024-01-01", "2024-01-03")
+
+    assert time.monotonic() - started < 1
+    assert router.calls == ["nse", "bse"]
+    assert df["Source"].unique().tolist() == ["bse"]
+
+
+def test_slow_source_is_hedged_and_the_first_answer_wins():
+    router = Router({"nse": answer(delay=1.0, close=1.0), "bse": answer(close=2.0)}, hedge_delay=0.1)
+    started = time.monotonic()
+    df = router.download({"id": "TCS"}, "nse", "2024-01-01", "2024-01-03")
+
+    assert time.monotonic() - started < 0.8
+    assert router.calls == ["nse", "bse"]
+    assert df["Source"].unique().tolist() == ["bse"] and (df["Close"] == 2.0).all()
+
+
+def test_fast_source_is_not_hedged():
+    router = Router({"nse": answer(close=1.0), "bse": answer(close=2.0)}, hedge_delay=0.5)
+    df = router.download({"id": "TCS"}, "nse", "2024-01-01", "2024-01-03")
+    assert router.calls == ["nse"]
+    assert df["Source"].tolist() == ["nse"] * 3
+
+
+def test_every_source_failing_gives_none():
+    router = Router({"nse": fail, "bse": nothing}, hedge_delay=0.1)
+    assert router.download({"id": "TCS"}, "nse", "2024-01-01", "2024-01-03") is None
+    assert sorted(router.calls) == ["bse", "nse"]
+
+
+def test_download_many_labels_by_requested_symbol_and_skips_failures():
+    sources = {"nse": lambda scrip_dict: answer()(scrip_dict) if scrip_dict["id"] == "A" else fail(scrip_dict),
+               "bse": lambda scrip_dict: answer(close=2.0)(scrip_dict) if scrip_dict["id"] == "B" else nothing(scrip_dict)}
+    router = Router(sources, hedge_delay=5.0)
+    panel = router.download_many([{"id": "A", "symbol": "AAA"}, {"id": "B", "symbol": "BBB"}, {"id": "C"}],
+                                 "nse", "2024-01-01", "2024-01-03")
+
+    assert sorted(panel.columns.get_level_values("Symbol").unique()) == ["AAA", "BBB"]
+    assert panel[("Close", "BBB")].tolist() == [2.0] * 3
@@ -0,0 +1,97 @@
+import pandas as pd
+import pytest
+
+from investoscrapo.utils.cache import HistoricalCache
+from investoscrapo.utils.history_client import HistoryClient
+
+
+class Client(HistoryClient):
+    """
+    A HistoryClient whose downloads come from a dict of frames: None entries fail,
+    exceptions are raised, and ids in fail fail that many times first.
+    """
+
+    source = "stub"
+
+    def __init__(self, frames, cache=None, fail=None):
+        self.frames = frames
+        self.cache = cache
+        self.fail = dict(fail or {})
+        self.calls = []
+
+    def download_data(self, scrip_dict, start_date, end_date):
+        self.calls.append((scrip_dict["id"], start_date, end_date))
+        if self.fail.get(scrip_dict["id"]):
+            self.fail[scrip_dict["id"]] -= 1
+            return None
+        df = self.frames[scrip_dict["id"]]
+        if df is None:
+            return None
+        if isinstance(df, Exception):
+            raise df
+        dates = df["Date"]
+        return df[(dates >= pd.Timestamp(start_date)) & (dates <= pd.Timestamp(end_date))].reset_index(drop=True)
+
+
+def prices(symbol, start, end):
+    dates = pd.bdate_range(start, end)
+    return pd.DataFrame({"Date": dates, "Close": 100.0, "Volume": 10.0, "Symbol": symbol})
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return HistoricalCache(str(tmp_path / "history.sqlite"))
+
+
+def test_range_without_trading_days_is_cached_as_covered(cache):
+    client = Client({"A": prices("A", "2024-01-01", "2024-01-31")}, cache)
+
+    # A weekend: no rows, but a well-formed answer
+    weekend = client.request_data({"id": "A"}, "2024-01-06", "2024-01-07")
+    assert weekend is not None and weekend.empty
+    assert cache.missing_ranges("stub", "A", "2024-01-06", "2024-01-07") == []
+
+    client.request_data({"id": "A"}, "2024-01-06", "2024-01-07", incremental=True)
+    assert len(client.calls) == 1
+
+
+def test_incremental_downloads_only_the_gaps(cache):
+    client = Client({"A": prices("A", "2024-01-01", "2024-03-31")}, cache)
+    client.request_data({"id": "A"}, "2024-01-15", "2024-02-15")
+    df = client.request_data({"id": "A"}, "2024-01-01", "2024-03-01", incremental=True)
+
+    assert client.calls[1:] == [("A", "2024-01-01", "2024-01-14"), ("A", "2024-02-16", "2024-03-01")]
+    assert df["Date"].is_unique and len(df) == len(pd.bdate_range("2024-01-01", "2024-03-01"))
+
+
+def test_failed_download_is_not_cached(cache):
+    client = Client({"A": None}, cache)
+    assert client.request_data({"id": "A"}, "2024-01-01", "2024-01-31") is None
+    assert cache.missing_ranges("stub", "A", "2024-01-01", "2024-01-31") == [("2024-01-01", "2024-01-31")]
+
+
+def test_empty_result_counts_as_success_in_download_many(cache):
+    client = Client({"A": prices("A", "2024-01-01", "2024-01-31"), "B": prices("B", "2024-03-01", "2024-03-31")}, cache)
+    panel = client.download_many([{"id": "A"}, {"id": "B"}], "2024-01-06", "2024-01-12", retries=2)
+
+    # B had no rows in the range: downloaded once, never retried
+    assert [call[0] for call in client.calls].count("B") == 1
+    assert list(panel.columns.get_level_values("Symbol").unique()) == ["A"]
+
+
+def test_download_many_retries_failures_in_later_rounds(cache):
+    frames = {symbol: prices(symbol, "2024-01-01", "2024-01-31") for symbol in "ABC"}
+    frames.update(D=None, E=ConnectionError("reset"))
+    client = Client(frames, cache, fail={"B": 1, "C": 2})
+    panel = client.download_many([{"id": symbol} for symbol in "ABCDE"], "2024-01-01", "2024-01-31", retries=2)
+
+    # B recovers in the first retry, C in the second; D and E fail every round and are left out
+    assert sorted(panel.columns.get_level_values("Symbol").unique()) == ["A", "B", "C"]
+    assert {symbol: [call[0] for call in client.calls].count(symbol) for symbol in "ABCDE"} == \
+        {"A": 1, "B": 2, "C": 3, "D": 3, "E": 3}
+
+
+def test_download_many_without_retries_tries_each_once(cache):
+    client = Client({"A": prices("A", "2024-01-01", "2024-01-31")}, cache, fail={"A": 1})
+    panel = client.download_many([{"id": "A"}], "2024-01-01", "2024-01-31", retries=0)
+    assert panel.empty and len(client.calls) == 1
@@ -0,0 +1,74 @@
+import pandas as pd
+import pytest
+
+from investoscrapo.utils.cache import HistoricalCache
+from investoscrapo.utils.identity_map import IdentityMap
+from investoscrapo.utils.symbol_master import SymbolMaster
+
+RELIANCE_ISIN = "INE002A01018"
+TCS_ISIN = "INE467B01029"
+
+NSE = [
+    {"id": "RELIANCE", "symbol": "RELIANCE", "description": "Reliance Industries Limited", "exchange": "NSE",
+     "type": "Equity - NSE", "isin": RELIANCE_ISIN},
+    {"id": "TCS", "symbol": "TCS", "description": "Tata Consultancy Services Limited", "exchange": "NSE",
+     "type": "Equity - NSE", "isin": TCS_ISIN},
+]
+
+
+@pytest.fixture
+def master(tmp_path):
+    master = SymbolMaster(str(tmp_path / "symbols.sqlite"))
+    master.add(NSE, "nse")
+    return master
+
+
+def ids(results):
+    return [(result["source"], result["id"]) for result in results]
+
+
+def test_bse_listing_inherits_isin_from_nse_by_name(master):
+    identities = IdentityMap(master)
+    identities.record([{"id": "500325", "symbol": "500325", "description": "RELIANCE INDUSTRIES LTD.",
+                        "exchange": "BSE"}], "bse")
+    assert identities.listing("bse", "500325")["isin"] == RELIANCE_ISIN
+    assert identities.resolve("bse", "500325", "nse")["id"] == "RELIANCE"
+    assert ids(master.lookup(RELIANCE_ISIN)) == [("nse", "RELIANCE"), ("bse", "500325")]
+
+
+def test_isin_passes_to_earlier_listings_without_one(tmp_path):
+    master = SymbolMaster(str(tmp_path / "symbols.sqlite"))
+    master.add([{"id": "532540", "description": "TATA CONSULTANCY SERVICES LTD.", "exchange": "BSE"}], "bse")
+    master.lookup("tata")
+    master.add([NSE[1]], "nse")
+    assert ids(master.lookup(TCS_ISIN)) == [("bse", "532540"), ("nse", "TCS")]
+
+
+def test_names_are_not_matched_outside_nse_and_bse(master):
+    identities = IdentityMap(master)
+    identities.record([{"id": "RELX", "symbol": "RELX", "description": "Reliance Industries Ltd", "exchange": "NYSE"}],
+                      "investing")
+    assert identities.listing("investing", "RELX")["isin"] is None
+    assert identities.identity(source="investing", listing_id="RELX") == {
+        "isin": None, "listings": {"investing": identities.listing("investing", "RELX")}}
+
+
+def test_yahoo_ticker_inherits_isin_from_its_suffix(master):
+    identities = IdentityMap(master)
+    identities.record([{"id": "TCS.NS", "symbol": "TCS.NS", "description": "Tata Consultancy", "exchange": "NSI"}], "yahoo")
+    identity = identities.identity(isin=TCS_ISIN)
+    assert set(identity["listings"]) == {"nse", "yahoo"}
+
+
+def test_route_prefers_a_source_with_the_range_cached(tmp_path, master):
+    identities = IdentityMap(master)
+    identities.record([{"id": "500325", "description": "Reliance Industries Ltd", "exchange": "BSE"}], "bse")
+    identity = identities.identity(isin=RELIANCE_ISIN)
+    cache = HistoricalCache(str(tmp_path / "history.sqlite"))
+
+    assert identities.route(identity, "2024-01-01", "2024-01-31", cache, preference=("nse", "bse"))[0] == "nse"
+    dates = pd.bdate_range("2024-01-01", "2024-01-31")
+    cache.put("bse", "500325", "2024-01-01", "2024-01-31", pd.DataFrame({"Date": dates, "Close": 1.0}), "Date")
+    assert identities.route(identity, "2024-01-01", "2024-01-31", cache, preference=("nse", "bse"))[0] == "bse"
+    assert identities.route({"listings": {}}, "2024-01-01", "2024-01-31") is None
+
@@ -0,0 +1,108 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from investoscrapo.utils.memo import Memo, TTLCache
+
+
+class Clock():
+    """A monotonic clock that only moves when told to."""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class Search():
+    """A slow search that counts its calls; queries in fail raise."""
+
+    def __init__(self, delay=0.0, fail=()):
+        self.delay = delay
+        self.fail = fail
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, query):
+        with self._lock:
+            self.calls += 1
+        time.sleep(self.delay)
+        if query in self.fail:
+            raise ConnectionError(query)
+        return [query.upper()] if query else None
+
+
+def test_entries_expire_after_ttl():
+    clock = Clock()
+    cache = TTLCache(maxsize=10, ttl=60, clock=clock)
+    cache.put("a", 1)
+
+    clock.now += 60
+    assert cache.get("a") == 1
+    clock.now += 1
+    assert cache.get("a") is None
+    assert len(cache) == 0
+
+
+def test_least_recently_used_entry_is_evicted_first():
+    cache = TTLCache(maxsize=2, ttl=60)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    cache.get("a")
+    cache.put("c", 3)
+    assert [cache.get(key) for key in "abc"] == [1, None, 3]
+
+
+def test_memo_calls_again_once_the_answer_expired():
+    clock, search = Clock(), Search()
+    memo = Memo(maxsize=10, ttl=60, clock=clock)
+
+    assert memo.get_or_call("tcs", lambda: search("tcs")) == ["TCS"]
+    assert memo.get_or_call("tcs", lambda: search("tcs")) == ["TCS"]
+    assert search.calls == 1
+
+    clock.now += 61
+    memo.get_or_call("tcs", lambda: search("tcs"))
+    assert search.calls == 2
+
+
+def test_concurrent_identical_calls_share_one_request():
+    search = Search(delay=0.2)
+    memo = Memo(maxsize=10, ttl=60)
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        results = list(executor.map(lambda _: memo.get_or_call("tcs", lambda: search("tcs")), range(8)))
+
+    assert results == [["TCS"]] * 8
+    assert search.calls == 1
+    assert memo._in_flight == {}
+
+
+def test_failures_reach_every_waiter_and_are_not_cached():
+    search = Search(delay=0.2, fail={"down"})
+    memo = Memo(maxsize=10, ttl=60)
+
+    def call(_):
+        try:
+            return memo.get_or_call("down", lambda: search("down"))
+        except ConnectionError as e:
+            return e
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        results = list(executor.map(call, range(4)))
+    assert search.calls == 1
+    assert all(isinstance(result, ConnectionError) for result in results)
+
+    with pytest.raises(ConnectionError):
+        memo.get_or_call("down", lambda: search("down"))
+    assert search.calls == 2
+
+
+def test_none_answer_is_retried():
+    search = Search()
+    memo = Memo(maxsize=10, ttl=60)
+    assert memo.get_or_call("", lambda: search("")) is None
+    assert memo.get_or_call("", lambda: search("")) is None
+    assert search.calls == 2
@@ -0,0 +1,124 @@
+import asyncio
+from unittest import mock
+
+import pytest
+
+from investoscrapo.utils import ratelimit
+from investoscrapo.utils.ratelimit import TokenBucket, configure_limits, get_limiter, host_of, retry_after_seconds
+
+
+class Clock():
+    """A monotonic clock that only moves when told to."""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+@pytest.fixture
+def clock():
+    return Clock()
+
+
+def test_burst_then_refill_at_rate(clock):
+    bucket = TokenBucket(rate=2.0, burst=3, clock=clock)
+    assert [bucket.try_acquire() for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert bucket.try_acquire() == pytest.approx(0.5)
+
+    clock.sleep(0.5)
+    assert bucket.try_acquire() == 0.0
+    # The bucket never holds more than burst tokens, however long it idles
+    clock.sleep(60)
+    assert [bucket.try_acquire() for _ in range(4)][-1] == pytest.approx(0.5)
+
+
+def test_throttle_halves_rate_and_drops_saved_tokens(clock):
+    bucket = TokenBucket(rate=4.0, burst=5, max_rate=8.0, clock=clock)
+    bucket.feedback(429)
+    assert bucket.rate == 2.0
+    assert bucket.try_acquire() == pytest.approx(0.5)
+
+    bucket.feedback(403)
+    bucket.feedback(403)
+    bucket.feedback(403)
+    bucket.feedback(403)
+    # Never below min_rate (rate / 16 by default)
+    assert bucket.rate == 0.25
+
+
+def test_retry_after_pauses_every_caller(clock):
+    bucket = TokenBucket(rate=10.0, burst=5, clock=clock)
+    bucket.feedback(429, retry_after=30)
+    assert bucket.try_acquire() == pytest.approx(30)
+    clock.sleep(29.9)
+    assert bucket.try_acquire() == pytest.approx(0.1)
+    clock.sleep(0.1)
+    assert bucket.try_acquire() == 0.0
+
+
+def test_success_recovers_additively_up_to_max_rate(clock):
+    bucket = TokenBucket(rate=1.0, burst=1, max_rate=1.25, increase=0.1, clock=clock)
+    bucket.feedback(429)
+    assert bucket.rate == 0.5
+    bucket.feedback(200)
+    bucket.feedback(200)
+    assert bucket.rate == pytest.approx(0.7)
+    for _ in range(10):
+        bucket.feedback(200)
+    assert bucket.rate == 1.25
+    # Other errors leave the rate alone
+    bucket.feedback(500)
+    assert bucket.rate == 1.25
+
+
+def test_acquire_sleeps_until_a_token_is_due(clock):
+    bucket = TokenBucket(rate=0.5, burst=1, clock=clock)
+    with mock.patch("investoscrapo.utils.ratelimit.time.sleep", side_effect=clock.sleep) as sleep:
+        bucket.acquire()
+        bucket.acquire()
+    # Two seconds until the next token, slept in steps of at most max_wait
+    assert clock.now == pytest.approx(1002.0)
+    assert all(call.args[0] <= TokenBucket.max_wait for call in sleep.call_args_list)
+
+
+def test_acquire_async_sees_a_rate_change_while_waiting(clock):
+    bucket = TokenBucket(rate=0.1, burst=1, max_rate=1.0, clock=clock)
+    bucket.try_acquire()
+
+    async def fake_sleep(seconds):
+        clock.sleep(seconds)
+        bucket.rate = 1.0  # recovered by other responses meanwhile
+
+    with mock.patch("investoscrapo.utils.ratelimit.asyncio.sleep", side_effect=fake_sleep):
+        asyncio.run(bucket.acquire_async())
+    # At 0.1/s it would have waited 10 s
+    assert clock.now - 1000.0 < 2.0
+
+
+def test_hosts_get_separate_buckets(monkeypatch):
+    monkeypatch.setattr(ratelimit, "_limiters", {})
+    monkeypatch.setattr(ratelimit, "_rate_limits", {})
+    configure_limits({"a.example.com": (2.0, 4, 3.0)})
+
+    a = get_limiter("https://a.example.com/search?q=x")
+    assert get_limiter("a.example.com") is a
+    assert (a.rate, a.burst, a.max_rate) == (2.0, 4, 3.0)
+
+    b = get_limiter("https://b.example.com/")
+    assert b is not a and b.rate == ratelimit.default_rate_limit[0]
+    a.feedback(429)
+    assert b.rate == ratelimit.default_rate_limit[0]
+
+
+def test_helpers():
+    assert host_of("https://www.bseindia.com/x.aspx") == "www.bseindia.com"
+    assert host_of("api.bseindia.com") == "api.bseindia.com"
+    response = mock.Mock(headers={"Retry-After": "7"})
+    assert retry_after_seconds(response) == 7.0
+    response.headers = {"Retry-After": "Wed, 21 Oct 2015 07:28:00 GMT"}
+    assert retry_after_seconds(response) is None
@@ -0,0 +1,86 @@
+import pickle
+from datetime import date
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from investoscrapo.utils.analytics import summarize
+from investoscrapo.utils.cache import HistoricalCache
+from investoscrapo.utils.rolling_state import RollingState, refresh_state, state_key
+
+WINDOW = 20
+
+
+def make_panel(days: int, end=None) -> pd.DataFrame:
+    """Calendar-day panel of three instruments and a benchmark ending on end (default today)."""
+    index = pd.date_range(end=pd.Timestamp(end or date.today()), periods=days, freq="D")
+    rng = np.random.default_rng(7)
+    market = rng.normal(0, 0.01, days)
+    closes = {"NIFTY": 100 * np.cumprod(1 + market)}
+    for i, symbol in enumerate(["AAA", "BBB", "CCC"]):
+        closes[symbol] = 50 * np.cumprod(1 + (i + 0.5) * market + rng.normal(0, 0.01, days))
+    closes["CCC"][:30] = np.nan  # listed later than the others
+    columns = pd.MultiIndex.from_tuples([(field, symbol) for field in ("Close", "Volume") for symbol in closes],
+                                        names=["field", "Symbol"])
+    data = np.hstack([np.column_stack(list(closes.values())), np.full((days, len(closes)), 1000.0)])
+    return pd.DataFrame(data, index=index, columns=columns)
+
+
+def assert_same(with_state, without):
+    assert with_state.keys() == without.keys()
+    for name in ("vol", "beta"):
+        pd.testing.assert_series_equal(with_state[name], without[name], rtol=1e-7)
+    for name in ("rolling_vol", "rolling_beta", "price", "volume", "tt"):
+        pd.testing.assert_frame_equal(with_state[name], without[name], rtol=1e-7)
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return HistoricalCache(str(tmp_path / "history.sqlite"))
+
+
+def test_summarize_with_state_matches_full_recompute(cache):
+    panel = make_panel(200)
+    state = refresh_state(cache, "stub", panel, "NIFTY", WINDOW)
+    assert_same(summarize(panel, "NIFTY", WINDOW, state=state), summarize(panel, "NIFTY", WINDOW))
+
+
+def test_refreshed_state_matches_full_recompute(cache):
+    panel = make_panel(300)
+    refresh_state(cache, "stub", panel.iloc[:250], "NIFTY", WINDOW)
+
+    # Later rows, and today's provisional close changing after the first refresh
+    state = refresh_state(cache, "stub", panel, "NIFTY", WINDOW)
+    assert_same(summarize(panel, "NIFTY", WINDOW, state=state), summarize(panel, "NIFTY", WINDOW))
+
+    moved = panel.copy()
+    moved.iloc[-1, 1] *= 1.05
+    state = refresh_state(cache, "stub", moved, "NIFTY", WINDOW)
+    assert_same(summarize(moved, "NIFTY", WINDOW, state=state), summarize(moved, "NIFTY", WINDOW))
+
+
+def test_stored_state_does_not_grow_with_history(cache):
+    panel = make_panel(400)
+    prices = panel.xs("Close", axis=1, level=0)
+    key = state_key(prices, "NIFTY", WINDOW)
+
+    refresh_state(cache, "stub", panel.iloc[:100], "NIFTY", WINDOW)
+    small = len(pickle.dumps(cache.get_state("stub", key)))
+    refresh_state(cache, "stub", panel, "NIFTY", WINDOW)
+    stored = cache.get_state("stub", key)
+
+    assert stored.last_date == prices.index[-2]  # today's row is not stored
+    # Same arrays, only a few scalars (dates, ring position) differ
+    assert abs(len(pickle.dumps(stored)) - small) < 100
+
+
+def test_update_skips_rows_already_seen():
+    prices = make_panel(120).xs("Close", axis=1, level=0)
+    once, twice = RollingState(prices.columns, WINDOW), RollingState(prices.columns, WINDOW)
+    once.update(prices, "NIFTY")
+    twice.update(prices.iloc[:70], "NIFTY")
+    twice.update(prices.iloc[50:], "NIFTY")
+
+    pd.testing.assert_series_equal(twice.beta(), once.beta())
+    pd.testing.assert_series_equal(twice.rolling_volatility(), once.rolling_volatility())
@@ -0,0 +1,147 @@
+import asyncio
+import time
+from unittest import mock
+
+import pytest
+
+from investoscrapo.scraper import Investing
+from investoscrapo.utils.endpoint_health import EndpointHealth
+
+FAST, SLOW, BROKEN = "https://fast.test/search", "https://slow.test/search", "https://broken.test/search"
+
+
+class Limiter():
+    async def acquire_async(self):
+        pass
+
+    def feedback(self, status_code, retry_after=None):
+        pass
+
+
+class Response():
+    def __init__(self, status_code, quotes):
+        self.status_code = status_code
+        self.quotes = quotes
+        self.headers = {}
+
+    def json(self):
+        return {"quotes": self.quotes}
+
+
+class Session():
+    """Stands in for AsyncSession: each endpoint answers after its own delay, or raises."""
+
+    endpoints = {}
+
+    def __init__(self, **kwargs):
+        self.asked = []
+        self.cancelled = []
+
+    async def __aenter__(self):
+        Session.last = self
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def get(self, url, params=None, **kwargs):
+        self.asked.append(url)
+        delay, answer = self.endpoints[url]
+        try:
+            await asyncio.sleep(delay)
+        except asyncio.CancelledError:
+            self.cancelled.append(url)
+            raise
+        if isinstance(answer, Exception):
+            raise answer
+        return answer
+
+
+@pytest.fixture
+def health():
+    return EndpointHealth()
+
+
+@pytest.fixture
+def scraper():
+    scraper = Investing(use_cache=False)
+    scraper.cookies = {"session": "test"}
+    scraper.get_cookies = mock.Mock()
+    return scraper
+
+
+@pytest.fixture
+def race(scraper, health):
+    def run(endpoints, head_start=0.3):
+        Session.endpoints = endpoints
+        with mock.patch("investoscrapo.scraper.search_urls", list(endpoints)), \
+                mock.patch("investoscrapo.scraper.get_endpoint_health", return_value=health), \
+                mock.patch("investoscrapo.scraper.get_limiter", return_value=Limiter()), \
+                mock.patch("investoscrapo.scraper.AsyncSession", Session), \
+                mock.patch("investoscrapo.scraper.remember"):
+            return asyncio.run(scraper.race_search_results("tcs", head_start=head_start))
+    return run
+
+
+def quotes(name):
+    return Response(200, [{"id": 1, "description": name}])
+
+
+def test_first_good_answer_wins_and_the_rest_are_cancelled(race, health):
+    started = time.monotonic()
+    result = race({SLOW: (1.0, quotes("slow")), FAST: (0.05, quotes("fast"))})
+
+    assert result[0]["description"] == "fast"
+    assert time.monotonic() - started < 0.5
+    assert Session.last.cancelled == [SLOW]
+    assert health.order([SLOW, FAST]) == [FAST, SLOW]
+
+
+def test_failing_and_empty_endpoints_are_skipped(race, health):
+    result = race({BROKEN: (0.0, ConnectionError("reset")), SLOW: (0.0, Response(200, [])),
+                   FAST: (0.1, quotes("fast"))})
+
+    assert result[0]["description"] == "fast"
+    assert not health.healthy(BROKEN) and not health.healthy(SLOW)
+    assert health.order([BROKEN, SLOW, FAST])[0] == FAST
+
+
+def test_no_answer_gives_none_and_a_403_refreshes_cookies(race, scraper, health):
+    assert race({BROKEN: (0.0, ConnectionError("reset")), FAST: (0.0, Response(403, None))}) is None
+    scraper.get_cookies.assert_called_once_with({"session": "test"})
+    assert health.order([FAST, BROKEN, "https://untried.test"])[0] == "https://untried.test"
+
+
+def test_healthy_endpoint_gets_a_head_start(race, health):
+    health.record(FAST, True, 0.1)
+    result = race({SLOW: (0.0, quotes("slow")), FAST: (0.05, quotes("fast"))}, head_start=0.5)
+
+    # Asked alone, and answered within its head start
+    assert result[0]["description"] == "fast"
+    assert Session.last.asked == [FAST]
+
+
+def test_others_join_once_the_head_start_runs_out(race, health):
+    health.record(SLOW, True, 0.1)
+    started = time.monotonic()
+    result = race({SLOW: (1.0, quotes("slow")), FAST: (0.05, quotes("fast"))}, head_start=0.1)
+
+    assert result[0]["description"] == "fast"
+    assert Session.last.asked == [SLOW, FAST]
+    assert time.monotonic() - started < 0.5
+    # The slow one was cancelled, not failed: it stays healthy, behind the faster one
+    assert health.healthy(SLOW) and health.order([SLOW, FAST]) == [FAST, SLOW]
+
+
+def test_order_ranks_working_by_latency_then_untried_then_failing():
+    health = EndpointHealth(smoothing=1.0)
+    health.record("a", False)
+    health.record("a", False)
+    health.record("b", False)
+    health.record("c", True, 0.5)
+    health.record("d", True, 0.2)
+    assert health.order(["a", "b", "c", "d", "e"]) == ["d", "c", "e", "b", "a"]
+
+    health.record("c", True, 0.1)
+    health.record("a", True, 0.3)
+    assert health.order(["a", "b", "c", "d", "e"]) == ["c", "d", "a", "e", "b"]
@@ -0,0 +1,98 @@
+import threading
+import time
+
+import pytest
+
+from investoscrapo.utils.symbol_master import SymbolMaster
+from search_service import SearchService, score_match, to_scrip_dicts
+
+TCS = {"id": "TCS", "symbol": "TCS", "description": "Tata Consultancy Services Limited", "exchange": "NSE",
+       "type": "Equity - NSE", "isin": "INE467B01029"}
+TCS_BSE = {**TCS, "id": "532540", "symbol": "532540", "exchange": "BSE", "type": "Stock - BSE"}
+TATA_STEEL = {"id": "TATASTEEL", "symbol": "TATASTEEL", "description": "Tata Steel Limited", "exchange": "NSE",
+              "type": "Equity - NSE"}
+
+
+class Investing():
+    """Stands in for InvestingClient: a slow Search that counts its calls."""
+
+    def __init__(self, results, delay=0.0):
+        self.results = results
+        self.delay = delay
+        self.queries = []
+        self._lock = threading.Lock()
+
+    def Search(self, query):
+        with self._lock:
+            self.queries.append(query)
+        time.sleep(self.delay)
+        return self.results.get(query.casefold(), [])
+
+
+@pytest.fixture
+def master(tmp_path):
+    return SymbolMaster(str(tmp_path / "symbols.sqlite"))
+
+
+@pytest.mark.parametrize("query, result, match", [
+    ("tcs", TCS, 1.0),
+    ("Tata Consultancy Services Ltd", TCS, 0.95),
+    ("Tata Consultancy", TCS, 0.8),
+])
+def test_match_rates_the_name_alone(query, result, match):
+    assert score_match(query, result)[1] == match
+
+
+def test_fuzzy_match_is_scaled_trigram_overlap():
+    _, match = score_match("Tata Consultancy Servcies", TCS)
+    assert 0.5 < match < 0.75
+    assert score_match("Infosys", TCS)[1] < 0.2
+
+
+def test_score_prefers_earlier_exchanges_and_listed_types():
+    assert score_match("tcs", TCS) == pytest.approx((1.3, 1.0))
+    assert score_match("Tata Consultancy Services", TCS) == pytest.approx((1.25, 0.95))
+    assert score_match("Tata Consultancy Services", TCS_BSE) == pytest.approx((1.15, 0.95))
+    assert score_match("tcs", {**TCS, "exchange": "NYSE", "type": "Index"}) == pytest.approx((0.7, 1.0))
+    assert score_match("tcs", {**TCS, "exchange": "NYSE"}, exchanges=(), types=()) == (1.0, 1.0)
+
+
+def test_resolve_many_picks_the_best_listing_and_applies_the_threshold(master):
+    investing = Investing({
+        "tcs": [TCS_BSE, TCS],
+        "tata consultancy services": [TATA_STEEL, TCS],
+        "infosys": [TATA_STEEL],
+    })
+    service = SearchService(investing=investing, master=master)
+    table = service.resolve_many(["TCS", "Tata Consultancy Services", "Infosys", None], offline=False)
+
+    assert table["query"].tolist() == ["TCS", "Tata Consultancy Services", "Infosys", ""]
+    assert table["id"].tolist()[:2] == ["TCS", "TCS"]
+    assert table["match"].tolist()[:2] == [1.0, 0.95]
+    # Below min_match, and blank names, are left unresolved
+    assert table["id"].isna().tolist() == [False, False, True, True]
+    assert [scrip["id"] for scrip in to_scrip_dicts(table)] == ["TCS", "TCS"]
+
+
+def test_resolve_many_searches_each_distinct_name_once(master):
+    investing = Investing({"tcs": [TCS]}, delay=0.1)
+    service = SearchService(investing=investing, master=master)
+    table = service.resolve_many(["TCS", "tcs ", "TCS", "TCS"], offline=False)
+
+    assert table["id"].tolist() == ["TCS"] * 4
+    # "TCS" and "tcs" are separate names but one normalized search
+    assert len(investing.queries) == 1
+
+    service.resolve_many(["TCS"], offline=False)
+    assert len(investing.queries) == 1
+
+
+def test_confident_master_match_needs_no_search(master):
+    master.add([TCS], "investing")
+    investing = Investing({"tata steel": [TATA_STEEL]})
+    service = SearchService(investing=investing, master=master)
+    table = service.resolve_many(["TCS", "Tata Steel"])
+
+    assert table["via"].tolist() == ["master", "search"]
+    assert table["id"].tolist() == ["TCS", "TATASTEEL"]
+    assert investing.queries == ["Tata Steel"]
@@ -0,0 +1,88 @@
+import pytest
+
+from investoscrapo.utils.symbol_master import SymbolMaster
+
+RELIANCE_ISIN = "INE002A01018"
+TCS_ISIN = "INE467B01029"
+
+NSE = [
+    {"id": "RELIANCE", "symbol": "RELIANCE", "description": "Reliance Industries Limited", "exchange": "NSE",
+     "type": "Equity - NSE", "isin": RELIANCE_ISIN},
+    {"id": "RELINFRA", "symbol": "RELINFRA", "description": "Reliance Infrastructure Limited", "exchange": "NSE",
+     "type": "Equity - NSE", "isin": "INE036A01016"},
+    {"id": "TCS", "symbol": "TCS", "description": "Tata Consultancy Services Limited", "exchange": "NSE",
+     "type": "Equity - NSE", "isin": TCS_ISIN},
+]
+
+
+@pytest.fixture
+def master(tmp_path):
+    master = SymbolMaster(str(tmp_path / "symbols.sqlite"))
+    master.add(NSE, "nse")
+    return master
+
+
+def ids(results):
+    return [(result["source"], result["id"]) for result in results]
+
+
+def test_prefix_lookup_ranks_symbols_before_names(master):
+    assert ids(master.lookup("RELIANCE"))[0] == ("nse", "RELIANCE")
+    assert ids(master.lookup("rel")) == [("nse", "RELIANCE"), ("nse", "RELINFRA")]
+    # Any word of the name from the second on is a prefix key too
+    assert ids(master.lookup("consultancy")) == [("nse", "TCS")]
+    assert master.lookup("rel", source="bse") == []
+
+
+def test_fuzzy_lookup_only_without_prefix_matches(master):
+    assert ids(master.lookup("Relaince Industries"))[0] == ("nse", "RELIANCE")
+    assert master.lookup("Relaince Industries", fuzzy=False) == []
+    assert master.lookup("zzzz qqqq") == []
+
+
+def test_isin_lookup(master):
+    assert ids(master.lookup(TCS_ISIN)) == [("nse", "TCS")]
+    assert ids(master.lookup(TCS_ISIN.lower())) == [("nse", "TCS")]
+    assert master.lookup("INE000000000") == []
+
+
+def test_re_adding_a_changed_record_updates_the_built_index(master):
+    master.lookup("rel")  # build the index
+    renamed = {**NSE[2], "symbol": "TCSNEW", "description": "TCS Limited"}
+    master.add([renamed], "nse")
+
+    assert ids(master.lookup("TCSNEW")) == [("nse", "TCS")]
+    assert master.lookup("consultancy", fuzzy=False) == []
+    assert len(master) == 3
+
+    # New listings are searchable straight away too
+    master.add([{"id": "INFY", "description": "Infosys Limited", "exchange": "NSE"}], "nse")
+    assert ids(master.lookup("infosys")) == [("nse", "INFY")]
+
+
+def test_index_is_rebuilt_once_mostly_replaced(master):
+    master.lookup("rel")
+    for n in range(3):
+        master.add([{**record, "type": f"v{n}"} for record in NSE], "nse")
+    assert master._index is None
+    assert [result["type"] for result in master.lookup("rel")] == ["v2", "v2"]
+
+
+def test_set_isin_updates_lookup(master):
+    master.add([{"id": "500209", "symbol": "500209", "description": "INFOSYS LTD", "exchange": "BSE"}], "bse")
+    master.lookup("infosys")
+    master.set_isin("bse", 500209, "ine009a01021")
+    assert ids(master.lookup("INE009A01021")) == [("bse", "500209")]
+
+
+def test_reopening_from_disk(master):
+    master.set_isin("nse", "RELINFRA", "INE036A01099")
+    reopened = SymbolMaster(master.path)
+    assert len(reopened) == 3
+    assert ids(reopened.lookup("INE036A01099")) == [("nse", "RELINFRA")]
+    assert ids(reopened.lookup("tata")) == [("nse", "TCS")]
+
+
+def test_result_without_isin_keeps_the_one_learnt_earlier(master):
+    master.add([{**NSE[0], "isin": None}], "nse")
+    assert master.lookup("RELIANCE")[0]["isin"] == RELIANCE_ISIN
@@ -0,0 +1,47 @@
+import numpy as np
+import pandas as pd
+
+from investoscrapo.utils.transformer import build_full_panel_with_ids, build_panel, compact_panel
+
+
+def panel(volumes):
+    columns = pd.MultiIndex.from_tuples(
+        [("last_closeRaw", "A"), ("volumeRaw", "A"), ("symbol", "A")], names=["field", "symbol"]
+    )
+    return pd.DataFrame([[1.0 + i, volume, "A"] for i, volume in enumerate(volumes)], columns=columns)
+
+
+def test_integral_volumes_become_nullable_integers():
+    compact = compact_panel(panel([10.0, np.nan]))
+    assert compact[("volumeRaw", "A")].dtype == "Int64"
+    assert compact[("last_closeRaw", "A")].dtype == "float32"
+    assert compact[("volumeRaw", "A")].isna().tolist() == [False, True]
+
+
+def test_fractional_volumes_stay_float():
+    compact = compact_panel(panel([0.5, 1.25]))
+    assert compact[("volumeRaw", "A")].dtype == "float64"
+    assert compact[("volumeRaw", "A")].tolist() == [0.5, 1.25]
+
+
+def investing_frames():
+    days = pd.bdate_range("2024-01-01", periods=5)
+    return [
+        pd.DataFrame({"rowDate": days.strftime("%b %d, %Y"), "last_closeRaw": [1.0, 2, 3, 4, 5],
+                      "volumeRaw": 10.0, "symbol": "AAA", "instrument_id": 1}),
+        pd.DataFrame({"rowDate": days[2:].strftime("%b %d, %Y"), "last_closeRaw": [7.0, 8, 9],
+                      "volumeRaw": 20.0, "symbol": "AAA", "instrument_id": 2}),
+    ]
+
+
+def test_full_panel_keeps_instruments_apart_and_matches_build_panel():
+    full = build_full_panel_with_ids(investing_frames())
+    compact = build_panel(investing_frames())
+
+    assert list(full.columns) == [(field, "AAA") for field in ("last_closeRaw", "volumeRaw", "symbol", "instrument_id")] * 2
+    np.testing.assert_array_equal(full["last_closeRaw"].to_numpy(), compact["last_closeRaw"].to_numpy())
+    np.testing.assert_array_equal(full["volumeRaw"].to_numpy(), compact["volumeRaw"].to_numpy())
+    # Identifiers are repeated only on the days the instrument has a row
+    assert full.iloc[:, 3].tolist() == [1] * 5
+    assert full.iloc[:, 7].isna().tolist() == [True, True, False, False, False]
+    assert full.iloc[2:, 6].tolist() == ["AAA"] * 3
@@ -0,0 +1,205 @@
+"""
+Vectorized analytics over a downloaded panel.
+
+Every function works on the whole (date x instrument) matrix at once: returns,
+masks and moment sums are NumPy arrays with one column per instrument, and the
+rolling statistics come from cumulative sums, so a window costs two subtractions
+per cell whatever its length. Missing days stay NaN and are dropped pairwise,
+never filled.
+
+The panel can come from build_full_panel_with_ids (last_closeRaw / volumeRaw),
+build_panel or the BSE / NSE download_many (Close / Volume).
+"""
+import warnings
+from typing import Optional, Union
+
+import numpy as np
+import pandas as pd
+
+from investoscrapo.configs.constants import (
+    beta_window,
+    min_observations,
+    thin_min_volume,
+    thin_zero_ratio,
+    trading_days_per_year,
+)
+
+PRICE_FIELDS = ("last_closeRaw", "Close")
+VOLUME_FIELDS = ("volumeRaw", "Volume")
+
+
+def panel_field(panel: pd.DataFrame, fields=PRICE_FIELDS) -> pd.DataFrame:
+    """
+    The (date x instrument) float matrix of the first of fields present in the
+    panel's top column level. The instrument columns keep the remaining levels.
+    """
+    present = set(panel.columns.get_level_values(0))
+    for field in fields:
+        if field in present:
+            return panel.xs(field, axis=1, level=0).astype(float)
+    raise KeyError(f"Panel has none of the fields {list(fields)}")
+
+
+def returns(prices: pd.DataFrame) -> pd.DataFrame:
+    """Simple daily returns; a return is NaN unless both of its days have a positive price."""
+    p = prices.to_numpy(dtype=float)
+    p = np.where(p > 0, p, np.nan)
+    r = np.full_like(p, np.nan)
+    r[1:] = p[1:] / p[:-1] - 1
+    return pd.DataFrame(r, index=prices.index, columns=prices.columns)
+
+
+def benchmark_returns(prices: pd.DataFrame, benchmark) -> np.ndarray:
+    """
+    Daily returns of the benchmark, aligned to the panel's dates. benchmark is a
+    column position, a column label (the first match) or a Series of benchmark
+    prices indexed by date.
+    """
+    if isinstance(benchmark, pd.Series):
+        series = benchmark.reindex(prices.index)
+    else:
+        series = prices.iloc[:, benchmark_column(prices, benchmark)]
+    return returns(series.to_frame()).to_numpy()[:, 0]
+
+
+def benchmark_column(prices: pd.DataFrame, benchmark) -> int:
+    """Position of the benchmark column, given as a position or a label."""
+    if isinstance(benchmark, (int, np.integer)):
+        return int(benchmark)
+    for i, key in enumerate(prices.columns):
+        # A MultiIndex column also matches on its first level (the symbol)
+        if key == benchmark or (isinstance(key, tuple) and key[0] == benchmark):
+            return i
+    raise KeyError(f"Benchmark {benchmark!r} is not in the panel")
+
+
+def _window_sums(values: np.ndarray, window: Optional[int]) -> np.ndarray:
+    """Column sums over the whole period (window=None), or over each trailing window of rows."""
+    if window is None:
+        return values.sum(axis=0)
+    cumulative = np.zeros((len(values) + 1, values.shape[1]))
+    np.cumsum(values, axis=0, out=cumulative[1:])
+    ends = np.arange(1, len(values) + 1)
+    return cumulative[ends] - cumulative[np.maximum(ends - window, 0)]
+
+
+def _moments(x: np.ndarray, y: np.ndarray, window: Optional[int]):
+    """Pairwise-complete count, sums, sum of squares of x and cross sum, per column and window."""
+    same = x is y
+    mask = ~(np.isnan(x) | np.isnan(y))
+    x = np.where(mask, x, 0.0)
+    y = np.where(mask, y, 0.0)
+    n = _window_sums(mask.astype(float), window)
+    sx, sy = _window_sums(x, window), _window_sums(y, window)
+    sxy = _window_sums(x * y, window)
+    sxx = sxy if same else _window_sums(x * x, window)
+    return n, sx, sy, sxx, sxy
+
+
+def beta_from_sums(n, sx, sy, sxx, sxy, min_periods: int = min_observations) -> np.ndarray:
+    """Beta from pairwise-complete sums of benchmark (x) and instrument (y) returns."""
+    with np.errstate(divide="ignore", invalid="ignore"):
+        cov = sxy - sx * sy / n
+        var = sxx - sx * sx / n
+        return np.where((n >= min_periods) & (var > 0), cov / var, np.nan)
+
+
+def volatility_from_sums(n, s, ss, min_periods: int = min_observations,
+                         periods_per_year: int = trading_days_per_year) -> np.ndarray:
+    """Annualized volatility from the count, sum and sum of squares of daily returns."""
+    with np.errstate(divide="ignore", invalid="ignore"):
+        var = np.clip((ss - s * s / n) / (n - 1), 0, None)
+        return np.where(n >= max(min_periods, 2), np.sqrt(var * periods_per_year), np.nan)
+
+
+def _shape(values: np.ndarray, prices: pd.DataFrame, window: Optional[int]):
+    if window is None:
+        return pd.Series(values, index=prices.columns)
+    return pd.DataFrame(values, index=prices.index, columns=prices.columns)
+
+
+def beta(prices: pd.DataFrame, benchmark, window: Optional[int] = None,
+         min_periods: int = min_observations) -> Union[pd.Series, pd.DataFrame]:
+    """
+    Beta of every instrument against the benchmark: one value per instrument over
+    the whole period (window=None), or a rolling (date x instrument) frame over
+    the last window trading days. Fewer than min_periods paired returns give NaN.
+    """
+    r = returns(prices).to_numpy()
+    m = np.broadcast_to(benchmark_returns(prices, benchmark)[:, None], r.shape)
+    n, sx, sy, sxx, sxy = _moments(m, r, window)
+    return _shape(beta_from_sums(n, sx, sy, sxx, sxy, min_periods), prices, window)
+
+
+def volatility(prices: pd.DataFrame, window: Optional[int] = None, min_periods: int = min_observations,
+               periods_per_year: int = trading_days_per_year) -> Union[pd.Series, pd.DataFrame]:
+    """
+    Annualized volatility (sample standard deviation of daily returns times
+    sqrt(periods_per_year)), over the whole period or each trailing window.
+    """
+    r = returns(prices).to_numpy()
+    n, sx, _, sxx, _ = _moments(r, r, window)
+    return _shape(volatility_from_sums(n, sx, sxx, min_periods, periods_per_year), prices, window)
+
+
+def thinly_traded(volume: pd.DataFrame, prices: Optional[pd.DataFrame] = None, max_zero_ratio: float = thin_zero_ratio,
+                  min_median_volume: float = thin_min_volume) -> pd.DataFrame:
+    """
+    Trading activity per instrument, between its first and last observed day:
+    sessions in that span, days without trades (zero or no volume), their share,
+    and the median daily volume counting those days as zero. An instrument is
+    thin when its zero-trade share exceeds max_zero_ratio or its median volume is
+    below min_median_volume. Sessions are the panel's dates, so mixing exchanges
+    with different holidays counts the other exchange's sessions too.
+    """
+    v = volume.to_numpy(dtype=float)
+    observed = ~np.isnan(v)
+    if prices is not None:
+        observed |= ~np.isnan(prices.to_numpy(dtype=float))
+
+    rows = np.arange(len(v))[:, None]
+    if len(v):
+        first = observed.argmax(axis=0)
+        last = len(v) - 1 - observed[::-1].argmax(axis=0)
+    else:
+        first = last = np.zeros(v.shape[1], dtype=int)
+    in_span = (rows >= first) & (rows <= last) & observed.any(axis=0)
+
+    traded = np.nan_to_num(v) > 0
+    sessions = in_span.sum(axis=0)
+    zero_days = (in_span & ~traded).sum(axis=0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        zero_ratio = zero_days / sessions
+    with warnings.catch_warnings():
+        # Instruments never observed have an all-NaN column and a NaN median
+        warnings.simplefilter("ignore", RuntimeWarning)
+        median_volume = np.nanmedian(np.where(in_span, np.nan_to_num(v), np.nan), axis=0)
+
+    return pd.DataFrame({
+        "sessions": sessions,
+        "zero_trade_days": zero_days,
+        "zero_trade_ratio": zero_ratio,
+        "median_volume": median_volume,
+        "thin": (zero_ratio > max_zero_ratio) | (median_volume < min_median_volume),
+    }, index=volume.columns)
+
+
+def summarize(panel: pd.DataFrame, benchmark=None, window: int = beta_window,
+              min_periods: int = min_observations, state=None) -> dict:
+    """
+    Everything the app's modes show, from one panel: prices, volume, full-period
+    and rolling beta (when a benchmark is given), full-period and rolling
+    annualized volatility, and the thinly-traded table. With a RollingState for
+    this panel (see investoscrapo.utils.rolling_state.refresh_state), the
+    full-period beta and volatility come from its accumulators instead; the
+    rolling series are always computed from the panel's rows.
+    """
+    prices = panel_field(panel, PRICE_FIELDS)
+    volume = panel_field(panel, VOLUME_FIELDS)
+    result = {"rolling_vol": volatility(prices, window, min(min_periods, window))}
+    result["vol"] = state.volatility() if state is not None else volatility(prices, min_periods=min_periods)
+    if benchmark is not None:
+        result["rolling_beta"] = beta(prices, benchmark, window, min(min_periods, window))
+        result["beta"] = state.beta() if state is not None else beta(prices, benchmark, min_periods=min_periods)
+    result.update(price=prices, volume=volume, tt=thinly_traded(volume, prices))
+    return result
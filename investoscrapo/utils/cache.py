@@ -0,0 +1,386 @@
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from contextlib import closing
+from datetime import date, datetime, timedelta
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+from investoscrapo.configs.constants import cache_dir, cache_ttl, cache_max_age, cache_max_bytes, cache_write_batch
+from investoscrapo.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    source        TEXT NOT NULL,
+    instrument_id TEXT NOT NULL,
+    nbytes        INTEGER NOT NULL,
+    fetched_at    REAL NOT NULL,
+    accessed_at   REAL NOT NULL,
+    PRIMARY KEY (source, instrument_id)
+);
+CREATE TABLE IF NOT EXISTS pieces (
+    source        TEXT NOT NULL,
+    instrument_id TEXT NOT NULL,
+    period        INTEGER NOT NULL,
+    data          BLOB NOT NULL,
+    PRIMARY KEY (source, instrument_id, period)
+);
+CREATE TABLE IF NOT EXISTS coverage (
+    source        TEXT NOT NULL,
+    instrument_id TEXT NOT NULL,
+    start_date    TEXT NOT NULL,
+    end_date      TEXT NOT NULL,
+    fetched_at    REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS coverage_key ON coverage (source, instrument_id);
+CREATE TABLE IF NOT EXISTS states (
+    source        TEXT NOT NULL,
+    key           TEXT NOT NULL,
+    data          BLOB NOT NULL,
+    updated_at    REAL NOT NULL,
+    PRIMARY KEY (source, key)
+);
+"""
+
+# Period of the piece holding no rows, only an instrument's columns, so a covered range without rows reads as empty
+HEADER = 0
+
+
+def to_date(value) -> date:
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return datetime.strptime(str(value)[:10], "%Y-%m-%d").date()
+
+
+def unpickle(data):
+    """A stored object, or None when it cannot be read back (e.g. pickled by another pandas version)."""
+    try:
+        return pickle.loads(data)
+    except Exception as e:
+        logger.warning(f"Discarding an unreadable cache entry: {type(e).__name__}: {e}")
+        return None
+
+
+def merge_intervals(intervals):
+    """Union of inclusive (start, end) date intervals, sorted, with touching days joined."""
+    merged = []
+    for start, end in sorted(intervals):
+        if merged and start <= merged[-1][1] + timedelta(days=1):
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+class HistoricalCache():
+    """
+    On-disk store of normalized historical rows per (source, instrument_id),
+    kept as one pickled piece per calendar year so a write or read only touches
+    the years it spans.
+
+    Alongside the rows it records which date ranges were actually requested, so a
+    range with no rows (holidays, pre-listing) still counts as covered. Days that
+    had already closed when they were fetched never go stale; days on or after the
+    fetch day are trusted for `ttl` seconds. Entries not fetched for `max_age`
+    seconds are dropped, and the least recently read entries go first once the
+    store grows past `max_bytes`. Objects derived from the rows, such as rolling
+    statistics, can be kept next to them with put_state.
+    """
+
+    def __init__(self, path: Optional[str] = None, ttl: float = cache_ttl, max_age: float = cache_max_age,
+                 max_bytes: int = cache_max_bytes):
+        self.path = path or os.path.join(cache_dir, "history.sqlite")
+        self.ttl = ttl
+        self.max_age = max_age
+        self.max_bytes = max_bytes
+
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        with closing(self.connect()) as conn, conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            if conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'frames'").fetchone():
+                # Written before rows were split by year: start the stored rows over
+                logger.info(f"Dropping cached rows in the old single-frame layout from {self.path}")
+                conn.execute("DROP TABLE frames")
+                conn.execute("DROP TABLE IF EXISTS coverage")
+            conn.executescript(SCHEMA)
+
+    def connect(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def _covered(self, conn, source, instrument_id, now=None):
+        """Fresh coverage intervals for one instrument, merged."""
+        now = now or time.time()
+        intervals = []
+        rows = conn.execute(
+            "SELECT start_date, end_date, fetched_at FROM coverage WHERE source = ? AND instrument_id = ?",
+            (source, instrument_id),
+        )
+        for start, end, fetched_at in rows:
+            start, end = to_date(start), to_date(end)
+            if now - fetched_at >= self.ttl:
+                # Only the days that had closed by the time of the fetch are still trustworthy
+                end = min(end, date.fromtimestamp(fetched_at) - timedelta(days=1))
+            if start <= end:
+                intervals.append((start, end))
+        return merge_intervals(intervals)
+
+    def _load(self, conn, source, instrument_id, first_year: int, last_year: int):
+        """Stored rows of first_year..last_year (possibly none, with the columns), or None if nothing is stored."""
+        rows = conn.execute(
+            "SELECT data FROM pieces WHERE source = ? AND instrument_id = ? AND (period = ? OR period BETWEEN ? AND ?) "
+            "ORDER BY period",
+            (source, instrument_id, HEADER, first_year, last_year),
+        ).fetchall()
+        if not rows:
+            return None
+        pieces = [unpickle(data) for data, in rows]
+        if any(piece is None for piece in pieces):
+            # Treat the instrument as never cached, so its rows are downloaded again
+            self._drop(conn, [(source, instrument_id)])
+            return None
+        return pd.concat(pieces, ignore_index=True)
+
+    @staticmethod
+    def _drop(conn, keys):
+        """Forget the rows and coverage of (source, instrument_id) keys."""
+        for table in ("entries", "pieces", "coverage"):
+            conn.executemany(f"DELETE FROM {table} WHERE source = ? AND instrument_id = ?", keys)
+
+    def missing_ranges(self, source: str, instrument_id, start_date, end_date) -> list[tuple[str, str]]:
+        """The parts of start_date..end_date not covered by fresh cached data, as ISO date pairs."""
+        start, end = to_date(start_date), to_date(end_date)
+        with closing(self.connect()) as conn:
+            covered = self._covered(conn, source, str(instrument_id))
+
+        gaps = []
+        for lo, hi in covered:
+            if hi < start or lo > end:
+                continue
+            if lo > start:
+                gaps.append((start, lo - timedelta(days=1)))
+            start = hi + timedelta(days=1)
+            if start > end:
+                break
+        if start <= end:
+            gaps.append((start, end))
+        return [(lo.isoformat(), hi.isoformat()) for lo, hi in gaps]
+
+    def get(self, source: str, instrument_id, start_date, end_date, date_col: str) -> Optional[pd.DataFrame]:
+        """Rows for start_date..end_date if that whole range is cached and fresh, else None."""
+        return self.read(source, instrument_id, start_date, end_date, date_col, require_coverage=True)
+
+    def read(self, source: str, instrument_id, start_date, end_date, date_col: str,
+             require_coverage: bool = False) -> Optional[pd.DataFrame]:
+        """Stored rows for start_date..end_date; None if nothing is stored (or the range isn't fully covered when required)."""
+        instrument_id = str(instrument_id)
+        start, end = to_date(start_date), to_date(end_date)
+
+        with closing(self.connect()) as conn, conn:
+            if require_coverage:
+                covered = self._covered(conn, source, instrument_id)
+                if not any(lo <= start and end <= hi for lo, hi in covered):
+                    return None
+
+            df = self._load(conn, source, instrument_id, start.year, end.year)
+            if df is None:
+                return None
+            conn.execute(
+                "UPDATE entries SET accessed_at = ? WHERE source = ? AND instrument_id = ?",
+                (time.time(), source, instrument_id),
+            )
+
+        logger.info(f"Cache read for {source}:{instrument_id} ({start} to {end})")
+        mask = (df[date_col] >= pd.Timestamp(start)) & (df[date_col] <= pd.Timestamp(end))
+        return df.loc[mask].reset_index(drop=True)
+
+    def put(self, source: str, instrument_id, start_date, end_date, df: pd.DataFrame, date_col: str):
+        """Merge df into the stored rows and mark start_date..end_date as covered."""
+        self.put_many(source, {instrument_id: df}, [(start_date, end_date)], date_col)
+
+    def put_many(self, source: str, frames: dict, ranges, date_col: str, batch_size: int = cache_write_batch):
+        """
+        put() for many instruments: merge each frame of {instrument_id: df} into
+        its stored rows and mark every (start_date, end_date) in ranges as covered
+        for all of them. A frame of None only adds the coverage. Used by bulk
+        loaders that get the whole market's rows for a day in one file.
+
+        Only the yearly pieces the new rows fall in are read and rewritten, and
+        instruments are written batch_size per transaction. The merged pieces
+        are built before the write lock is taken, so the lock is only held for
+        the writes and other writers are never locked out for a bulk load.
+        """
+        now = time.time()
+        ranges = [(to_date(start).isoformat(), to_date(end).isoformat()) for start, end in ranges]
+        items = [(str(instrument_id), df) for instrument_id, df in frames.items()]
+
+        for first in range(0, len(items), batch_size):
+            batch = items[first:first + batch_size]
+            with closing(self.connect()) as conn:
+                merged = {instrument_id: self._merge(conn, source, instrument_id, df, date_col)
+                          for instrument_id, df in batch if df is not None}
+                with conn:
+                    conn.execute("BEGIN IMMEDIATE")
+                    for instrument_id, df in batch:
+                        if df is not None:
+                            read, pieces = merged[instrument_id]
+                            if self._pieces(conn, source, instrument_id, read) != read:
+                                # Another writer got to this instrument in between: merge again under the lock
+                                read, pieces = self._merge(conn, source, instrument_id, df, date_col)
+                            if pieces is None:
+                                # A stored piece could not be read: start the instrument over with these rows
+                                self._drop(conn, [(source, instrument_id)])
+                                read, pieces = self._merge(conn, source, instrument_id, df, date_col)
+                            self._write(conn, source, instrument_id, pieces, now)
+                        if ranges:
+                            conn.executemany(
+                                "INSERT INTO coverage VALUES (?, ?, ?, ?, ?)",
+                                [(source, instrument_id, start, end, now) for start, end in ranges],
+                            )
+                            self._compact(conn, source, instrument_id, now)
+
+        with closing(self.connect()) as conn, conn:
+            self._evict(conn, now)
+
+    @staticmethod
+    def _pieces(conn, source, instrument_id, periods) -> dict:
+        """{period: stored pickle, or None} for the given periods."""
+        stored = dict.fromkeys(periods)
+        if stored:
+            stored.update(conn.execute(
+                f"SELECT period, data FROM pieces WHERE source = ? AND instrument_id = ? "
+                f"AND period IN ({', '.join('?' * len(stored))})",
+                (source, instrument_id, *stored),
+            ).fetchall())
+        return stored
+
+    def _merge(self, conn, source, instrument_id, df, date_col):
+        """
+        (stored pieces read, {period: new pickle}) that merge df's rows into
+        the yearly pieces they fall in, plus the header piece if there is none.
+        The new pieces are None when a stored one cannot be read.
+        """
+        years = pd.DatetimeIndex(df[date_col]).year.to_numpy()
+        periods = [int(year) for year in np.unique(years[years > 0])] if len(years) else []
+        read = self._pieces(conn, source, instrument_id, [HEADER, *periods])
+
+        pieces = {}
+        if read[HEADER] is None:
+            pieces[HEADER] = df.iloc[:0]
+        for year in periods:
+            rows = df if len(periods) == 1 and (years == year).all() else df[years == year]
+            if read[year] is not None:
+                stored = unpickle(read[year])
+                if stored is None:
+                    return read, None
+                rows = pd.concat([stored, rows], ignore_index=True)
+            dates = rows[date_col]
+            if dates.is_monotonic_increasing and dates.is_unique:
+                # Rows appended after the stored ones need no de-duplication or sorting
+                rows = rows.reset_index(drop=True)
+            else:
+                rows = rows.drop_duplicates(subset=date_col, keep="last").sort_values(date_col).reset_index(drop=True)
+            pieces[year] = rows
+        return read, {period: pickle.dumps(rows, protocol=pickle.HIGHEST_PROTOCOL) for period, rows in pieces.items()}
+
+    @staticmethod
+    def _write(conn, source, instrument_id, pieces: dict, now):
+        conn.executemany("INSERT OR REPLACE INTO pieces VALUES (?, ?, ?, ?)",
+                         [(source, instrument_id, period, sqlite3.Binary(data)) for period, data in pieces.items()])
+        nbytes = conn.execute("SELECT SUM(LENGTH(data)) FROM pieces WHERE source = ? AND instrument_id = ?",
+                              (source, instrument_id)).fetchone()[0]
+        conn.execute("INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?)", (source, instrument_id, nbytes, now, now))
+
+    def get_state(self, source: str, key: str):
+        """A derived object stored with put_state (e.g. a RollingState), or None."""
+        with closing(self.connect()) as conn:
+            row = conn.execute("SELECT data FROM states WHERE source = ? AND key = ?", (source, key)).fetchone()
+        return unpickle(row[0]) if row else None
+
+    def put_state(self, source: str, key: str, state):
+        """Store an object derived from the cached rows, replacing the previous one under key."""
+        data = pickle.dumps(state, protocol=pickle.HIGHEST_PROTOCOL)
+        with closing(self.connect()) as conn, conn:
+            conn.execute("INSERT OR REPLACE INTO states VALUES (?, ?, ?, ?)", (source, key, sqlite3.Binary(data), time.time()))
+
+    def _compact(self, conn, source, instrument_id, now=None):
+        """
+        Fold coverage rows that only span closed days into one row per
+        contiguous range. A row reaching its fetch day or later is first cut
+        back to the day before the fetch once it is older than the TTL, since
+        only those days still count (see _covered).
+        """
+        now = now or time.time()
+        rows = conn.execute(
+            "SELECT rowid, start_date, end_date, fetched_at FROM coverage WHERE source = ? AND instrument_id = ?",
+            (source, instrument_id),
+        ).fetchall()
+        closed, clipped = [], 0
+        for rowid, start, end, fetched_at in rows:
+            start, end, fetch_day = to_date(start), to_date(end), date.fromtimestamp(fetched_at)
+            if end >= fetch_day and now - fetched_at >= self.ttl:
+                end = fetch_day - timedelta(days=1)
+                clipped += 1
+            if end < fetch_day:
+                closed.append((rowid, start, end, fetched_at))
+        if len(closed) < 2 and not clipped:
+            return
+
+        merged = merge_intervals((start, end) for _, start, end, _ in closed if start <= end)
+        fetched_at = max(row[3] for row in closed)
+        conn.executemany("DELETE FROM coverage WHERE rowid = ?", [(row[0],) for row in closed])
+        conn.executemany(
+            "INSERT INTO coverage VALUES (?, ?, ?, ?, ?)",
+            [(source, instrument_id, start.isoformat(), end.isoformat(), fetched_at) for start, end in merged],
+        )
+
+    def _evict(self, conn, now):
+        expired = conn.execute(
+            "SELECT source, instrument_id FROM entries WHERE fetched_at < ?", (now - self.max_age,)
+        ).fetchall()
+
+        total = conn.execute("SELECT COALESCE(SUM(nbytes), 0) FROM entries").fetchone()[0]
+        if total > self.max_bytes:
+            for source, instrument_id, nbytes in conn.execute(
+                "SELECT source, instrument_id, nbytes FROM entries ORDER BY accessed_at"
+            ).fetchall():
+                if total <= self.max_bytes:
+                    break
+                expired.append((source, instrument_id))
+                total -= nbytes
+
+        conn.execute("DELETE FROM states WHERE updated_at < ?", (now - self.max_age,))
+
+        if expired:
+            logger.info(f"Evicting {len(expired)} cached instruments")
+            self._drop(conn, expired)
+
+    def clear(self, source: Optional[str] = None):
+        with closing(self.connect()) as conn, conn:
+            for table in ("entries", "pieces", "coverage", "states"):
+                if source is None:
+                    conn.execute(f"DELETE FROM {table}")
+                else:
+                    conn.execute(f"DELETE FROM {table} WHERE source = ?", (source,))
+
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def get_cache(path: Optional[str] = None) -> HistoricalCache:
+    """Shared HistoricalCache per path, so every scraper in the process uses the same store."""
+    key = path or os.path.join(cache_dir, "history.sqlite")
+    with _caches_lock:
+        if key not in _caches:
+            _caches[key] = HistoricalCache(key)
+        return _caches[key]
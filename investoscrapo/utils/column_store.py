@@ -0,0 +1,203 @@
+"""
+Append-only columnar store: one directory per key (an NSE symbol, say) holding
+one raw little-endian array file per column, plus a manifest.
+
+It is built for turning date-major files (one file per day, every symbol in
+it) into symbol-major storage in one pass. append() takes a batch of rows for
+many keys and appends each key's slice of every column to its files, so
+nothing already stored is read or rewritten and memory is bounded by the batch. read() maps a key's columns back
+into a DataFrame.
+
+The manifest (manifest.json, replaced atomically) holds the schema, the rows
+stored per key and the batch labels (dates, for bhavcopies) already appended,
+which is what lets a load resume where it stopped. A run that died during an
+append leaves column files longer than the manifest says; they are cut back to
+the recorded length when the store is next opened, so the interrupted batch
+can simply be appended again. Appends hold a lock file, so several processes
+can load into the same store.
+"""
+import json
+import os
+import threading
+from contextlib import contextmanager
+from typing import Iterable, Optional
+from urllib.parse import quote, unquote
+
+import numpy as np
+import pandas as pd
+
+from investoscrapo.utils.logger import get_logger
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+logger = get_logger(__name__)
+
+MANIFEST = "manifest.json"
+LOCK = "store.lock"
+
+
+@contextmanager
+def lock_file(path: str):
+    """Hold an exclusive lock on path (created if missing) against other processes."""
+    with open(path, "a+b") as f:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        else:
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+class ColumnStore():
+    """Per-key column files under root, with schema {column: numpy dtype string} (e.g. "<f8", "<M8[D]")."""
+
+    def __init__(self, root: str, schema: dict):
+        self.root = root
+        self._lock = threading.Lock()
+        self.schema = schema
+        self.dtypes = {column: np.dtype(dtype) for column, dtype in schema.items()}
+        os.makedirs(root, exist_ok=True)
+
+        with self._locked():
+            self._load()
+
+    @contextmanager
+    def _locked(self):
+        with self._lock, lock_file(os.path.join(self.root, LOCK)):
+            yield
+
+    def _load(self):
+        """Read the manifest (another process may have appended since), repairing an interrupted append. Hold _locked."""
+        path = os.path.join(self.root, MANIFEST)
+        if os.path.exists(path):
+            with open(path) as f:
+                self.manifest = json.load(f)
+            if self.manifest["schema"] != self.schema:
+                raise ValueError(f"{self.root} holds columns {self.manifest['schema']}, not {self.schema}")
+        else:
+            self.manifest = {"schema": self.schema, "rows": {}, "meta": {}, "batches": [], "pending": []}
+            self._save()
+
+        self._batches = set(self.manifest["batches"])
+        if self.manifest["pending"]:
+            self._repair()
+
+    def _save(self):
+        path = os.path.join(self.root, MANIFEST)
+        with open(f"{path}.tmp", "w") as f:
+            json.dump(self.manifest, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(f"{path}.tmp", path)
+
+    def _dir(self, key: str) -> str:
+        return os.path.join(self.root, quote(str(key), safe=""))
+
+    def _repair(self):
+        """Cut every column file back to the row count in the manifest, undoing a half-finished append."""
+        logger.warning(f"Rolling back an interrupted append of {self.manifest['pending']} in {self.root}")
+        for name in os.listdir(self.root):
+            directory = os.path.join(self.root, name)
+            if not os.path.isdir(directory):
+                continue
+            rows = self.manifest["rows"].get(unquote(name), 0)
+            for column, dtype in self.dtypes.items():
+                path = os.path.join(directory, column)
+                if os.path.exists(path) and os.path.getsize(path) > rows * dtype.itemsize:
+                    os.truncate(path, rows * dtype.itemsize)
+        self.manifest["pending"] = []
+        self._save()
+
+    def done(self, batch: str) -> bool:
+        """True when batch was appended completely."""
+        return batch in self._batches
+
+    @property
+    def batches(self) -> list:
+        return sorted(self._batches)
+
+    def keys(self) -> list:
+        return sorted(key for key, rows in self.manifest["rows"].items() if rows)
+
+    def meta(self, key: str) -> dict:
+        return self.manifest["meta"].get(key, {})
+
+    def append(self, df: pd.DataFrame, by: str, batches: Iterable[str], meta: Optional[dict] = None):
+        """
+        Append df's rows (every schema column, plus the key column by) to their
+        keys' column files and record batches as done, all or nothing: until the
+        manifest is saved the batches count as not appended. meta {key: dict} is
+        merged into the keys' metadata. Nothing is written when every batch was
+        already appended (by another process, say).
+
+        Rows are sorted by key once (keeping their order within a key) and each
+        column converted to an array once; every key then gets a slice of it.
+        """
+        batches = list(batches)
+        df = df.sort_values(by, kind="stable")
+        keys = df[by].astype(str).to_numpy()
+        starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]]) if len(keys) else np.empty(0, dtype=int)
+        ends = np.r_[starts[1:], len(keys)].astype(int)
+        arrays = {column: np.ascontiguousarray(df[column].to_numpy(dtype=dtype))
+                  for column, dtype in self.dtypes.items()}
+
+        with self._locked():
+            self._load()
+            if batches and self._batches.issuperset(batches):
+                logger.info(f"Skipping {batches} in {self.root}: already appended")
+                return
+
+            self.manifest["pending"] = batches
+            self._save()
+
+            # The manifest's row counts stay those of the files before this append until every write is done
+            rows = dict(self.manifest["rows"])
+            try:
+                for start, end in zip(starts, ends):
+                    key = keys[start]
+                    directory = self._dir(key)
+                    os.makedirs(directory, exist_ok=True)
+                    for column, values in arrays.items():
+                        with open(os.path.join(directory, column), "ab") as f:
+                            f.write(values[start:end].tobytes())
+                    rows[key] = rows.get(key, 0) + int(end - start)
+            except BaseException:
+                self._repair()
+                raise
+
+            self.manifest["rows"] = rows
+            for key, values in (meta or {}).items():
+                self.manifest["meta"].setdefault(str(key), {}).update(values)
+            self._batches.update(batches)
+            self.manifest["batches"] = sorted(self._batches)
+            self.manifest["pending"] = []
+            self._save()
+
+    def read(self, key: str, columns=None, order_by: Optional[str] = None) -> pd.DataFrame:
+        """A key's stored rows (all columns, or only columns), in append order or sorted by order_by."""
+        columns = list(columns or self.dtypes)
+        rows = self.manifest["rows"].get(str(key), 0)
+        directory = self._dir(key)
+        data = {
+            column: np.fromfile(os.path.join(directory, column), dtype=self.dtypes[column], count=rows)
+            if rows else np.empty(0, dtype=self.dtypes[column])
+            for column in columns
+        }
+        df = pd.DataFrame(data)
+        if order_by is not None and not df[order_by].is_monotonic_increasing:
+            df = df.sort_values(order_by, kind="stable").reset_index(drop=True)
+        return df
+
+    def __len__(self):
+        return len(self.keys())
@@ -0,0 +1,116 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import defaultdict
+from contextlib import closing
+from typing import Callable, Optional
+
+from investoscrapo.configs.constants import cache_dir, cookie_ttl
+from investoscrapo.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS cookies (
+    source      TEXT PRIMARY KEY,
+    cookies     TEXT NOT NULL,
+    obtained_at REAL NOT NULL,
+    expires_at  REAL NOT NULL
+);
+"""
+
+
+def cookie_expiry(jar, default_ttl: float = cookie_ttl) -> float:
+    """Earliest expiry among the cookies in a curl_cffi cookie jar, capped at now + default_ttl."""
+    expiries = [cookie.expires for cookie in getattr(jar, "jar", []) if cookie.expires]
+    return min([time.time() + default_ttl, *expiries])
+
+
+class CookieStore():
+    """
+    Anti-bot cookies per source, shared by every scraper in every process.
+
+    A refresh takes an exclusive SQLite write lock (and a per-source thread
+    lock), re-reads the row and only calls the fetcher if the stored cookies
+    are still the ones the caller found stale. Everybody else who hit the same
+    403 picks up the fresh cookies instead of fetching their own.
+    """
+
+    def __init__(self, path: Optional[str] = None, lock_timeout: float = 180):
+        self.path = path or os.path.join(cache_dir, "cookies.sqlite")
+        self.lock_timeout = lock_timeout
+        self._locks = defaultdict(threading.Lock)
+
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        with closing(self.connect()) as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+
+    def connect(self):
+        # Long timeout: a refresh holds the write lock for the whole cookie fetch
+        return sqlite3.connect(self.path, timeout=self.lock_timeout)
+
+    @staticmethod
+    def _valid(row, now):
+        if row is None or row[2] <= now:
+            return None
+        return json.loads(row[0])
+
+    def get(self, source: str) -> Optional[dict]:
+        """Stored cookies for source, or None if there are none or they have expired."""
+        with closing(self.connect()) as conn:
+            row = conn.execute(
+                "SELECT cookies, obtained_at, expires_at FROM cookies WHERE source = ?", (source,)
+            ).fetchone()
+        return self._valid(row, time.time())
+
+    def obtain(self, source: str, fetch: Callable[[], tuple[dict, float]], stale: Optional[dict] = None) -> dict:
+        """
+        Valid cookies for source, fetching new ones only when none are stored,
+        they have expired, or they equal `stale` (the cookies that just got a 403).
+        `fetch` returns (cookies, expires_at).
+        """
+        cookies = self.get(source)
+        if cookies is not None and cookies != stale:
+            return cookies
+
+        with self._locks[source], closing(self.connect()) as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = conn.execute(
+                    "SELECT cookies, obtained_at, expires_at FROM cookies WHERE source = ?", (source,)
+                ).fetchone()
+                cookies = self._valid(row, time.time())
+                if cookies is not None and cookies != stale:
+                    logger.info(f"Reusing {source} cookies refreshed elsewhere")
+                    conn.rollback()
+                    return cookies
+
+                cookies, expires_at = fetch()
+                conn.execute(
+                    "INSERT OR REPLACE INTO cookies VALUES (?, ?, ?, ?)",
+                    (source, json.dumps(cookies), time.time(), expires_at),
+                )
+                conn.commit()
+                return cookies
+            except BaseException:
+                conn.rollback()
+                raise
+
+    def invalidate(self, source: str):
+        with closing(self.connect()) as conn, conn:
+            conn.execute("DELETE FROM cookies WHERE source = ?", (source,))
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_cookie_store() -> CookieStore:
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = CookieStore()
+        return _store
@@ -0,0 +1,65 @@
+"""
+Which of several interchangeable endpoints is answering right now.
+
+Investing.com serves search from more than one URL. Each request's outcome is
+recorded here, and order() puts the endpoint that answered most recently
+(fastest first) ahead of untried ones, with failing endpoints last, so the
+next search starts where the last one succeeded.
+"""
+import threading
+import time
+from typing import Optional
+
+
+class EndpointHealth():
+    """Thread-safe last outcome, failure streak and latency average per endpoint URL."""
+
+    def __init__(self, smoothing: float = 0.3):
+        self.smoothing = smoothing
+        self._lock = threading.Lock()
+        self._state = {}
+
+    def record(self, url: str, ok: bool, latency: Optional[float] = None):
+        with self._lock:
+            state = self._state.setdefault(url, {"ok": ok, "streak": 0, "latency": None, "at": 0.0})
+            state["ok"] = ok
+            state["at"] = time.monotonic()
+            state["streak"] = 0 if ok else state["streak"] + 1
+            if ok and latency is not None:
+                previous = state["latency"]
+                state["latency"] = latency if previous is None else previous + self.smoothing * (latency - previous)
+
+    def healthy(self, url: str) -> bool:
+        """True when url's last request got a usable answer."""
+        with self._lock:
+            state = self._state.get(url)
+            return bool(state and state["ok"])
+
+    def order(self, urls) -> list:
+        """urls, healthiest first: working (by latency), then untried (in the given order), then failing."""
+        with self._lock:
+            def rank(item):
+                position, url = item
+                state = self._state.get(url)
+                if state is None:
+                    return (1, 0, 0.0, position)
+                if state["ok"]:
+                    return (0, 0, state["latency"] or 0.0, position)
+                return (2, state["streak"], state["at"], position)
+            return [url for _, url in sorted(enumerate(urls), key=rank)]
+
+    def __repr__(self):
+        with self._lock:
+            return f"EndpointHealth({self._state})"
+
+
+_health = {}
+_health_lock = threading.Lock()
+
+
+def get_endpoint_health(name: str) -> EndpointHealth:
+    """Process-wide EndpointHealth per endpoint group, created on first use."""
+    with _health_lock:
+        if name not in _health:
+            _health[name] = EndpointHealth()
+        return _health[name]
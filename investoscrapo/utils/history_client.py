@@ -0,0 +1,134 @@
+"""
+Cached historical downloads shared by the exchange clients (NSE, BSE).
+
+HistoryClient is a mixin: a client provides source, fetch_cookies and
+download_data (one instrument's rows for a date range, None when the download
+failed), plus the panel settings below, and gets cookie reuse, the on-disk
+cache and concurrent batch downloads on top. download_data should answer a
+range without trading days with an empty frame in its usual columns: that is
+cached as covered and counts as a success, while None is retried.
+"""
+import pandas as pd
+
+from investoscrapo.utils.cookie_store import get_cookie_store
+from investoscrapo.utils.logger import get_logger
+from investoscrapo.utils.streaming import stream_map
+from investoscrapo.utils.transformer import build_panel
+
+logger = get_logger(__name__)
+
+
+class HistoryClient():
+
+    # Column the rows are dated by, and the build_panel settings of download_many
+    date_col = "Date"
+    panel_fields = ["Close", "Volume"]
+    panel_id_cols = ["Symbol"]
+    panel_date_format = None
+
+    def get_cookies(self, stale=None):
+        """
+        Cookies from the cross-process cookie store. fetch_cookies only runs when the
+        store has none, they expired, or they equal `stale` (cookies that just got a 403).
+        """
+        self.cookies = get_cookie_store().obtain(
+            self.source, lambda: (self.fetch_cookies(), self.cookie_expires_at), stale
+        )
+        return self.cookies
+
+    @staticmethod
+    def tag(df, scrip_dict):
+        """Label rows read back from the cache with the instrument asked for (unchanged by default)."""
+        return df
+
+    @staticmethod
+    def describe(scrip_dict) -> str:
+        """How an instrument is named in log messages."""
+        return str(scrip_dict.get("symbol", scrip_dict["id"]))
+
+    def request_data(self, scrip_dict, start_date, end_date, incremental: bool = False):
+        """
+        Historical rows for one instrument, served from the on-disk cache when the
+        whole range is already stored and downloaded otherwise.
+
+        Args:
+            scrip_dict: Dictionary from fetch_search_results, with at least the key 'id'
+            start_date: Start date in format 'YYYY-MM-DD'
+            end_date: End date in format 'YYYY-MM-DD'
+            incremental: Only download the sub-ranges missing from the cache and
+                merge them with the stored rows
+
+        Returns:
+            pandas.DataFrame: Historical price data, or None if the download failed
+        """
+        if self.cache is None:
+            return self.download_data(scrip_dict, start_date, end_date)
+
+        cached = self.cache.get(self.source, scrip_dict["id"], start_date, end_date, date_col=self.date_col)
+        if cached is not None:
+            return self.tag(cached, scrip_dict)
+
+        if incremental:
+            for gap_start, gap_end in self.cache.missing_ranges(self.source, scrip_dict["id"], start_date, end_date):
+                df = self.download_data(scrip_dict, gap_start, gap_end)
+                if df is not None:
+                    self.cache.put(self.source, scrip_dict["id"], gap_start, gap_end, df, date_col=self.date_col)
+            stored = self.cache.read(self.source, scrip_dict["id"], start_date, end_date, date_col=self.date_col)
+            return self.tag(stored, scrip_dict)
+
+        df = self.download_data(scrip_dict, start_date, end_date)
+        if df is not None:
+            self.cache.put(self.source, scrip_dict["id"], start_date, end_date, df, date_col=self.date_col)
+        return df
+
+    def stream_historical(self, list_dict, start_date, end_date, incremental: bool = False, max_workers: int = 5,
+                          max_in_flight: int = 10):
+        """
+        Yield (scrip_dict, DataFrame) for each instrument as soon as its download finishes.
+        At most max_in_flight downloads are running or waiting to be consumed at once.
+        """
+        download = lambda scrip_dict: self.request_data(scrip_dict, start_date, end_date, incremental)
+        yield from stream_map(download, list_dict, max_workers, max_in_flight)
+
+    def download_many(self, list_dict, start_date, end_date, incremental: bool = False, max_workers: int = 5,
+                      retries: int = 1, fields=None) -> pd.DataFrame:
+        """
+        Download every instrument concurrently and return one panel aligned on date_col.
+
+        At most max_workers downloads run at once, all sharing the client's session
+        pool, cookies and rate limiter. An instrument whose download raises or fails
+        does not stop the batch; failed ones are tried again in up to `retries` later
+        rounds, once the rest of the batch is done, and left out of the panel if they
+        still fail.
+
+        Returns:
+            pandas.DataFrame: date index, columns (field, *panel_id_cols) for each
+            field (panel_fields unless fields is given)
+        """
+        def download(scrip_dict):
+            try:
+                return self.request_data(scrip_dict, start_date, end_date, incremental)
+            except Exception as e:
+                logger.error(f"{self.source} download failed for {self.describe(scrip_dict)}: {e}")
+                return None
+
+        frames = []
+        pending = list(list_dict)
+        for round_ in range(retries + 1):
+            if round_:
+                logger.info(f"Retrying {len(pending)} failed {self.source} downloads (round {round_} of {retries})")
+            failed = []
+            for scrip_dict, df in stream_map(download, pending, max_workers):
+                if df is None:
+                    failed.append(scrip_dict)
+                elif not df.empty:
+                    frames.append(df)
+            pending = failed
+            if not pending:
+                break
+
+        if pending:
+            logger.warning(f"Giving up on {len(pending)} {self.source} downloads: {[scrip_dict['id'] for scrip_dict in pending]}")
+
+        return build_panel(frames, date_col=self.date_col, fields=fields or self.panel_fields,
+                           id_cols=self.panel_id_cols, date_format=self.panel_date_format)
@@ -0,0 +1,106 @@
+"""
+Cross-source identity map: which BSE scrip code, NSE symbol, Investing.com id
+and Yahoo ticker belong to the same instrument.
+
+Every search result and download the scrapers see is recorded as a listing
+(source, id) in the symbol master, which links listings through their ISIN and
+lets sources that do not report one inherit it (see
+investoscrapo.utils.symbol_master). Once linked, a download can go straight to
+another source's id, or to a source that already has the range cached,
+without searching again.
+"""
+import threading
+from contextlib import closing
+from typing import Iterable, Optional
+
+from investoscrapo.configs.constants import route_preference
+from investoscrapo.utils.logger import get_logger
+from investoscrapo.utils.symbol_master import FIELDS, SymbolMaster, get_symbol_master
+
+logger = get_logger(__name__)
+
+
+class IdentityMap():
+    """Listings per (source, id) in a SymbolMaster, linked by ISIN."""
+
+    def __init__(self, master: Optional[SymbolMaster] = None):
+        self.master = master if master is not None else get_symbol_master()
+
+    def record(self, results: Iterable[dict], source: str) -> int:
+        """Record search results or scrip dicts (id, symbol, description, exchange, type, optional isin) of source."""
+        return self.master.add(results, source)
+
+    def set_isin(self, source: str, listing_id, isin: str):
+        """Attach an ISIN learnt from a download to an existing listing."""
+        self.master.set_isin(source, listing_id, isin)
+
+    def listing(self, source: str, listing_id) -> Optional[dict]:
+        with closing(self.master.connect()) as conn:
+            row = conn.execute(f"SELECT {', '.join(FIELDS)} FROM symbols WHERE source = ? AND id = ?",
+                               (source, str(listing_id))).fetchone()
+        return dict(zip(FIELDS, row)) if row else None
+
+    def identity(self, isin: Optional[str] = None, source: Optional[str] = None, listing_id=None) -> Optional[dict]:
+        """
+        Everything known about one instrument, given its ISIN or one of its
+        listings: {"isin": ..., "listings": {source: listing}}, with the most
+        recently seen listing per source. None when nothing links to it.
+        """
+        if isin is None:
+            listing = self.listing(source, listing_id)
+            if listing is None:
+                return None
+            if not listing["isin"]:
+                return {"isin": None, "listings": {source: listing}}
+            isin = listing["isin"]
+
+        with closing(self.master.connect()) as conn:
+            rows = conn.execute(
+                f"SELECT {', '.join(FIELDS)} FROM symbols WHERE isin = ? ORDER BY updated_at", (isin.upper(),)
+            ).fetchall()
+        if not rows:
+            return None
+        return {"isin": isin.upper(), "listings": {row[0]: dict(zip(FIELDS, row)) for row in rows}}
+
+    def resolve(self, source: str, listing_id, target: str) -> Optional[dict]:
+        """The target source's listing of the same instrument, usable as its scrip dict, or None."""
+        identity = self.identity(source=source, listing_id=listing_id)
+        return identity["listings"].get(target) if identity else None
+
+    def route(self, identity: dict, start_date, end_date, cache=None, preference=route_preference):
+        """
+        (source, listing) to download start_date..end_date from: a source whose
+        cache already covers the whole range if there is one, else the first
+        source in preference the instrument is listed on.
+        """
+        listings = identity["listings"]
+        candidates = [source for source in preference if source in listings]
+        if cache is not None:
+            for source in candidates:
+                if not cache.missing_ranges(source, listings[source]["id"], start_date, end_date):
+                    return source, listings[source]
+        if candidates:
+            return candidates[0], listings[candidates[0]]
+        return None
+
+
+_maps = {}
+_maps_lock = threading.Lock()
+
+
+def get_identity_map(path: Optional[str] = None) -> IdentityMap:
+    """Shared IdentityMap over the shared SymbolMaster at path."""
+    master = get_symbol_master(path)
+    with _maps_lock:
+        if master.path not in _maps:
+            _maps[master.path] = IdentityMap(master)
+        return _maps[master.path]
+
+
+def remember(results, source: str):
+    """Record results in the shared map; a failure here never breaks the search or download that found them."""
+    try:
+        if results:
+            get_identity_map().record(results, source)
+    except Exception as e:
+        logger.warning(f"Could not record {source} listings in the identity map: {e}")
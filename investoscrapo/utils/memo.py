@@ -0,0 +1,86 @@
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Callable, Hashable, Optional
+
+_MISSING = object()
+
+
+class TTLCache():
+    """Thread-safe LRU cache whose entries also expire ttl seconds after they were stored."""
+
+    def __init__(self, maxsize: int, ttl: float, clock=time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        # Monotonic seconds; injectable so expiry can be tested without real sleeps
+        self.clock = clock
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, default=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return default
+            value, stored_at = entry
+            if self.clock() - stored_at > self.ttl:
+                del self._entries[key]
+                return default
+            self._entries.move_to_end(key)
+            return value
+
+    def put(self, key: Hashable, value):
+        with self._lock:
+            self._entries[key] = (value, self.clock())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class Memo():
+    """
+    TTLCache in front of a slow call, with identical calls deduplicated: while
+    a key is being computed, other threads asking for it wait for that result
+    instead of starting their own call. Exceptions reach every waiter and are
+    not cached; neither is a None result, so a failed lookup is retried next time.
+    """
+
+    def __init__(self, maxsize: int, ttl: float, clock=time.monotonic):
+        self.cache = TTLCache(maxsize, ttl, clock)
+        self._in_flight = {}
+        self._lock = threading.Lock()
+
+    def get_or_call(self, key: Hashable, fn: Callable, timeout: Optional[float] = None):
+        value = self.cache.get(key, _MISSING)
+        if value is not _MISSING:
+            return value
+
+        with self._lock:
+            future = self._in_flight.get(key)
+            owner = future is None
+            if owner:
+                future = self._in_flight[key] = Future()
+        if not owner:
+            return future.result(timeout)
+
+        try:
+            value = fn()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            if value is not None:
+                self.cache.put(key, value)
+            future.set_result(value)
+            return value
+        finally:
+            with self._lock:
+                del self._in_flight[key]
@@ -0,0 +1,131 @@
+import asyncio
+import threading
+import time
+from typing import Optional
+from urllib.parse import urlsplit
+
+THROTTLE_STATUSES = (403, 429)
+
+# (rate per second, burst, max rate per second) used for hosts nobody configured
+default_rate_limit = (1.0, 5, 4.0)
+
+
+class TokenBucket():
+    """
+    Thread-safe token bucket shared by every request to one host.
+
+    Callers take a token when one is there and otherwise sleep until the next
+    one is due at the current rate, then look again, so a rate change made by
+    feedback() applies to every waiter at its next check. The refill rate
+    adapts AIMD style: every successful response nudges it up towards
+    max_rate, every 403/429 halves it (never below min_rate) and drops the
+    bucket to at most burst tokens in debt.
+    """
+
+    # Longest single sleep before a waiter re-checks the bucket
+    max_wait = 1.0
+
+    def __init__(self, rate: float, burst: int, max_rate: Optional[float] = None, min_rate: Optional[float] = None,
+                 increase: float = 0.1, backoff: float = 0.5, clock=time.monotonic):
+        self.rate = rate
+        self.burst = burst
+        self.max_rate = max_rate or rate
+        self.min_rate = min_rate or rate / 16
+        self.increase = increase
+        self.backoff = backoff
+        # Monotonic seconds; injectable so the bucket can be driven without real sleeps
+        self.clock = clock
+
+        self.tokens = float(burst)
+        self.updated = clock()
+        self.paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = self.clock()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def try_acquire(self) -> float:
+        """Take a token and return 0, or take none and return the seconds until one is due at the current rate."""
+        with self._lock:
+            self._refill()
+            if self.updated < self.paused_until:
+                return self.paused_until - self.updated
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return 0.0
+            return (1 - self.tokens) / self.rate
+
+    def acquire(self):
+        """Block the calling thread until a request may be sent."""
+        while True:
+            wait = self.try_acquire()
+            if not wait:
+                return
+            time.sleep(min(wait, self.max_wait))
+
+    async def acquire_async(self):
+        """Suspend the calling task until a request may be sent."""
+        while True:
+            wait = self.try_acquire()
+            if not wait:
+                return
+            await asyncio.sleep(min(wait, self.max_wait))
+
+    def feedback(self, status_code: int, retry_after: Optional[float] = None):
+        """Adapt the refill rate to the status code the host answered with."""
+        with self._lock:
+            self._refill()
+            if status_code in THROTTLE_STATUSES:
+                self.rate = max(self.min_rate, self.rate * self.backoff)
+                # Drop the saved-up burst; honour Retry-After when the host sends one
+                self.tokens = max(-self.burst, min(self.tokens, 0.0))
+                if retry_after:
+                    self.paused_until = max(self.paused_until, self.updated + retry_after)
+            elif 200 <= status_code < 400:
+                self.rate = min(self.max_rate, self.rate + self.increase)
+
+    def __repr__(self):
+        return f"TokenBucket(rate={self.rate:.2f}/s, burst={self.burst}, max_rate={self.max_rate:.2f}/s)"
+
+
+_rate_limits = {}
+_limiters = {}
+_registry_lock = threading.Lock()
+
+
+def host_of(url_or_host: str) -> str:
+    if "://" in url_or_host:
+        return urlsplit(url_or_host).hostname or url_or_host
+    return url_or_host
+
+
+def configure_limits(rate_limits: dict):
+    """
+    Register (rate, burst, max_rate) per host. Each scraper calls this at import
+    with its own constants; buckets that already exist keep their adapted state.
+    """
+    with _registry_lock:
+        for host, limits in rate_limits.items():
+            _rate_limits[host_of(host)] = limits
+
+
+def get_limiter(url_or_host: str) -> TokenBucket:
+    """Return the process-wide bucket for the host of url_or_host, creating it on first use."""
+    host = host_of(url_or_host)
+    with _registry_lock:
+        limiter = _limiters.get(host)
+        if limiter is None:
+            limiter = TokenBucket(*_rate_limits.get(host, default_rate_limit))
+            _limiters[host] = limiter
+        return limiter
+
+
+def retry_after_seconds(response) -> Optional[float]:
+    """Parse a numeric Retry-After header, ignoring the HTTP-date form."""
+    value = response.headers.get("Retry-After")
+    try:
+        return float(value) if value else None
+    except ValueError:
+        return None
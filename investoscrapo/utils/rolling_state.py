@@ -0,0 +1,209 @@
+"""
+Online accumulators for beta and volatility, so a refreshed panel only pays for
+its new rows.
+
+A RollingState holds, per instrument, the running count, sums, sums of squares
+and cross sums of its daily returns with the benchmark's, over the whole period
+and over the trailing window. The window sums are kept up to date by adding the
+new rows and subtracting the rows that fall out of a ring buffer of the last
+`window` rows. Appending N rows costs O(N) whatever the length of the history,
+and the state stays the same size: only the sums and the ring are kept, not
+the rolling series of past rows (summarize computes those from the panel,
+which holds every row anyway). The results match investoscrapo.utils.analytics
+on the same panel.
+
+Only closed days go into a stored state: today's row can still change when the
+cache refreshes it, so refresh_state adds it to a copy that is not stored.
+"""
+import copy
+import hashlib
+from datetime import date
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+from investoscrapo.configs.constants import beta_window, min_observations, trading_days_per_year
+from investoscrapo.utils.analytics import (
+    PRICE_FIELDS,
+    benchmark_column,
+    beta_from_sums,
+    panel_field,
+    volatility_from_sums,
+)
+
+# Rows of the accumulator arrays: the paired (benchmark x, instrument y) sums used
+# for beta, then the instrument's own sums used for volatility
+PAIR_N, PAIR_X, PAIR_Y, PAIR_XX, PAIR_XY, OWN_N, OWN_Y, OWN_YY = range(8)
+N_SUMS = 8
+
+
+def _contributions(m: np.ndarray, r: np.ndarray) -> np.ndarray:
+    """Each row's additions to the sums, shaped (rows, N_SUMS, instruments)."""
+    paired = ~(np.isnan(r) | np.isnan(m)[:, None])
+    x = np.where(paired, m[:, None], 0.0)
+    y = np.where(paired, r, 0.0)
+    own = ~np.isnan(r)
+    y_own = np.where(own, r, 0.0)
+    return np.stack([paired, x, y, x * x, x * y, own, y_own, y_own * y_own], axis=1).astype(float)
+
+
+class RollingState():
+    """
+    Full-period and trailing-window return sums for a fixed set of instruments
+    against one benchmark. Feed it the panel's prices with update(); rows on or
+    before the last date it has seen are skipped.
+    """
+
+    def __init__(self, columns, window: int = beta_window, min_periods: int = min_observations):
+        self.columns = pd.Index(columns)
+        self.window = window
+        self.min_periods = min_periods
+
+        width = len(self.columns)
+        self.start_date = None
+        self.last_date = None
+        self.last_prices = np.full(width, np.nan)
+        self.last_benchmark = np.nan
+        self.totals = np.zeros((N_SUMS, width))
+        self.window_sums = np.zeros((N_SUMS, width))
+        # Ring of the last `window` rows' contributions; rows never filled are zeros
+        self.ring = np.zeros((window, N_SUMS, width))
+        self.position = 0
+        self.since_resync = 0
+
+    def update(self, prices: pd.DataFrame, benchmark) -> dict:
+        """
+        Append the rows of prices (date x instrument, same columns) dated after
+        the last update. benchmark is a column label or position in prices, or a
+        Series of benchmark prices. Returns the rolling beta and volatility of the
+        appended rows.
+        """
+        if not prices.columns.equals(self.columns):
+            raise ValueError("Prices do not have the columns this state was built for")
+        if self.last_date is not None:
+            prices = prices.loc[prices.index > self.last_date]
+        if prices.empty:
+            return self._rolling(np.zeros((0, N_SUMS, len(self.columns))), prices.index)
+
+        # Seed the first return of the batch with the last prices already seen
+        p = np.vstack([self.last_prices, prices.to_numpy(dtype=float)])
+        p = np.where(p > 0, p, np.nan)
+        r = p[1:] / p[:-1] - 1
+        m = self._benchmark_returns(prices, benchmark)
+
+        new = _contributions(m, r)
+        rows = len(new)
+        self.totals += new.sum(axis=0)
+
+        # The row leaving the window as new row i enters: the ring's oldest rows first, then early new rows
+        leaving = self.ring[(self.position + np.arange(min(rows, self.window))) % self.window]
+        if rows > self.window:
+            leaving = np.concatenate([leaving, new[:rows - self.window]])
+        sums = self.window_sums + np.cumsum(new, axis=0) - np.cumsum(leaving, axis=0)
+
+        tail = np.arange(max(rows - self.window, 0), rows)
+        self.ring[(self.position + tail) % self.window] = new[tail]
+        self.position = (self.position + rows) % self.window
+        self.window_sums = sums[-1]
+
+        # Re-add the ring once per window so rounding from the subtractions cannot accumulate
+        self.since_resync += rows
+        if self.since_resync >= self.window:
+            self.window_sums = self.ring.sum(axis=0)
+            self.since_resync = 0
+
+        if self.start_date is None:
+            self.start_date = prices.index[0]
+        self.last_date = prices.index[-1]
+        self.last_prices = p[-1]
+        return self._rolling(sums, prices.index)
+
+    def preview(self, prices: pd.DataFrame, benchmark) -> "RollingState":
+        """A copy of this state advanced by prices, leaving this one as it is."""
+        state = copy.deepcopy(self)
+        state.update(prices, benchmark)
+        return state
+
+    def _benchmark_returns(self, prices, benchmark) -> np.ndarray:
+        if isinstance(benchmark, pd.Series):
+            series = benchmark.reindex(prices.index)
+        else:
+            series = prices.iloc[:, benchmark_column(prices, benchmark)]
+        b = np.concatenate([[self.last_benchmark], series.to_numpy(dtype=float)])
+        b = np.where(b > 0, b, np.nan)
+        self.last_benchmark = b[-1]
+        return b[1:] / b[:-1] - 1
+
+    def _rolling(self, sums: np.ndarray, index: pd.Index) -> dict:
+        min_periods = min(self.min_periods, self.window)
+        return {
+            "rolling_beta": pd.DataFrame(
+                beta_from_sums(*(sums[:, k] for k in (PAIR_N, PAIR_X, PAIR_Y, PAIR_XX, PAIR_XY)), min_periods),
+                index=index, columns=self.columns,
+            ),
+            "rolling_vol": pd.DataFrame(
+                volatility_from_sums(sums[:, OWN_N], sums[:, OWN_Y], sums[:, OWN_YY], min_periods),
+                index=index, columns=self.columns,
+            ),
+        }
+
+    def beta(self) -> pd.Series:
+        """Beta of every instrument over everything appended so far."""
+        t = self.totals
+        return pd.Series(beta_from_sums(t[PAIR_N], t[PAIR_X], t[PAIR_Y], t[PAIR_XX], t[PAIR_XY], self.min_periods),
+                         index=self.columns)
+
+    def volatility(self, periods_per_year: int = trading_days_per_year) -> pd.Series:
+        """Annualized volatility of every instrument over everything appended so far."""
+        t = self.totals
+        return pd.Series(volatility_from_sums(t[OWN_N], t[OWN_Y], t[OWN_YY], self.min_periods, periods_per_year),
+                         index=self.columns)
+
+    def rolling_beta(self) -> pd.Series:
+        """Beta over the last window rows."""
+        w = self.window_sums
+        return pd.Series(beta_from_sums(w[PAIR_N], w[PAIR_X], w[PAIR_Y], w[PAIR_XX], w[PAIR_XY],
+                                        min(self.min_periods, self.window)), index=self.columns)
+
+    def rolling_volatility(self, periods_per_year: int = trading_days_per_year) -> pd.Series:
+        """Annualized volatility over the last window rows."""
+        w = self.window_sums
+        return pd.Series(volatility_from_sums(w[OWN_N], w[OWN_Y], w[OWN_YY], min(self.min_periods, self.window),
+                                              periods_per_year), index=self.columns)
+
+
+def state_key(prices: pd.DataFrame, benchmark, window: int) -> str:
+    """Cache key of the state for these instruments, benchmark, window and start date."""
+    label = f"series:{benchmark.name}" if isinstance(benchmark, pd.Series) else repr(benchmark)
+    parts = [repr(list(prices.columns)), label, str(window), str(prices.index[0].date())]
+    return hashlib.sha1("|".join(parts).encode()).hexdigest()
+
+
+def refresh_state(cache, source: str, panel: pd.DataFrame, benchmark, window: int = beta_window,
+                  min_periods: int = min_observations, fields=PRICE_FIELDS) -> Optional[RollingState]:
+    """
+    The stored RollingState for this panel advanced by the rows it has not seen,
+    or a new one built from the whole panel. Rows of closed days (before today,
+    as in the cache) are added to the stored state and written back; a row for
+    today is only added to the returned copy. Returns None for an empty panel.
+    """
+    prices = panel_field(panel, fields)
+    if prices.empty:
+        return None
+    key = state_key(prices, benchmark, window)
+
+    state = cache.get_state(source, key)
+    if state is not None and (hasattr(state, "rolling") or state.min_periods != min_periods
+                              or (state.last_date is not None and state.last_date > prices.index[-1])):
+        # Stored by a version that kept every rolling row, for other thresholds, or past the panel's end: start over
+        state = None
+    if state is None:
+        state = RollingState(prices.columns, window, min_periods)
+
+    closed = prices.index < pd.Timestamp(date.today())
+    state.update(prices.loc[closed], benchmark)
+    cache.put_state(source, key, state)
+    if not closed.all():
+        state = state.preview(prices.loc[~closed], benchmark)
+    return state
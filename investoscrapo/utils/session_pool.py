@@ -0,0 +1,76 @@
+import queue
+import random
+import threading
+from contextlib import contextmanager
+from typing import Optional
+
+from curl_cffi import requests
+
+from investoscrapo.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+class SessionPool():
+    """
+    Long-lived impersonated curl_cffi sessions, `size` per browser profile.
+
+    A worker checks a session out, keeps it for the whole request (or a
+    GET/POST pair that must share cookies) and hands it back, so TCP/TLS
+    connections are reused across instruments instead of being rebuilt for
+    every call. Sessions are only created the first time they are checked out.
+    """
+
+    def __init__(self, profiles, size: int = 1):
+        self.profiles = list(profiles)
+        self.size = size
+        self._idle = queue.Queue()
+
+        slots = [profile for profile in self.profiles for _ in range(size)]
+        random.shuffle(slots)
+        for profile in slots:
+            self._idle.put((profile, None))
+
+    @contextmanager
+    def session(self, timeout: Optional[float] = None):
+        """Check out a session, blocking until one is free."""
+        profile, s = self._idle.get(timeout=timeout)
+        if s is None:
+            # Exclusive checkout makes a per-thread curl handle unnecessary, and a shared
+            # handle is what lets the connection survive hopping between worker threads
+            s = requests.Session(impersonate=profile, use_thread_local_curl=False)
+        try:
+            yield s
+        except Exception:
+            # The connection may be in a bad state; the next checkout starts afresh
+            logger.info(f"Discarding {profile} session after an error")
+            s.close()
+            s = None
+            raise
+        finally:
+            self._idle.put((profile, s))
+
+    def close(self):
+        """Close every idle session. Sessions checked out at the time are left alone."""
+        drained = []
+        while True:
+            try:
+                drained.append(self._idle.get_nowait())
+            except queue.Empty:
+                break
+        for profile, s in drained:
+            if s is not None:
+                s.close()
+            self._idle.put((profile, None))
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_session_pool(name: str, profiles, size: int = 1) -> SessionPool:
+    """Process-wide SessionPool per scraper, created on first use."""
+    with _pools_lock:
+        if name not in _pools:
+            _pools[name] = SessionPool(profiles, size)
+        return _pools[name]
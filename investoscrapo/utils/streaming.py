@@ -0,0 +1,40 @@
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Callable, Iterable, Iterator, Optional
+
+_END = object()
+
+
+def stream_map(fn: Callable, items: Iterable, max_workers: int = 5, max_in_flight: Optional[int] = None) -> Iterator[tuple]:
+    """
+    Yield (item, fn(item)) in completion order.
+
+    At most max_in_flight calls are submitted at any time (default: twice the
+    worker count), and a new one is only submitted once the consumer has taken
+    a finished result, so memory is bounded by max_in_flight results no matter
+    how many items there are. Exceptions raised by fn propagate to the consumer.
+    """
+    max_in_flight = max(max_in_flight or 2 * max_workers, 1)
+    items = iter(items)
+    pending = {}
+
+    executor = ThreadPoolExecutor(max_workers=max_workers)
+    try:
+        def top_up():
+            while len(pending) < max_in_flight:
+                item = next(items, _END)
+                if item is _END:
+                    return
+                pending[executor.submit(fn, item)] = item
+
+        top_up()
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                item = pending.pop(future)
+                yield item, future.result()
+            top_up()
+    finally:
+        # Reached when the consumer stops early or fn raised: drop queued work
+        for future in pending:
+            future.cancel()
+        executor.shutdown(wait=True)
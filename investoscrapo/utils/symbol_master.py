@@ -0,0 +1,355 @@
+"""
+Offline symbol master: every instrument seen in a search result or a bulk
+equity list, answerable without a network call.
+
+Records live in one SQLite table (one row per (source, id)) and are loaded into
+an in-memory index on first lookup: a sorted key array searched with bisect for
+symbol and name prefixes (a flattened trie), a trigram posting list per key for
+misspelt names, and a dict for ISINs. Prefix and ISIN lookups take microseconds.
+Rows added once the index exists are inserted into it in place; only a bulk
+load large enough to be cheaper to rebuild drops it.
+
+The table also links listings of one instrument across sources through their
+ISIN (see investoscrapo.utils.identity_map). Listings that arrive without one
+inherit it:
+- Yahoo tickers from their exchange suffix (RELIANCE.NS, 500325.BO).
+- NSE and BSE listings from another NSE or BSE listing with the same company
+  name, as long as that name maps to a single ISIN. Names are never matched
+  across other exchanges, where the same name can be a different company.
+"""
+import csv
+import io
+import os
+import re
+import sqlite3
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter, defaultdict
+from contextlib import closing
+from typing import Iterable, Optional
+
+from investoscrapo.configs.constants import cache_dir
+from investoscrapo.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS symbols (
+    source      TEXT NOT NULL,
+    id          TEXT NOT NULL,
+    symbol      TEXT NOT NULL,
+    description TEXT NOT NULL,
+    exchange    TEXT NOT NULL,
+    type        TEXT NOT NULL,
+    isin        TEXT,
+    name_key    TEXT,
+    updated_at  REAL,
+    PRIMARY KEY (source, id)
+);
+"""
+
+INDEXES = """
+CREATE INDEX IF NOT EXISTS symbols_isin ON symbols (isin);
+CREATE INDEX IF NOT EXISTS symbols_name ON symbols (name_key);
+"""
+
+FIELDS = ("source", "id", "symbol", "description", "exchange", "type", "isin")
+
+# Exchanges whose listings of one company share its ISIN, so a name match between them is trusted
+LINKED_EXCHANGES = ("NSE", "BSE")
+
+# Words that differ between the sources' spellings of the same company name
+NAME_NOISE = {"ltd", "limited", "inc", "corp", "corporation", "co", "company", "the", "and", "plc", "pvt", "private"}
+
+YAHOO_SUFFIXES = {".NS": "nse", ".BO": "bse"}
+
+# Column names of the exchanges' bulk equity lists (NSE EQUITY_L.csv, BSE's list of scrips)
+EQUITY_LISTS = {
+    "nse": {"id": "SYMBOL", "symbol": "SYMBOL", "description": "NAME OF COMPANY", "isin": "ISIN NUMBER",
+            "exchange": "NSE", "type": "Equity - NSE"},
+    "bse": {"id": "Security Code", "symbol": "Security Code", "description": "Security Name", "isin": "ISIN No",
+            "exchange": "BSE", "type": "Stock - BSE"},
+}
+
+ISIN_RE = re.compile(r"^[A-Z]{2}[A-Z0-9]{9}[0-9]$")
+
+
+def normalize(text) -> str:
+    return " ".join(re.sub(r"[^0-9a-z]+", " ", str(text).casefold()).split())
+
+
+def name_key(description) -> str:
+    return " ".join(word for word in normalize(description).split() if word not in NAME_NOISE)
+
+
+def trigrams(text: str) -> set:
+    padded = f" {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def index_terms(record: dict):
+    """(prefix keys with their rank, trigrams) a record is indexed under."""
+    symbol, name = normalize(record["symbol"]), normalize(record["description"])
+    # Symbol, whole name and every name word from the second on are prefix keys
+    words = name.split()
+    keys = [(key, rank) for rank, key in ((0, symbol), (1, name), *((2, " ".join(words[j:])) for j in range(1, len(words))))
+            if key]
+    return keys, trigrams(name) | trigrams(symbol)
+
+
+class SymbolMaster():
+    """
+    Persistent instrument list with prefix, ISIN and fuzzy lookup.
+
+    add() and load_equity_list() write through to disk and into the in-memory
+    index, when it has been built. A record replaced by add() leaves its old
+    slot empty; the index is rebuilt once half of it is empty slots.
+    """
+
+    # Rows in one add() past which the index is rebuilt on next lookup instead of updated
+    rebuild_rows = 1000
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or os.path.join(cache_dir, "symbols.sqlite")
+        self._lock = threading.Lock()
+        self._index = None
+        self._replaced = 0
+
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        with closing(self.connect()) as conn, conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+            self._migrate(conn)
+            conn.executescript(INDEXES)
+
+    def connect(self):
+        return sqlite3.connect(self.path, timeout=30)
+
+    @staticmethod
+    def _migrate(conn):
+        """Add the identity columns to a table written before they existed."""
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(symbols)")}
+        if "name_key" in columns:
+            return
+        conn.execute("ALTER TABLE symbols ADD COLUMN name_key TEXT")
+        conn.execute("ALTER TABLE symbols ADD COLUMN updated_at REAL")
+        rows = conn.execute("SELECT source, id, description FROM symbols").fetchall()
+        conn.executemany("UPDATE symbols SET name_key = ?, updated_at = 0 WHERE source = ? AND id = ?",
+                         [(name_key(description), source, listing_id) for source, listing_id, description in rows])
+
+    @staticmethod
+    def _inferred_isin(conn, record: dict, key: str) -> Optional[str]:
+        if record["source"] == "yahoo":
+            base, suffix = os.path.splitext(record["id"].upper())
+            target = YAHOO_SUFFIXES.get(suffix)
+            if target:
+                row = conn.execute(
+                    "SELECT isin FROM symbols WHERE source = ? AND (id = ? OR symbol = ?) AND isin IS NOT NULL",
+                    (target, base, base),
+                ).fetchone()
+                if row:
+                    return row[0]
+        if key and record["exchange"].upper() in LINKED_EXCHANGES:
+            isins = conn.execute(
+                f"SELECT DISTINCT isin FROM symbols WHERE name_key = ? AND isin IS NOT NULL "
+                f"AND UPPER(exchange) IN ({', '.join('?' * len(LINKED_EXCHANGES))})",
+                (key, *LINKED_EXCHANGES),
+            ).fetchall()
+            if len(isins) == 1:
+                return isins[0][0]
+        return None
+
+    def add(self, results: Iterable[dict], source: str) -> int:
+        """
+        Store search results (or any dicts with at least id and description)
+        under source. A result without an ISIN keeps the one its listing already
+        had, or inherits one (see the module docstring); an NSE or BSE result
+        with an ISIN passes it on to same-named NSE and BSE listings lacking one.
+        """
+        now = time.time()
+        records, linked = [], False
+        with self._lock, closing(self.connect()) as conn, conn:
+            for result in results:
+                if not result or not result.get("id") or result.get("id") == "N/A":
+                    continue
+                isin = result.get("isin")
+                record = {
+                    "source": source,
+                    "id": str(result["id"]),
+                    "symbol": str(result.get("symbol") or result["id"]),
+                    "description": str(result.get("description") or ""),
+                    "exchange": str(result.get("exchange") or ""),
+                    "type": str(result.get("type") or ""),
+                    "isin": isin.upper() if isin and isin != "N/A" else None,
+                }
+                key = name_key(record["description"])
+                if record["isin"] is None:
+                    # Keep an ISIN learnt earlier (from a download, say) over a result that lacks one
+                    row = conn.execute("SELECT isin FROM symbols WHERE source = ? AND id = ?",
+                                       (source, record["id"])).fetchone()
+                    record["isin"] = (row and row[0]) or self._inferred_isin(conn, record, key)
+                conn.execute("INSERT OR REPLACE INTO symbols VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                             (*(record[field] for field in FIELDS), key, now))
+                if record["isin"] and key and record["exchange"].upper() in LINKED_EXCHANGES:
+                    linked |= conn.execute(
+                        f"UPDATE symbols SET isin = ? WHERE name_key = ? AND isin IS NULL "
+                        f"AND UPPER(exchange) IN ({', '.join('?' * len(LINKED_EXCHANGES))})",
+                        (record["isin"], key, *LINKED_EXCHANGES),
+                    ).rowcount > 0
+                records.append(record)
+
+            if self._index is not None:
+                # Listings that inherited an ISIN changed outside this batch: rebuild
+                if linked or len(records) > max(self.rebuild_rows, len(self._index[0]) // 4):
+                    self._index = None
+                else:
+                    self._insert(records)
+        return len(records)
+
+    def set_isin(self, source: str, listing_id, isin: str):
+        """Attach an ISIN learnt from a download to an existing listing."""
+        with self._lock, closing(self.connect()) as conn, conn:
+            conn.execute("UPDATE symbols SET isin = ?, updated_at = ? WHERE source = ? AND id = ?",
+                         (isin.upper(), time.time(), source, str(listing_id)))
+            if self._index is not None:
+                records, _, _, isins, _, positions = self._index
+                at = positions.get((source, str(listing_id)))
+                if at is not None:
+                    records[at] = {**records[at], "isin": isin.upper()}
+                    isins[isin.upper()].append(at)
+
+    def _insert(self, new_records: list):
+        """Add records to the built index in place (the caller holds the lock)."""
+        records, keys, key_strings, isins, grams, positions = self._index
+        for record in new_records:
+            at = positions.get((record["source"], record["id"]))
+            if at is not None:
+                if records[at] == record:
+                    continue
+                records[at] = None
+                self._replaced += 1
+            i = len(records)
+            records.append(record)
+            positions[(record["source"], record["id"])] = i
+
+            prefixes, record_grams = index_terms(record)
+            for key, rank in prefixes:
+                position = bisect_left(keys, (key, rank, i))
+                keys.insert(position, (key, rank, i))
+                key_strings.insert(position, key)
+            if record["isin"]:
+                isins[record["isin"].upper()].append(i)
+            for gram in record_grams:
+                grams[gram].append(i)
+
+        if self._replaced * 2 > len(records):
+            self._index = None
+
+    def load_equity_list(self, path_or_bytes, source: str) -> int:
+        """Load an exchange's bulk equity list (a CSV path or its bytes): NSE's EQUITY_L.csv or BSE's list of scrips."""
+        columns = EQUITY_LISTS[source]
+        if isinstance(path_or_bytes, (bytes, bytearray)):
+            text = path_or_bytes.decode("utf-8-sig")
+        else:
+            with open(path_or_bytes, encoding="utf-8-sig") as f:
+                text = f.read()
+        reader = csv.DictReader(io.StringIO(text))
+        reader.fieldnames = [name.strip() for name in reader.fieldnames]
+
+        def records():
+            for row in reader:
+                yield {
+                    field: (row.get(column) or "").strip() if column in reader.fieldnames else column
+                    for field, column in columns.items()
+                }
+
+        count = self.add(records(), source)
+        logger.info(f"Loaded {count} {source} instruments into the symbol master")
+        return count
+
+    def _build(self):
+        with closing(self.connect()) as conn:
+            records = [dict(zip(FIELDS, row)) for row in conn.execute(f"SELECT {', '.join(FIELDS)} FROM symbols")]
+
+        keys, isins, grams = [], defaultdict(list), defaultdict(list)
+        for i, record in enumerate(records):
+            prefixes, record_grams = index_terms(record)
+            keys.extend((key, rank, i) for key, rank in prefixes)
+            if record["isin"]:
+                isins[record["isin"].upper()].append(i)
+            for gram in record_grams:
+                grams[gram].append(i)
+
+        keys.sort()
+        self._replaced = 0
+        positions = {(record["source"], record["id"]): i for i, record in enumerate(records)}
+        return records, keys, [key for key, _, _ in keys], isins, grams, positions
+
+    def _get_index(self):
+        with self._lock:
+            if self._index is None:
+                self._index = self._build()
+            return self._index
+
+    def lookup(self, query: str, source: Optional[str] = None, limit: int = 10, fuzzy: bool = True) -> list[dict]:
+        """
+        Instruments matching query, best first: an ISIN match, then an exact
+        symbol, symbol prefixes, name prefixes and name-word prefixes. When
+        nothing matches by prefix and fuzzy is set, names sharing the most
+        trigrams with the query are returned instead.
+        """
+        # Held for the whole lookup, so a concurrent add() cannot shift keys mid-scan
+        with self._lock:
+            if self._index is None:
+                self._index = self._build()
+            return self._lookup(self._index, query, source, limit, fuzzy)
+
+    @staticmethod
+    def _lookup(index, query, source, limit, fuzzy) -> list[dict]:
+        records, keys, key_strings, isins, grams, _ = index
+        wanted = lambda i: records[i] is not None and (source is None or records[i]["source"] == source)
+
+        isin = query.strip().upper()
+        if ISIN_RE.match(isin):
+            return [dict(records[i]) for i in dict.fromkeys(isins.get(isin, []))
+                    if wanted(i) and records[i]["isin"] == isin][:limit]
+
+        q = normalize(query)
+        if not q:
+            return []
+
+        best = {}
+        for position in range(bisect_left(key_strings, q), len(keys)):
+            key, rank, i = keys[position]
+            if not key.startswith(q):
+                break
+            if wanted(i):
+                score = (-1 if rank == 0 and key == q else rank, len(key))
+                best[i] = min(best.get(i, score), score)
+        if best:
+            ranked = sorted(best, key=best.get)
+        elif fuzzy:
+            q_grams = trigrams(q)
+            hits = Counter(i for gram in q_grams for i in grams.get(gram, ()) if wanted(i))
+            # Keep candidates sharing at least half of the query's trigrams
+            ranked = [i for i, count in hits.most_common() if count * 2 >= len(q_grams)]
+        else:
+            ranked = []
+        return [dict(records[i]) for i in ranked[:limit]]
+
+    def __len__(self):
+        return len(self._get_index()[5])
+
+
+_masters = {}
+_masters_lock = threading.Lock()
+
+
+def get_symbol_master(path: Optional[str] = None) -> SymbolMaster:
+    """Shared SymbolMaster per path."""
+    key = path or os.path.join(cache_dir, "symbols.sqlite")
+    with _masters_lock:
+        if key not in _masters:
+            _masters[key] = SymbolMaster(key)
+        return _masters[key]
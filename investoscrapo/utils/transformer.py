@@ -1,15 +1,7 @@
-import openpyxl.reader
 import pandas as pd
 import numpy as np
-import openpyxl
-from openpyxl import Workbook
-from functools import reduce
 from investoscrapo.configs.constants import *
 
-import pandas as pd
-
-import pandas as pd
-
 KEEP_COLS = [
     "rowDate",
     "last_closeRaw",
@@ -18,52 +10,128 @@ KEEP_COLS = [
     "instrument_id",
 ]
 
-def build_full_panel_with_ids(dfs):
+PANEL_FIELDS = ["last_closeRaw", "volumeRaw"]
+ID_COLS = ["symbol", "instrument_id"]
+
+
+def _scatter(dfs, date_col, fields, id_cols, date_format):
+    """
+    Place every frame's rows into dense (date x instrument) arrays in one pass.
+
+    Returns the sorted dates, the instrument keys (a MultiIndex over id_cols, in
+    first-seen order), one float64 matrix per field and a boolean matrix marking
+    which (date, instrument) cells had a row at all.
+    """
+    frames = [df for df in dfs if not df.empty]
+    if not frames:
+        return None
+
+    # Identifiers are constant within a frame, so one tuple per frame is enough
+    keys = pd.MultiIndex.from_tuples([tuple(df[col].iloc[0] for col in id_cols) for df in frames], names=id_cols)
+    key_codes, keys = keys.factorize()
+    row_cols = np.repeat(key_codes, [len(df) for df in frames])
+
+    # One long column of dates; every distinct date string is parsed exactly once
+    dates = pd.concat([df[date_col] for df in frames], ignore_index=True)
+    row_dates, dates = pd.factorize(dates)
+    if not pd.api.types.is_datetime64_any_dtype(dates):
+        dates = pd.to_datetime(dates, format=date_format)
+    date_order, dates = pd.factorize(dates, sort=True)
+    row_dates = date_order[row_dates]
+
+    shape = (len(dates), len(keys))
+    present = np.zeros(shape, dtype=bool)
+    present[row_dates, row_cols] = True
+
+    matrices = {}
+    for field in fields:
+        values = np.full(shape, np.nan)
+        # Later rows for the same (date, instrument) overwrite earlier ones
+        values[row_dates, row_cols] = np.concatenate([df[field].to_numpy(dtype=float) for df in frames])
+        matrices[field] = values
+
+    return pd.DatetimeIndex(dates, name=date_col), keys, matrices, present
+
+
+def build_panel(dfs, date_col="rowDate", fields=PANEL_FIELDS, id_cols=ID_COLS, date_format="%b %d, %Y"):
     """
     Build a time-aligned panel with MultiIndex columns:
       level 0: data field
-      level 1: symbol (ticker)
-    Includes static fields (symbol, instrument_id) repeated over time.
+      remaining levels: the identifiers in id_cols (symbol, instrument_id)
+    Identifiers live only in the column index; no per-row copies are kept.
     """
+    scattered = _scatter(dfs, date_col, fields, id_cols, date_format)
+    if scattered is None:
+        return pd.DataFrame(columns=pd.MultiIndex.from_tuples([], names=["field", *id_cols]))
+    index, keys, matrices, _ = scattered
 
-    panels = []
+    columns = pd.MultiIndex.from_tuples(
+        [(field, *key) for field in fields for key in keys], names=["field", *id_cols]
+    )
+    data = np.concatenate([matrices[field] for field in fields], axis=1)
+    return pd.DataFrame(data, index=index, columns=columns)
 
-    for df in dfs:
-        # 1. Keep only required columns
 
-        # 2. Type cleaning
-        df["rowDate"] = pd.to_datetime(df["rowDate"], format="%b %d, %Y")
-        df["last_closeRaw"] = df["last_closeRaw"].astype(float)
-        df["volumeRaw"] = df["volumeRaw"].astype(float)
+def build_full_panel_with_ids(dfs):
+    """
+    Build a time-aligned panel with MultiIndex columns:
+      level 0: data field
+      level 1: symbol (ticker)
+    Includes static fields (symbol, instrument_id) repeated over time.
+    """
+    scattered = _scatter(dfs, "rowDate", PANEL_FIELDS, ID_COLS, "%b %d, %Y")
+    if scattered is None:
+        return pd.DataFrame(columns=pd.MultiIndex.from_tuples([], names=["field", "symbol"]))
+    index, keys, matrices, present = scattered
+
+    # Price and volume come straight from the matrices; the identifier blocks
+    # repeat each key down its column where the instrument had a row
+    shape = present.shape
+    blocks = [pd.DataFrame(matrices[field], index=index) for field in PANEL_FIELDS] + [
+        pd.DataFrame(np.broadcast_to(keys.get_level_values(level).to_numpy(), shape).copy(), index=index).where(present)
+        for level in range(len(ID_COLS))
+    ]
+
+    # Symbols are not unique across exchanges, so columns are placed positionally:
+    # each instrument's price, volume, symbol and instrument_id side by side
+    fields = [*PANEL_FIELDS, *ID_COLS]
+    width = len(keys)
+    order = [f * width + j for j in range(width) for f in range(len(fields))]
+    panel = pd.concat(blocks, axis=1, ignore_index=True).iloc[:, order]
+    symbols = keys.get_level_values(0)
+    panel.columns = pd.MultiIndex.from_tuples(
+        [(field, symbols[j]) for j in range(width) for field in fields], names=["field", "symbol"]
+    )
 
-        # 3. Extract identifiers (constant per DF)
-        symbol = df["symbol"].iloc[0]
-        instrument_id = df["instrument_id"].iloc[0]
+    return panel
 
-        # 4. Set date index
-        df = df.set_index("rowDate")
 
-        # 5. Build wide block INCLUDING static fields
-        wide = pd.DataFrame(
-            {
-                ("last_closeRaw", symbol): df["last_closeRaw"],
-                ("volumeRaw", symbol): df["volumeRaw"],
-                ("symbol", symbol): symbol,
-                ("instrument_id", symbol): instrument_id,
-            },
-            index=df.index,
+def compact_panel(panel, dtypes=compact_dtypes):
+    """
+    Downcast a build_panel result to the compact dtype policy: float32 prices,
+    nullable integer volumes, and the symbol column level stored as a categorical.
+    Identifiers stay in the column index, so nothing is repeated per row.
+    A column bound for an integer dtype that holds fractional values (crypto
+    volumes, say) keeps its float dtype instead.
+    """
+    casts = {key: dtypes[key[0]] for key in panel.columns if key[0] in dtypes}
+    integral = [key for key, dtype in casts.items() if pd.api.types.is_integer_dtype(pd.api.types.pandas_dtype(dtype))]
+    if integral:
+        values = panel[integral].apply(pd.to_numeric, errors="coerce")
+        fractional = (values.notna() & (values % 1 != 0)).any()
+        for key in fractional.index[fractional.to_numpy()]:
+            del casts[key]
+    panel = panel.astype(casts)
+
+    if "symbol" in panel.columns.names:
+        level = panel.columns.names.index("symbol")
+        panel.columns = panel.columns.set_levels(
+            pd.CategoricalIndex(panel.columns.levels[level]), level=level
         )
 
-        panels.append(wide)
-
-    # 6. Concatenate all tickers horizontally
-    panel = pd.concat(panels, axis=1).sort_index()
-
-    # 7. Ensure proper MultiIndex
-    panel.columns = pd.MultiIndex.from_tuples(
-        panel.columns, names=["field", "symbol"]
-    )
-
     return panel
 
 
+def build_compact_panel(dfs, dtypes=compact_dtypes, **kwargs):
+    """build_panel followed by compact_panel."""
+    return compact_panel(build_panel(dfs, **kwargs), dtypes)
@@ -1,18 +1,28 @@
 import json
+import os
 import datetime
 from curl_cffi import requests
 import math
 import time
 import pandas as pd
 from urllib.parse import urlencode, quote_plus
-from datetime import datetime
+from datetime import date, datetime, timedelta
 from concurrent.futures import ThreadPoolExecutor, ALL_COMPLETED, as_completed, wait
 import random
 from bs4 import BeautifulSoup, Tag
-from nse_scraper.nsescraper.configs.constants import HOME_URL, HISTORICAL_DATA_URL, SEARCH_URL,BROWSER_IMPERSONATION, user_agents, keep_cols, delay_range
+from nse_scraper.nsescraper.configs.constants import HOME_URL, HISTORICAL_DATA_URL, SEARCH_URL,BROWSER_IMPERSONATION, user_agents, keep_cols, rate_limits, cookie_ttl, history_columns, history_series, history_window_days, history_window_workers, panel_fields, panel_id_cols, bhavcopy_flush_days
 from nse_scraper.nsescraper.utils.logger import get_logger
+from nse_scraper.nsescraper.utils.bhavcopy import bhavcopy_name, bhavcopy_url, get_bhavcopy_store, iter_bhavcopies
+from investoscrapo.utils.cache import get_cache
+from investoscrapo.utils.cookie_store import cookie_expiry
+from investoscrapo.utils.history_client import HistoryClient
+from investoscrapo.utils.identity_map import remember
+from investoscrapo.utils.session_pool import get_session_pool
+from investoscrapo.utils.streaming import stream_map
+from investoscrapo.utils.ratelimit import configure_limits, get_limiter, retry_after_seconds
 
 logging = get_logger(__name__)
+configure_limits(rate_limits)
 
 def get_headers():
     return {
@@ -33,6 +43,12 @@ def get_headers():
         "User-Agent": random.choice(user_agents),
     }
 
+def get_history_headers(symbol):
+    headers = get_headers()
+    # The historical API expects to be called from the symbol's quote page
+    headers['referer'] = f"{HOME_URL}get-quotes/equity?symbol={quote_plus(symbol)}"
+    return headers
+
 # def get_headers_adjusted(params):
 #     query_string = urlencode(params)
 #     return {
@@ -54,19 +70,24 @@ def get_headers():
 #     "User-Agent": random.choice(user_agents),
 #     }
 
-def add_delay():
-            """Add random delay to avoid rate limiting."""
-            delay = random.uniform(*delay_range)
-            time.sleep(delay)
-
+class nse_scraper(HistoryClient):
 
-class nse_scraper():
+    source = "nse"
+    panel_fields = panel_fields
+    panel_id_cols = panel_id_cols
 
-    def __init__(self):       
+    def __init__(self, use_cache: bool = True, window_days: int = history_window_days,
+                 window_workers: int = history_window_workers):       
         self.session = requests.Session()
         self.session.headers.update(get_headers())
         self.max_retries = 3
         self.cookies = None
+        self.cookie_expires_at = None
+        self.cache = get_cache() if use_cache else None
+        self.pool = get_session_pool(self.source, BROWSER_IMPERSONATION)
+        # Longest range one historical API call may cover, and how many windows are fetched at once
+        self.window_days = window_days
+        self.window_workers = window_workers
 
     def fetch_cookies(self):
         """Fetch initial cookies and bypass Cloudflare if needed."""
@@ -86,7 +107,8 @@ class nse_scraper():
                             response = s.get(HOME_URL, timeout=30)
                     
                     if response.status_code == 200:
-                        self.cookies = self.session.cookies.get_dict()
+                        self.cookies = s.cookies.get_dict()
+                        self.cookie_expires_at = cookie_expiry(s.cookies, cookie_ttl)
                         logging.info("Successfully fetched cookies")
                         return self.cookies
                     else:
@@ -106,11 +128,15 @@ class nse_scraper():
         params = {"q": search_term,
                   }
         suggestions = []
+        if not self.cookies:
+            self.get_cookies()
         try:
-            add_delay()  # Add delay between requests to mimic human behavior
+            limiter = get_limiter(SEARCH_URL)
+            limiter.acquire()  # Wait for the shared per-host token bucket
             self.session.cookies.update(self.cookies)
             
             response = self.session.get(SEARCH_URL, params=params, timeout=30)
+            limiter.feedback(response.status_code, retry_after_seconds(response))
             
             if response.status_code == 200:
                 try:
@@ -131,6 +157,7 @@ class nse_scraper():
                         }
                         results.append(result)
                     # print(soup)
+                    remember(results, self.source)
                     return results
                     
                 except ValueError as ve:
@@ -139,6 +166,7 @@ class nse_scraper():
             
             elif response.status_code == 403:
                 logging.warning("Access forbidden. Updating cookies and retrying...")
+                self.get_cookies(stale=self.cookies)
 
             else:
                 logging.error(
@@ -149,316 +177,258 @@ class nse_scraper():
             print(f"Error with search URL {SEARCH_URL}: {e}")
             return None
 
-    # def request_data(self, scrip_dict, start_date, end_date):
-    #     """
-    #     Fetch historical data for a given scrip between specified dates.
-        
-    #     Args:
-    #         scrip_dict: Dictionary containing scrip info with keys 'id' and 'description'
-    #         start_date: Start date in format 'YYYY-MM-DD'
-    #         end_date: End date in format 'YYYY-MM-DD'
-        
-    #     Returns:
-    #         pandas.DataFrame: Historical price data
-    #     """
-        
-    #     if not self.cookies:
-    #         self.cookies = self.fetch_cookies()
-        
-    #     scrip_url = HISTORICAL_DATA_URL
-    #     params = {
-    #         "expandable": 7,                            
-    #         "scripcode": scrip_dict["id"],           
-    #         "flag": "sp",                         
-    #         "Submit": "G"
-    #     }
-        
-    #     headers = get_headers_adjusted(params)
-        
-    #     for attempt in range(self.max_retries):
-    #         try:
-    #             add_delay()
-    #             with requests.Session(impersonate=random.choice(BROWSER_IMPERSONATION)) as s:
-                    
-    #                 # Update headers and cookies
-    #                 s.headers.update(headers)
-    #                 s.cookies.update(self.cookies)        
-    #                 logging.info(f"Fetching data for {scrip_dict.get('description', 'Unknown')} (ID: {scrip_dict['id']}) - Attempt {attempt + 1}")
-                    
-    #                 # Initial GET request to get form data
-    #                 get_response = s.get(scrip_url, params=params, timeout=30)
-
-    #                 if get_response.status_code == 200:
-    #                     logging.info("Status code 200: Initial response received.")
-                        
-    #                     get_soup = BeautifulSoup(get_response.text, "html.parser")
-                        
-    #                     # Extract required form fields
-    #                     viewstate = get_soup.select_one('input[name="__VIEWSTATE"]')
-    #                     eventvalidation = get_soup.select_one('input[name="__EVENTVALIDATION"]')
-    #                     viewstategenerator = get_soup.select_one('input[name="__VIEWSTATEGENERATOR"]')
-                        
-    #                     if not all([viewstate, eventvalidation, viewstategenerator]):
-    #                         logging.error("Failed to extract required form fields")
-    #                         continue
-                        
-    #                     viewstate_val = viewstate['value']
-    #                     eventvalidation_val = eventvalidation['value']
-    #                     viewstategenerator_val = viewstategenerator['value']
-                        
-    #                     logging.info("All payloads extracted successfully")
-                        
-    #                     # Parse and format dates
-    #                     start_date_obj = datetime.strptime(start_date, "%Y-%m-%d")
-    #                     end_date_obj = datetime.strptime(end_date, "%Y-%m-%d")
-                        
-    #                     # Format dates for BSE (DD/MM/YYYY)
-    #                     bse_start_date = start_date_obj.strftime("%d/%m/%Y")
-    #                     bse_end_date = end_date_obj.strftime("%d/%m/%Y")
-                        
-    #                     # Current timestamp for BSE format
-    #                     current_timestamp = datetime.now().strftime("%d/%m/%Y 12:00:00 AM")
-                        
-    #                     logging.info(f"Date range: {bse_start_date} to {bse_end_date}")
-                        
-    #                     # Construct the final payload for POST request
-    #                     final_payload = {
-    #                         "__EVENTTARGET": "",
-    #                         "__EVENTARGUMENT": "",
-    #                         "__VIEWSTATE": viewstate_val,
-    #                         "__VIEWSTATEGENERATOR": viewstategenerator_val,
-    #                         "__VIEWSTATEENCRYPTED": "",
-    #                         "__EVENTVALIDATION": eventvalidation_val,
-                            
-    #                         # Core scrip and date fields
-    #                         "ctl00$ContentPlaceHolder1$hdnCode": scrip_dict["id"],
-    #                         "ctl00$ContentPlaceHolder1$hiddenScripCode": scrip_dict["id"],
-    #                         "ctl00$ContentPlaceHolder1$hidCompanyVal": scrip_dict["description"],
-                            
-    #                         # Date-related fields
-    #                         "ctl00$ContentPlaceHolder1$txtFromDate": bse_start_date,
-    #                         "ctl00$ContentPlaceHolder1$txtToDate": bse_end_date,
-    #                         "ctl00$ContentPlaceHolder1$hidFromDate": bse_start_date,
-    #                         "ctl00$ContentPlaceHolder1$hidToDate": bse_end_date,
-    #                         "ctl00$ContentPlaceHolder1$hidCurrentDate": current_timestamp,
-                            
-    #                         # Frequency selection - IMPORTANT: This ensures daily data
-    #                         "ctl00$ContentPlaceHolder1$DMY": "rdbDaily",
-    #                         "ctl00$ContentPlaceHolder1$hidDMY": "D",
-    #                         "ctl00$ContentPlaceHolder1$hdflag": "0",
-                            
-    #                         # Search fields
-    #                         "ctl00$ContentPlaceHolder1$smartSearch": scrip_dict["description"],
-    #                         "ctl00$ContentPlaceHolder1$scripname": scrip_dict["description"],
-    #                         "ctl00$ContentPlaceHolder1$Hidden4": scrip_dict["description"],
-                            
-    #                         # Settlement calendar
-    #                         "ctl00$ContentPlaceHolder1$ddlsetllementcal": "0",
-                            
-    #                         # Other required fields
-    #                         "ctl00$ContentPlaceHolder1$DDate": "",
-    #                         "ctl00$ContentPlaceHolder1$hidYear": "",
-    #                         "ctl00$ContentPlaceHolder1$hidOldDMY": "",
-    #                         "ctl00$ContentPlaceHolder1$Hidden1": "",
-                            
-    #                         # Submit button - this should trigger the CSV download
-    #                         "ctl00$ContentPlaceHolder1$btnSubmit": "Submit"
-    #                     }
-                        
-    #                     # Make the final POST request
-    #                     query_string = urlencode(params)
-    #                     scrip_url_final = f"{scrip_url}?{query_string}"
-                        
-    #                     logging.info("Submitting final request for historical data...")
-    #                     final_response = s.post(scrip_url_final, data=final_payload, timeout=60)
-                        
-    #                     if final_response.status_code == 200:
-    #                         logging.info("Final response received successfully")
-                            
-    #                         # Check if response is CSV data
-    #                         content_type = final_response.headers.get('content-type', '').lower()
-    #                         content_disposition = final_response.headers.get('content-disposition', '')
-                            
-    #                         if 'excel' in content_type or 'csv' in content_disposition:
-    #                             logging.info("✅ Received CSV data response")
-                                
-    #                             try:
-    #                                 # Parse CSV data using pandas
-    #                                 from io import StringIO
-    #                                 csv_data = StringIO(final_response.text)
-                                    
-    #                                 # Read CSV with pandas
-    #                                 df = pd.read_csv(csv_data, parse_dates=['Date'], dayfirst=True)
-                                    
-    #                                 if len(df) > 0:
-    #                                     logging.info(f"✅ Successfully parsed CSV with {len(df)} rows")
-                                        
-    #                                     # Clean column names (remove extra spaces)
-    #                                     df.columns = df.columns.str.strip()
-                                        
-    #                                     # Ensure Date column is properly formatted
-    #                                     if 'Date' in df.columns:
-    #                                         df['Date'] = pd.to_datetime(df['Date'], dayfirst=True, errors='coerce')
-                                            
-    #                                         # Filter data to requested date range
-    #                                         df = df[
-    #                                             (df['Date'] >= start_date_obj) & 
-    #                                             (df['Date'] <= end_date_obj)
-    #                                         ]
-                                            
-    #                                         # Sort by date
-    #                                         df = df.sort_values('Date')
-                                        
-    #                                     # Convert numeric columns (handle commas in numbers)
-    #                                     numeric_cols = ['Open', 'High', 'Low', 'Close', 'Last', 'Prevclose', 'Volume', 'Turnover']
-    #                                     for col in numeric_cols:
-    #                                         if col in df.columns:
-    #                                             # Remove commas and convert to numeric
-    #                                             df[col] = df[col].astype(str).str.replace(',', '').str.replace('-', '0')
-    #                                             df[col] = pd.to_numeric(df[col], errors='coerce')
-                                        
-    #                                     # Add symbol information
-    #                                     df['Symbol'] = scrip_dict.get('description', 'Unknown')
-    #                                     df['ScripCode'] = scrip_dict['id']
-                                        
-    #                                     # Remove any completely empty rows
-    #                                     df = df.dropna(how='all')
-                                        
-    #                                     logging.info(f"✅ Data processing complete. Final dataset has {len(df)} rows")
-    #                                     logging.info(f"Date range in data: {df['Date'].min()} to {df['Date'].max()}")
-                                        
-    #                                     return df
-    #                                 else:
-    #                                     logging.warning("CSV data is empty")
-                                        
-    #                             except Exception as csv_error:
-    #                                 logging.error(f"Error parsing CSV data: {str(csv_error)}")
-    #                                 # Fallback: save raw response for debugging
-    #                                 with open(f"debug_csv_{scrip_dict['id']}.txt", "w", encoding="utf-8") as f:
-    #                                     f.write(final_response.text)
-    #                                 logging.info("Raw CSV response saved for debugging")
-                            
-    #                         else:
-    #                             logging.info("Response is HTML, attempting to parse tables...")
-                                
-    #                             # Parse the response as HTML (fallback)
-    #                             final_soup = BeautifulSoup(final_response.text, "html.parser")
-                                
-    #                             # Find the data table - look for table with historical data
-    #                             data_table = None
-    #                             tables = final_soup.find_all("table")
-                                
-    #                             for table in tables:
-    #                                 table_text = table.get_text()
-    #                                 if "Date" in table_text and ("Open" in table_text or "Close" in table_text):
-    #                                     # Check if this table has actual data rows
-    #                                     data_rows = table.find_all("tr")
-    #                                     if data_rows:
-    #                                         data_table = table
-    #                                         break
-                                
-    #                             if data_table:
-    #                                 logging.info("✅ Found the target data table in HTML")
-                                    
-    #                                 # Extract headers
-    #                                 headers = []
-    #                                 header_rows = data_table.find_all("tr")
-                                    
-    #                                 for row in header_rows:
-    #                                     header_cells = row.find_all("td", class_="innertable_header1")
-    #                                     if header_cells:
-    #                                         headers = [cell.get_text(strip=True).replace('\n', ' ') for cell in header_cells]
-    #                                         headers.remove("* Spread")
-    #                                         break
-                                    
-    #                                 if not headers:
-    #                                     # Fallback header extraction
-    #                                     headers = None
-                                    
-    #                                 logging.info(f"Headers extracted: {headers}")
-                                    
-    #                                 # Extract data rows
-    #                                 data_rows = data_table.find_all("tr", class_="TTRow")
-    #                                 all_data = []
-                                    
-    #                                 for row in data_rows:
-    #                                     cols = row.find_all("td")
-    #                                     if len(cols) >= 5:  # Ensure we have enough columns
-    #                                         row_data = [col.get_text(strip=True) for col in cols]
-    #                                         all_data.append(row_data)
-                                    
-    #                                 if all_data:
-    #                                     logging.info(f"✅ Extracted {len(all_data)} data rows from HTML")
-    #                                     # Create DataFrame
-    #                                     df = pd.DataFrame(all_data, columns=headers)
-    #                                     # Clean and process the data
-    #                                     if 'Date' in df.columns:
-    #                                         # Convert date column to datetime
-    #                                         df['Date'] = pd.to_datetime(df['Date'], format='%d/%m/%Y', errors='coerce')
-                                            
-    #                                         # Filter data to requested date range
-    #                                         df = df[
-    #                                             (df['Date'] >= start_date_obj) & 
-    #                                             (df['Date'] <= end_date_obj)
-    #                                         ]
-                                            
-    #                                         # Sort by date
-    #                                         df = df.sort_values('Date')
-                                        
-    #                                     # Convert numeric columns
-    #                                     for col in keep_cols:
-    #                                         if col in df.columns:
-    #                                             df[col] = pd.to_numeric(df[col].str.replace(',', ''), errors='coerce')
-                                        
-    #                                     # Add symbol information
-    #                                     df['Symbol'] = scrip_dict.get('description', 'Unknown')
-    #                                     df['ScripCode'] = scrip_dict['id']
-                                        
-    #                                     logging.info(f"✅ Data processing complete. Final dataset has {len(df)} rows")
-    #                                     return df
-                                    
-    #                                 else:
-    #                                     logging.warning("No data rows found in the HTML table")
-                                
-    #                             else:
-    #                                 logging.warning("Could not find data table in HTML response")
-    #                                 # Debug: Save response to file for inspection
-    #                                 with open(f"debug_response_{scrip_dict['id']}.html", "w", encoding="utf-8") as f:
-    #                                     f.write(final_response.text)
-    #                                 logging.info("Response saved to debug file for inspection")
-                        
-    #                     else:
-    #                         logging.warning(f"Final request failed with status code {final_response.status_code}")
-    #                         if final_response.status_code == 403:
-    #                             logging.info("Access forbidden - refreshing cookies...")
-    #                             self.cookies = self.fetch_cookies()
-                            
-    #                 else:
-    #                     logging.warning(f"Initial request failed with status code {get_response.status_code}")
-    #                     if get_response.status_code == 403:
-    #                         logging.info("Access forbidden - refreshing cookies...")
-    #                         self.cookies = self.fetch_cookies()
-            
-    #         except Exception as e:
-    #             logging.error(f"Attempt {attempt + 1} failed with error: {str(e)}")
-    #             if attempt < self.max_retries - 1:
-    #                 logging.info("Retrying after delay...")
-    #                 time.sleep(5)
-    #             else:
-    #                 logging.error("All retry attempts exhausted")
-    #                 raise
-        
-    #     logging.error("Failed to fetch data after all attempts")
-    #     return None
-        
-        
+    def fetch_bhavcopy(self, day, directory):
+        """
+        Save day's bhavcopy archive into directory under NSE's file name. Returns
+        its path, "" when NSE has none for the day (a holiday), or None when the
+        download failed.
+        """
+        url = bhavcopy_url(day)
+        path = os.path.join(directory, bhavcopy_name(day))
+        limiter = get_limiter(url)
+
+        for attempt in range(self.max_retries):
+            try:
+                limiter.acquire()
+                with self.pool.session() as s:
+                    response = s.get(url, headers=get_headers(), timeout=60)
+                limiter.feedback(response.status_code, retry_after_seconds(response))
+
+                if response.status_code == 200:
+                    with open(f"{path}.part", "wb") as f:
+                        f.write(response.content)
+                    os.replace(f"{path}.part", path)
+                    return path
+                if response.status_code == 404:
+                    logging.info(f"No bhavcopy for {day}")
+                    return ""
+                logging.warning(f"Bhavcopy for {day} failed with status code {response.status_code}")
+
+            except Exception as e:
+                logging.error(f"Bhavcopy for {day} (attempt {attempt + 1}) failed: {e}")
+
+        return None
+
+    def download_bhavcopies(self, start_date, end_date, directory, max_workers: int = 4) -> dict:
+        """
+        Fill directory with the daily bhavcopy archives of start_date..end_date,
+        one request per weekday; archives already there are not downloaded again.
+        ingest_bhavcopies then loads the directory.
+
+        Returns:
+            dict: downloaded and already present archives, holidays and failed dates
+        """
+        os.makedirs(directory, exist_ok=True)
+        start = datetime.strptime(start_date, "%Y-%m-%d").date()
+        end = min(datetime.strptime(end_date, "%Y-%m-%d").date(), date.today())
+        days = [start + timedelta(days=i) for i in range((end - start).days + 1)]
+        days = [day for day in days if day.weekday() < 5]
+
+        summary = {"downloaded": 0, "present": 0, "holidays": 0, "failed": []}
+        missing = []
+        for day in days:
+            if os.path.exists(os.path.join(directory, bhavcopy_name(day))):
+                summary["present"] += 1
+            else:
+                missing.append(day)
+
+        for day, path in stream_map(lambda day: self.fetch_bhavcopy(day, directory), missing, max_workers):
+            if path:
+                summary["downloaded"] += 1
+            elif path == "":
+                summary["holidays"] += 1
+            else:
+                summary["failed"].append(day.isoformat())
+
+        summary["failed"].sort()
+        if summary["failed"]:
+            logging.warning(f"No bhavcopy could be downloaded for {summary['failed']}")
+        return summary
+
+    @staticmethod
+    def ingest_bhavcopies(paths, store=None, flush_days: int = bhavcopy_flush_days) -> dict:
+        """
+        Load bhavcopy files (a directory or an iterable of paths) into per-symbol
+        column files in one pass, oldest date first.
+
+        Files are read one at a time and their rows appended to each symbol's
+        columns every flush_days dates, so memory holds at most flush_days files'
+        rows. Dates the store already holds are skipped, so a run that stopped (or
+        a directory that gained new files) picks up where the store left off.
+
+        Returns:
+            dict: dates loaded, rows appended, symbols in the store
+        """
+        store = get_bhavcopy_store() if store is None else store
+        summary = {"dates": 0, "rows": 0}
+        buffered, days = [], []
+
+        def flush():
+            rows = pd.concat(buffered, ignore_index=True)
+            isins = rows.drop_duplicates("Symbol", keep="last").set_index("Symbol")["ISIN"]
+            store.append(rows, "Symbol", [day.isoformat() for day in days],
+                         meta={symbol: {"ISIN": isin} for symbol, isin in isins.items()})
+            logging.info(f"Appended bhavcopies {days[0]} to {days[-1]}: {len(rows)} rows, {len(isins)} symbols")
+            summary["dates"] += len(days)
+            summary["rows"] += len(rows)
+            buffered.clear()
+            days.clear()
+
+        for day, df in iter_bhavcopies(paths, skip=lambda day: store.done(day.isoformat())):
+            buffered.append(df)
+            days.append(day)
+            if len(days) >= flush_days:
+                flush()
+        if days:
+            flush()
+
+        summary["symbols"] = len(store)
+        return summary
+
+    @staticmethod
+    def bhavcopy_panel(symbols=None, start_date=None, end_date=None, fields=panel_fields, store=None) -> pd.DataFrame:
+        """
+        Date-aligned panel of loaded bhavcopies, shaped like download_many's:
+        columns (field, Symbol) for each field. Every stored symbol unless symbols is given.
+
+        Returns:
+            pandas.DataFrame: Date index, columns (field, Symbol) for each field
+        """
+        store = get_bhavcopy_store() if store is None else store
+        start = pd.Timestamp(start_date) if start_date else None
+        end = pd.Timestamp(end_date) if end_date else None
+
+        columns = {}
+        for symbol in symbols or store.keys():
+            df = store.read(symbol, ["Date", *fields], order_by="Date")
+            if start is not None:
+                df = df[df["Date"] >= start]
+            if end is not None:
+                df = df[df["Date"] <= end]
+            for field in fields:
+                columns[(field, symbol)] = pd.Series(df[field].to_numpy(), index=df["Date"].to_numpy())
+
+        if not columns:
+            return pd.DataFrame(columns=pd.MultiIndex.from_tuples([], names=["field", *panel_id_cols]))
+        panel = pd.concat(columns, axis=1).sort_index()
+        panel = panel[[(field, symbol) for field in fields for symbol in dict.fromkeys(key[1] for key in columns)]]
+        panel.columns.names = ["field", *panel_id_cols]
+        panel.index.name = "Date"
+        return panel
+
+    @staticmethod
+    def date_windows(start_date, end_date, window_days: int = history_window_days):
+        """Split start_date..end_date (inclusive) into consecutive windows of at most window_days days."""
+        start = datetime.strptime(start_date, "%Y-%m-%d")
+        end = datetime.strptime(end_date, "%Y-%m-%d")
+        windows = []
+        while start <= end:
+            stop = min(start + timedelta(days=window_days - 1), end)
+            windows.append((start, stop))
+            start = stop + timedelta(days=1)
+        return windows
+
+    @staticmethod
+    def parse_history(data, symbol):
+        """Turn one window of the historical API into a frame with the history_columns names."""
+        if not isinstance(data, dict) or "data" not in data:
+            logging.warning(f"Unexpected historical data structure: {str(data)[:200]}")
+            return None
+
+        df = pd.DataFrame(data["data"])
+        if df.empty:
+            df = pd.DataFrame(columns=list(history_columns))
+        df = df[[col for col in history_columns if col in df.columns]].rename(columns=history_columns)
+        df["Date"] = pd.to_datetime(df["Date"], format="%Y-%m-%d")
+        df["Symbol"] = symbol
+        return df
+
+    def fetch_window(self, scrip_dict, start, end):
+        """One window of history, or None once every attempt failed."""
+        symbol = scrip_dict.get("symbol", scrip_dict["id"])
+        params = {
+            "symbol": symbol,
+            "series": json.dumps(history_series),
+            "from": start.strftime("%d-%m-%Y"),
+            "to": end.strftime("%d-%m-%Y"),
+        }
+        headers = get_history_headers(symbol)
+        limiter = get_limiter(HISTORICAL_DATA_URL)
+
+        for attempt in range(self.max_retries):
+            try:
+                limiter.acquire()
+                with self.pool.session() as s:
+                    s.headers.update(headers)
+                    cookies = self.cookies
+                    s.cookies.update(cookies)
+                    response = s.get(HISTORICAL_DATA_URL, params=params, timeout=30)
+                limiter.feedback(response.status_code, retry_after_seconds(response))
+
+                if response.status_code == 200:
+                    return self.parse_history(response.json(), symbol)
+
+                elif response.status_code in (401, 403):
+                    # NSE answers 401 once its session cookies lapse
+                    logging.warning(f"Status {response.status_code} - refreshing cookies and retrying...")
+                    self.get_cookies(stale=cookies)
+
+                else:
+                    logging.error(f"Failed to fetch {symbol} {params['from']} to {params['to']}. Status: {response.status_code}")
+                    logging.error(f"Response: {response.text[:500]}")
+
+            except Exception as e:
+                logging.error(f"Error fetching {symbol} {params['from']} to {params['to']} (attempt {attempt + 1}): {e}")
+
+        return None
+
+    def download_data(self, scrip_dict, start_date, end_date):
+        """
+        Fetch historical data for a symbol between specified dates.
+
+        The API only serves window_days at a time, so the range is split into
+        windows that are fetched concurrently and stitched into one frame in date
+        order, deduplicated on Date (a day served by two windows keeps the later
+        window's row).
+
+        All or nothing: if any window fails, the windows already fetched are
+        dropped and None is returned, so request_data caches nothing for the
+        range and a retry fetches every window again. A partial history is never
+        stored as covering the whole range.
+        """
+        if not self.cookies:
+            self.get_cookies()
+
+        symbol = scrip_dict.get("symbol", scrip_dict["id"])
+        windows = self.date_windows(start_date, end_date, self.window_days)
+        logging.info(f"Fetching data for {symbol} in {len(windows)} windows")
+
+        frames = {}
+        fetch = lambda window: self.fetch_window(scrip_dict, *window)
+        for (start, end), df in stream_map(fetch, windows, self.window_workers):
+            if df is None:
+                logging.error(f"Window {start:%Y-%m-%d} to {end:%Y-%m-%d} failed for {symbol}")
+                return None
+            frames[start] = df
+
+        # Windows finish in any order; stitch them in date order so the dedup below is deterministic
+        df = pd.concat([frames[start] for start, _ in windows] or [self.parse_history({"data": []}, symbol)],
+                       ignore_index=True)
+        df = df.drop_duplicates(subset="Date", keep="last").sort_values("Date").reset_index(drop=True)
+        if "ISIN" in df.columns and df["ISIN"].notna().any():
+            # The history carries the ISIN the search results lack: link the symbol to it
+            remember([{**scrip_dict, "isin": df["ISIN"].dropna().iloc[-1]}], self.source)
+        logging.info(f"Successfully fetched {len(df)} rows for {symbol}")
+        return df
+
 
-start_date = "2025-05-23"
-end_date = "2025-06-23"
+if __name__ == "__main__":
+    start_date = "2025-05-23"
+    end_date = "2025-06-23"
 
-instance = nse_scraper()
-# sample = {'description': 'RELIANCE INDUSTRIES LTD', 'isin': 'INE002A01018', 'id': '500325'}
-dict = instance.fetch_search_results("Reliance")
-print(dict)
-# df = instance.request_data(sample, start_date, end_date)
-# df.to_excel("prices.xlsx")
\ No newline at end of file
+    instance = nse_scraper()
+    # sample = {'description': 'RELIANCE INDUSTRIES LTD', 'isin': 'INE002A01018', 'id': '500325'}
+    results = instance.fetch_search_results("Reliance")
+    print(results)
+    # df = instance.request_data(sample, start_date, end_date)
+    # df.to_excel("prices.xlsx")
@@ -1,6 +1,6 @@
 
-HOME_URL = "httpshttps://www.nseindia.com/"
-HISTORICAL_DATA_URL = "https://www.bseindia.com/markets/equity/EQReports/StockPrcHistori.aspx"
+HOME_URL = "https://www.nseindia.com/"
+HISTORICAL_DATA_URL = "https://www.nseindia.com/api/historical/cm/equity"
 
 SEARCH_URL = "https://www.nseindia.com/api/NextApi/search/autocomplete"
 
@@ -11,8 +11,56 @@ user_agents = [
     # Add more recent versions if needed
             ]
 
-delay_range = (2, 5)
+# Token-bucket limits per host: (requests per second, burst, max requests per second)
+rate_limits = {
+    "www.nseindia.com": (1.0, 3, 3.0),
+    "nsearchives.nseindia.com": (1.0, 3, 3.0),
+}
 
 max_attempts = 3
 
-keep_cols = [['Open', 'High', 'Low', 'Close', 'Volume']]
\ No newline at end of file
+# Seconds fetched cookies are reused when the site sets no earlier expiry
+cookie_ttl = 30 * 60
+
+keep_cols = ['Open', 'High', 'Low', 'Close', 'Volume']
+
+# The historical API refuses ranges longer than this many days, so longer
+# downloads are split into windows, fetched this many at a time
+history_window_days = 365
+history_window_workers = 4
+
+history_series = ["EQ"]
+
+# Historical API fields and the column names downloads are returned with
+history_columns = {
+    "CH_TIMESTAMP": "Date",
+    "CH_OPENING_PRICE": "Open",
+    "CH_TRADE_HIGH_PRICE": "High",
+    "CH_TRADE_LOW_PRICE": "Low",
+    "CH_CLOSING_PRICE": "Close",
+    "CH_LAST_TRADED_PRICE": "Last",
+    "CH_PREVIOUS_CLS_PRICE": "Prevclose",
+    "VWAP": "VWAP",
+    "CH_TOT_TRADED_QTY": "Volume",
+    "CH_TOT_TRADED_VAL": "Turnover",
+    "CH_TOTAL_TRADES": "Trades",
+    "CH_SERIES": "Series",
+    "CH_ISIN": "ISIN",
+}
+
+# Fields and identifiers of the Date-aligned panel returned by download_many
+panel_fields = ['Close', 'Volume']
+panel_id_cols = ['Symbol']
+# Daily capital-market bhavcopy archives: every security's prices for one
+# trading day in one file. UDiFF CSVs from udiff_start on, legacy cm...bhav CSVs before
+BHAVCOPY_URLS = {
+    "udiff": "https://nsearchives.nseindia.com/content/cm/{name}",
+    "legacy": "https://nsearchives.nseindia.com/content/historical/EQUITIES/{day:%Y}/{month}/{name}",
+}
+udiff_start = "2024-07-08"
+
+# Series kept from a bhavcopy, in order of preference when a symbol trades in several
+bhavcopy_series = ["EQ", "BE", "BZ"]
+
+# Bhavcopies read before their rows are appended to the per-symbol column files
+bhavcopy_flush_days = 20
@@ -0,0 +1,129 @@
+"""
+Reader for NSE's daily capital-market bhavcopy archives: every security's
+prices for one trading day in one file. NSE has published two layouts:
+
+- UDiFF (from udiff_start): BhavCopy_NSE_CM_0_0_0_<yyyymmdd>_F_0000.csv(.zip),
+  with ISO 20022 column names (TckrSymb, SctySrs, OpnPric, TtlTradgVol, ...).
+- Legacy (before): cm<ddMONyyyy>bhav.csv(.zip), with SYMBOL, SERIES, OPEN,
+  TOTTRDQTY, TIMESTAMP, ...
+
+Either is read into the history_columns names the historical API downloads
+use, one row per symbol: the first of the wanted series it traded in that day.
+"""
+import glob
+import io
+import os
+import re
+import zipfile
+from datetime import date, datetime
+from typing import Iterable, Iterator, Optional
+
+import pandas as pd
+
+from investoscrapo.configs.constants import cache_dir
+from investoscrapo.utils.column_store import ColumnStore
+from nse_scraper.nsescraper.configs.constants import BHAVCOPY_URLS, bhavcopy_series, udiff_start
+
+COLUMNS = ["Date", "Open", "High", "Low", "Close", "Last", "Prevclose", "Volume", "Turnover", "Trades"]
+
+# numpy dtypes of COLUMNS in a ColumnStore
+SCHEMA = {"Date": "<M8[D]", "Open": "<f8", "High": "<f8", "Low": "<f8", "Close": "<f8", "Last": "<f8",
+          "Prevclose": "<f8", "Volume": "<i8", "Turnover": "<f8", "Trades": "<i8"}
+
+# Bhavcopy column -> history_columns name, per layout
+LAYOUTS = {
+    "udiff": {"TradDt": "Date", "TckrSymb": "Symbol", "SctySrs": "Series", "ISIN": "ISIN", "OpnPric": "Open",
+              "HghPric": "High", "LwPric": "Low", "ClsPric": "Close", "LastPric": "Last",
+              "PrvsClsgPric": "Prevclose", "TtlTradgVol": "Volume", "TtlTrfVal": "Turnover",
+              "TtlNbOfTxsExctd": "Trades"},
+    "legacy": {"TIMESTAMP": "Date", "SYMBOL": "Symbol", "SERIES": "Series", "ISIN": "ISIN", "OPEN": "Open",
+               "HIGH": "High", "LOW": "Low", "CLOSE": "Close", "LAST": "Last", "PREVCLOSE": "Prevclose",
+               "TOTTRDQTY": "Volume", "TOTTRDVAL": "Turnover", "TOTALTRADES": "Trades"},
+}
+
+DATE_FORMATS = {"udiff": "%Y-%m-%d", "legacy": "%d-%b-%Y"}
+
+FILE_DATES = [
+    (re.compile(r"BhavCopy_NSE_CM_0_0_0_(\d{8})_F_0000\.csv(\.zip)?$", re.IGNORECASE), "%Y%m%d"),
+    (re.compile(r"cm(\d{2}[A-Z]{3}\d{4})bhav\.csv(\.zip)?$", re.IGNORECASE), "%d%b%Y"),
+]
+
+
+def bhavcopy_format(day: date) -> str:
+    """The layout NSE published day's bhavcopy in: "udiff" or "legacy"."""
+    return "udiff" if day.isoformat() >= udiff_start else "legacy"
+
+
+def bhavcopy_name(day: date) -> str:
+    """The archive name NSE published day's bhavcopy under."""
+    if bhavcopy_format(day) == "udiff":
+        return f"BhavCopy_NSE_CM_0_0_0_{day:%Y%m%d}_F_0000.csv.zip"
+    return f"cm{day:%d}{day.strftime('%b').upper()}{day:%Y}bhav.csv.zip"
+
+
+def bhavcopy_url(day: date) -> str:
+    return BHAVCOPY_URLS[bhavcopy_format(day)].format(day=day, month=day.strftime("%b").upper(),
+                                                      name=bhavcopy_name(day))
+
+
+def bhavcopy_date(path: str) -> Optional[date]:
+    """The trading day in a bhavcopy's file name, or None if the name is not a bhavcopy's."""
+    name = os.path.basename(path)
+    for pattern, fmt in FILE_DATES:
+        match = pattern.search(name)
+        if match:
+            return datetime.strptime(match.group(1).title(), fmt).date()
+    return None
+
+
+def find_bhavcopies(paths) -> list[tuple[date, str]]:
+    """(day, path) of every bhavcopy in a directory or an iterable of paths, oldest first."""
+    if isinstance(paths, (str, os.PathLike)):
+        paths = glob.glob(os.path.join(paths, "*"))
+    found = [(bhavcopy_date(path), path) for path in paths]
+    return sorted((day, path) for day, path in found if day is not None)
+
+
+def read_bhavcopy(content: bytes, series: Iterable[str] = bhavcopy_series) -> pd.DataFrame:
+    """One day's bhavcopy (CSV, or the zip holding it) as Symbol, ISIN and COLUMNS, one row per symbol."""
+    if content[:2] == b"PK":
+        with zipfile.ZipFile(io.BytesIO(content)) as archive:
+            content = archive.read(archive.namelist()[0])
+
+    df = pd.read_csv(io.BytesIO(content), skipinitialspace=True)
+    df.columns = df.columns.str.strip()
+    layout = next((name for name, columns in LAYOUTS.items() if set(columns) <= set(df.columns)), None)
+    if layout is None:
+        raise ValueError(f"Unrecognised bhavcopy columns: {list(df.columns)[:10]}")
+    df = df[list(LAYOUTS[layout])].rename(columns=LAYOUTS[layout])
+
+    # One row per symbol: the first wanted series it traded in
+    series = list(series)
+    df["Series"] = df["Series"].str.strip()
+    df = df[df["Series"].isin(series)]
+    df = (df.assign(rank=df["Series"].map({name: i for i, name in enumerate(series)}))
+            .sort_values("rank", kind="stable")
+            .drop_duplicates("Symbol")
+            .drop(columns=["rank", "Series"]))
+
+    df["Symbol"] = df["Symbol"].str.strip()
+    df["ISIN"] = df["ISIN"].str.strip()
+    df["Date"] = pd.to_datetime(df["Date"].str.strip(), format=DATE_FORMATS[layout])
+    for col in COLUMNS[1:]:
+        df[col] = pd.to_numeric(df[col], errors="coerce")
+    df[["Volume", "Trades"]] = df[["Volume", "Trades"]].fillna(0)
+    return df[["Symbol", "ISIN", *COLUMNS]].reset_index(drop=True)
+
+
+def get_bhavcopy_store(root: Optional[str] = None) -> ColumnStore:
+    """The per-symbol column store bhavcopies are loaded into (under cache_dir unless root is given)."""
+    return ColumnStore(root or os.path.join(cache_dir, "nse_bhavcopy"), SCHEMA)
+
+
+def iter_bhavcopies(paths, series: Iterable[str] = bhavcopy_series, skip=None) -> Iterator[tuple[date, pd.DataFrame]]:
+    """Yield (day, read_bhavcopy frame) one file at a time, oldest first; skip(day) -> True leaves a file out."""
+    for day, path in find_bhavcopies(paths):
+        if skip is not None and skip(day):
+            continue
+        with open(path, "rb") as f:
+            yield day, read_bhavcopy(f.read(), series)
@@ -0,0 +1,102 @@
+import random
+import threading
+import time
+from datetime import datetime
+
+import pandas as pd
+import pytest
+
+from investoscrapo.utils.cache import HistoricalCache
+from nse_scraper.NSE_Client import nse_scraper
+
+SCRIP = {"id": "TCS", "symbol": "TCS"}
+
+
+class Client(nse_scraper):
+    """An nse_scraper whose windows come from a stub; (symbol, window start) pairs in fail fail that many times."""
+
+    def __init__(self, fail=None, cache=None, **kwargs):
+        super().__init__(use_cache=False, **kwargs)
+        self.cookies = {"nsit": "test"}
+        self.cache = cache
+        self.fail = dict(fail or {})
+        self.windows = []
+        self._lock = threading.Lock()
+
+    def fetch_window(self, scrip_dict, start, end):
+        key = (scrip_dict["symbol"], f"{start:%Y-%m-%d}")
+        with self._lock:
+            self.windows.append(key)
+            failing = self.fail.get(key, 0)
+            if failing:
+                self.fail[key] = failing - 1
+        # Finish out of order
+        time.sleep(random.uniform(0, 0.02))
+        if failing:
+            return None
+        # Each window also repeats the day before it, as overlapping API pages would
+        dates = pd.date_range(start - pd.Timedelta(days=1), end)
+        return pd.DataFrame({"Date": dates, "Close": float(start.day), "Volume": 10.0, "Symbol": scrip_dict["symbol"]})
+
+
+def spans(windows):
+    return [(f"{start:%Y-%m-%d}", f"{end:%Y-%m-%d}") for start, end in windows]
+
+
+@pytest.mark.parametrize("start, end, expected", [
+    ("2023-01-01", "2023-12-31", [("2023-01-01", "2023-12-31")]),
+    ("2024-01-01", "2024-12-31", [("2024-01-01", "2024-12-30"), ("2024-12-31", "2024-12-31")]),
+    ("2024-03-05", "2024-03-05", [("2024-03-05", "2024-03-05")]),
+    ("2024-03-05", "2024-03-04", []),
+])
+def test_windows_split_at_365_days(start, end, expected):
+    assert spans(nse_scraper.date_windows(start, end)) == expected
+
+
+def test_windows_are_consecutive_and_cover_the_range():
+    windows = nse_scraper.date_windows("2015-02-10", "2024-07-01", window_days=100)
+    assert windows[0][0] == datetime(2015, 2, 10) and windows[-1][1] == datetime(2024, 7, 1)
+    for (_, stop), (start, _) in zip(windows, windows[1:]):
+        assert (start - stop).days == 1
+    assert all((stop - start).days < 100 for start, stop in windows)
+
+
+@pytest.mark.parametrize("attempt", range(5))
+def test_windows_are_stitched_in_date_order_without_duplicates(attempt):
+    client = Client(window_days=30, window_workers=5)
+    df = client.download_data(SCRIP, "2024-01-01", "2024-04-30")
+
+    assert len(client.windows) == 5
+    assert df["Date"].is_monotonic_increasing and df["Date"].is_unique
+    assert df["Date"].iloc[0] == pd.Timestamp("2023-12-31") and df["Date"].iloc[-1] == pd.Timestamp("2024-04-30")
+    # A day served by two windows keeps the later window's row, whichever window finished first
+    assert df.loc[df["Date"] == "2024-01-30", "Close"].item() == 31.0
+    assert df.loc[df["Date"] == "2024-04-29", "Close"].item() == 30.0
+
+
+def test_empty_range_gives_an_empty_frame():
+    df = Client().download_data(SCRIP, "2024-03-05", "2024-03-04")
+    assert df.empty and {"Date", "Close", "Symbol"} <= set(df.columns)
+
+
+def test_one_failed_window_fails_the_whole_range(tmp_path):
+    cache = HistoricalCache(str(tmp_path / "history.sqlite"))
+    client = Client(fail={("TCS", "2024-01-31"): 1}, cache=cache, window_days=30)
+
+    assert client.request_data(SCRIP, "2024-01-01", "2024-04-30") is None
+    # Nothing is cached, so the next request fetches every window again
+    assert cache.missing_ranges("nse", "TCS", "2024-01-01", "2024-04-30") == [("2024-01-01", "2024-04-30")]
+    assert client.request_data(SCRIP, "2024-01-01", "2024-04-30") is not None
+    assert len(client.windows) == 10
+
+
+def test_download_many_retries_failed_symbols_and_leaves_out_the_rest():
+    client = Client(fail={("TCS", "2024-01-31"): 1, ("INFY", "2024-01-01"): 5}, window_days=30)
+    panel = client.download_many([{"id": "TCS", "symbol": "TCS"}, {"id": "INFY", "symbol": "INFY"}],
+                                 "2024-01-01", "2024-02-15", retries=2)
+
+    assert panel.columns.get_level_values("Symbol").unique().tolist() == ["TCS"]
+    assert panel.index[0] == pd.Timestamp("2023-12-31") and panel.index[-1] == pd.Timestamp("2024-02-15")
+    # TCS: both windows, then both again in the first retry; INFY: every round, then given up
+    assert sum(symbol == "TCS" for symbol, _ in client.windows) == 4
+    assert client.windows.count(("INFY", "2024-01-01")) == 3
@@ -0,0 +1,234 @@
+"""
+One search entry point for every source the app offers.
+
+Answers are memoized per (source, normalized query) in an LRU cache with a TTL,
+so a query typed again is answered without a request, and identical queries
+running at the same time share a single request. search_all queries several
+sources in parallel and merges their standardized results. resolve_many
+turns a whole watchlist of names into one best listing each.
+"""
+import re
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import Optional
+
+import pandas as pd
+
+from investoscrapo.configs.constants import (resolve_exchanges, resolve_min_match, resolve_types, resolve_workers,
+                                             search_cache_size, search_cache_ttl)
+from investoscrapo.utils.logger import get_logger
+from investoscrapo.utils.memo import Memo
+from investoscrapo.utils.streaming import stream_map
+from investoscrapo.utils.symbol_master import get_symbol_master, name_key, normalize, trigrams
+from source_clients import get_client
+
+logger = get_logger(__name__)
+
+SOURCES = ("nse", "bse", "yahoo", "investing")
+
+RESOLVED_COLUMNS = ["query", "id", "symbol", "description", "exchange", "type", "isin", "score", "match", "via"]
+
+# Name match at or above which a symbol master hit on a preferred exchange and type is taken without searching
+confident_match = 0.95
+
+
+def normalize_query(query: str) -> str:
+    return re.sub(r"\s+", " ", query).strip().casefold()
+
+
+def standardize_bse(bse_results) -> list[dict]:
+    """BSE suggestions in the shared result format (id, description, symbol, exchange, type)."""
+    standardized_results = []
+    for item in bse_results:
+        if item["description"] == "No Match Found":
+            break
+        standardized_results.append({
+            'id': item.get('id', 'N/A'),  # BSE scrip code
+            'description': item.get('description', 'N/A'),
+            'symbol': item.get('id', 'N/A'),  # Using BSE scrip code as symbol
+            'exchange': 'BSE',
+            'type': 'Stock - BSE',
+            'isin': item.get('isin', 'N/A')  # Keep ISIN for reference
+        })
+    return standardized_results
+
+
+def score_match(query: str, result: dict, exchanges=resolve_exchanges, types=resolve_types) -> tuple[float, float]:
+    """
+    (score, match) of a search result for query. match rates the name alone: 1
+    for the exact symbol, 0.95 for the same company name, 0.8 for a name that
+    starts with the query, otherwise 0.75 times their trigram overlap. score adds
+    a bonus for a preferred exchange (more for earlier ones) and type, and takes
+    as much off when a preference is given but not met.
+    """
+    q, key = normalize(query), name_key(query)
+    name = name_key(result.get("description") or "")
+    if q and q in (normalize(result.get("symbol") or ""), normalize(result.get("id") or "")):
+        match = 1.0
+    elif key and key == name:
+        match = 0.95
+    elif key and name.startswith(key):
+        match = 0.8
+    else:
+        a, b = trigrams(key or q), trigrams(name)
+        match = 0.75 * 2 * len(a & b) / (len(a) + len(b)) if a and b else 0.0
+
+    score = match
+    if exchanges:
+        exchange = str(result.get("exchange") or "").upper()
+        ranks = [i for i, preferred in enumerate(exchanges) if preferred.upper() == exchange]
+        score += 0.2 / (1 + ranks[0]) if ranks else -0.2
+    if types:
+        kind = str(result.get("type") or "").casefold()
+        score += 0.1 if any(preferred.casefold() in kind for preferred in types) else -0.1
+    return score, match
+
+
+def to_scrip_dicts(table: pd.DataFrame) -> list[dict]:
+    """The resolved rows of a resolve_many table as the scrip dicts Download_Historical and download_many take."""
+    resolved = table[table["id"].notna()]
+    return resolved[["id", "symbol", "description", "exchange", "type", "isin"]].to_dict("records")
+
+
+class SearchService():
+    """
+    Memoized search over NSE, BSE, Yahoo Finance and Investing.com.
+
+    Clients can be passed in to share their sessions and cookies; any that are
+    not come from source_clients. Every live answer is also recorded in the
+    symbol master, which lookup() searches without a network call.
+    """
+
+    def __init__(self, investing=None, bse=None, nse=None, maxsize: int = search_cache_size,
+                 ttl: float = search_cache_ttl, master=None):
+        self.clients = {"investing": investing, "bse": bse, "nse": nse}
+        self.memo = Memo(maxsize, ttl)
+        self.master = master
+        self._executor = ThreadPoolExecutor(max_workers=len(SOURCES), thread_name_prefix="search")
+
+    def client(self, source: str):
+        return self.clients.get(source) or get_client(source)
+
+    def fetch(self, source: str, query: str) -> Optional[list[dict]]:
+        """Uncached search of one source, in the shared result format; None when the source failed."""
+        if source == "yahoo":
+            from yfin_search import yahoo_finance_search
+            return yahoo_finance_search(query)
+        elif source == "investing":
+            return self.client("investing").Search(query)
+        elif source == "bse":
+            results = self.client("bse").fetch_search_results(query)
+            return None if results is None else standardize_bse(results)
+        elif source == "nse":
+            return self.client("nse").fetch_search_results(query)
+        raise ValueError(f"Unknown search source: {source!r}")
+
+    def _fetch_and_record(self, source: str, query: str):
+        results = self.fetch(source, query)
+        # The clients record their answers in the shared master themselves; only a master passed in needs them here
+        if results and self.master is not None:
+            try:
+                self.master.add(results, source)
+            except Exception as e:
+                logger.warning(f"Could not record {source} results in the symbol master: {e}")
+        return results
+
+    def search(self, source: str, query: str) -> list[dict]:
+        """Search one source, answering from the cache when the same query was seen within the TTL."""
+        key = (source, normalize_query(query))
+        if not key[1]:
+            return []
+        return self.memo.get_or_call(key, lambda: self._fetch_and_record(source, query.strip())) or []
+
+    def lookup(self, query: str, source: Optional[str] = None, limit: int = 10) -> list[dict]:
+        """Offline search of every instrument seen so far (see investoscrapo.utils.symbol_master)."""
+        return (self.master if self.master is not None else get_symbol_master()).lookup(query, source, limit)
+
+    def search_all(self, query: str, sources=SOURCES, timeout: Optional[float] = None) -> list[dict]:
+        """
+        Search several sources in parallel and merge the results, each tagged with
+        its 'source', in the order of sources. A source that fails, or is still
+        running after timeout seconds, contributes nothing (its answer is still
+        cached when it arrives).
+        """
+        futures = {source: self._executor.submit(self.search, source, query) for source in sources}
+        wait(futures.values(), timeout=timeout)
+
+        merged = []
+        for source, future in futures.items():
+            if not future.done():
+                # Not started yet: drop it; already running: let it finish into the cache
+                future.cancel()
+                logger.warning(f"Search of {source} for {query!r} timed out")
+                continue
+            try:
+                results = future.result()
+            except Exception as e:
+                logger.error(f"Search of {source} for {query!r} failed: {e}")
+                continue
+            merged += [{**result, "source": source} for result in results]
+        return merged
+
+    def _best_match(self, name: str, source: str, exchanges, types, offline: bool):
+        """(score, match, result, via) of the best listing of name on source, or None."""
+        best = None
+
+        def consider(results, via):
+            nonlocal best
+            for result in results:
+                score, match = score_match(name, result, exchanges, types)
+                if best is None or score > best[0]:
+                    best = (score, match, result, via)
+
+        if offline:
+            consider(self.lookup(name, source), "master")
+            # score >= match: no exchange or type preference was missed
+            if best and best[1] >= confident_match and best[0] >= best[1]:
+                return best
+        try:
+            consider(self.search(source, name), "search")
+        except Exception as e:
+            logger.warning(f"Search of {source} for {name!r} failed: {e}")
+        return best
+
+    def resolve_many(self, names, source: str = "investing", exchanges=resolve_exchanges, types=resolve_types,
+                     min_match: float = resolve_min_match, max_workers: int = resolve_workers,
+                     offline: bool = True) -> pd.DataFrame:
+        """
+        Best listing on source for each of names (company names or symbols), one
+        row per name in input order with RESOLVED_COLUMNS. Candidates are ranked
+        with score_match; rows whose best name match is below min_match have no id.
+
+        Names are looked up max_workers at a time, each source's rate limiter
+        still applying. With offline set, the symbol master is asked first and
+        answers without a request when it holds an exact match on a preferred
+        exchange and type; everything else goes through search(), whose cache
+        also answers names repeated within the TTL. Pass the table to
+        to_scrip_dicts() for Download_Historical.
+        """
+        names = ["" if pd.isna(name) else str(name).strip() for name in names]
+        resolve = lambda name: self._best_match(name, source, exchanges, types, offline) if name else None
+        best = dict(stream_map(resolve, dict.fromkeys(names), max_workers))
+
+        rows = []
+        for name in names:
+            found = best.get(name)
+            if found is None or found[1] < min_match:
+                rows.append({"query": name})
+                continue
+            score, match, result, via = found
+            rows.append({
+                "query": name,
+                "id": str(result["id"]),
+                **{field: result.get(field) for field in ("symbol", "description", "exchange", "type")},
+                "isin": result.get("isin") if result.get("isin") != "N/A" else None,
+                "score": round(score, 3),
+                "match": round(match, 3),
+                "via": via,
+            })
+        table = pd.DataFrame(rows, columns=RESOLVED_COLUMNS)
+        logger.info(f"Resolved {table['id'].notna().sum()} of {len(names)} names on {source} "
+                    f"({(table['via'] == 'master').sum()} from the symbol master)")
+        return table
+
+    def clear(self):
+        self.memo.cache.clear()
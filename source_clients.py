@@ -0,0 +1,38 @@
+"""
+One shared scraper client per source, created on first use.
+
+Importing this module (or anything that only imports it) constructs nothing
+and makes no request; the client classes themselves are only imported when a
+source is first asked for.
+"""
+import threading
+
+_clients = {}
+_lock = threading.Lock()
+
+
+def _create(source: str):
+    if source == "investing":
+        from investoscrapo.client import InvestingClient
+        return InvestingClient()
+    elif source == "bse":
+        from bse_scraper.BSE_Client import bse_scraper
+        return bse_scraper()
+    elif source == "nse":
+        from nse_scraper.NSE_Client import nse_scraper
+        return nse_scraper()
+    raise ValueError(f"No client for source: {source!r}")
+
+
+def get_client(source: str):
+    """The shared client of source ("investing", "bse" or "nse")."""
+    with _lock:
+        if source not in _clients:
+            _clients[source] = _create(source)
+        return _clients[source]
+
+
+def set_client(source: str, client):
+    """Share an already constructed client instead of creating one."""
+    with _lock:
+        _clients[source] = client
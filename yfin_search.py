@@ -1,4 +1,4 @@
-from yahooquery import search as yq_search
+from investoscrapo.utils.identity_map import remember
 
 def yahoo_finance_search(query):
     """
@@ -9,8 +9,12 @@ def yahoo_finance_search(query):
     
     Returns:
         list: List of dictionaries with standardized format matching investing.com structure
-              Each dict contains: id, description, symbol, exchange, type
+              Each dict contains: id, description, symbol, exchange, type.
+              None when the search failed, so callers (and the search cache) can tell it from no matches
     """
+    # Imported on first search: yahooquery is slow to import and only this source needs it
+    from yahooquery import search as yq_search
+
     try:
         # Call yahooquery search
         raw_results = yq_search(query)
@@ -34,20 +38,22 @@ def yahoo_finance_search(query):
             
             standardized_results.append(result)
         
+        remember(standardized_results, "yahoo")
         return standardized_results
     
     except Exception as e:
         print(f"Error searching Yahoo Finance: {e}")
-        return []
+        return None
 
 
-results = yahoo_finance_search("Apple")
+if __name__ == "__main__":
+    results = yahoo_finance_search("Apple") or []
 
-print(f"Found {len(results)} results:\n")
+    print(f"Found {len(results)} results:\n")
 
-for r in results:
-    print(f"Description: {r['description']}")
-    print(f"Symbol: {r['symbol']}")
-    print(f"Exchange: {r['exchange']}")
-    print(f"Type: {r['type']}")
-    print("-" * 50)
\ No newline at end of file
+    for r in results:
+        print(f"Description: {r['description']}")
+        print(f"Symbol: {r['symbol']}")
+        print(f"Exchange: {r['exchange']}")
+        print(f"Type: {r['type']}")
+        print("-" * 50)